@@ -1,10 +1,18 @@
 # app.py
+import io
 import os
+import time
 import streamlit as st
 from auth import auth_ui, sign_out
 from supabase_client import get_client
+from utils.query_log import query_panel
+from utils.profiling import profile_page
+from utils.frames import COLUMNS as KNOWN_TABLES
+from utils.sql_reader import read_table, source_label
 
+profile_page(__file__)
 st.set_page_config(page_title="Supabase Visualizer", page_icon="🗃️", layout="wide")
+query_panel("app")
 st.title("🗃️ Supabase Visualizer")
 
 sb = None
@@ -95,3 +103,26 @@ else:
         if sb_admin:
             with st.expander("🛠️ Admin tools (service role)"):
                 st.write("You have access to admin-only features.")
+
+                st.markdown("**Bulk export**")
+                st.caption(f"Reads via {source_label()} (set DATABASE_URL to read Postgres directly).")
+                export_table = st.selectbox("Table", sorted(KNOWN_TABLES), key="export_table")
+                if st.button("Read table", key="export_read"):
+                    t0 = time.perf_counter()
+                    try:
+                        df_export = read_table(sb_admin, export_table)
+                    except Exception as e:
+                        st.error(f"Read failed: {e}")
+                    else:
+                        st.caption(
+                            f"{len(df_export):,} rows in {time.perf_counter() - t0:.2f} s · "
+                            f"{df_export.memory_usage(deep=True).sum() / 2**20:.1f} MiB in memory"
+                        )
+                        st.dataframe(df_export.head(200), use_container_width=True, hide_index=True)
+                        buf = io.BytesIO()
+                        df_export.to_parquet(buf, index=False)
+                        c1, c2 = st.columns(2)
+                        c1.download_button("Download CSV", df_export.to_csv(index=False).encode(),
+                                           file_name=f"{export_table}.csv", mime="text/csv")
+                        c2.download_button("Download Parquet", buf.getvalue(),
+                                           file_name=f"{export_table}.parquet", mime="application/octet-stream")
@@ -0,0 +1,140 @@
+import tracemalloc
+import streamlit as st
+import pandas as pd
+from auth import auth_ui
+from utils_auth import ensure_auth
+from utils_env import getenv
+from utils.cache_registry import (
+    all_sessions_sizes, cache_stats, evict, evict_session_keys, fmt_bytes,
+    session_state_sizes, tracemalloc_diff, tracemalloc_stop, tracked_entries,
+)
+from utils.catalog_snapshots import list_snapshots, invalidate as invalidate_catalog
+from utils import bounded_cache
+
+st.set_page_config(page_title="Memory", page_icon="🧠", layout="wide")
+st.title("🧠 Memory: caches & session state")
+
+sb, user = ensure_auth(auth_ui)
+
+ADMIN_EMAILS = {
+    e.strip().lower()
+    for e in str(getenv("ADMIN_EMAILS", "") or "").split(",")
+    if e.strip()
+}
+if ((user or {}).get("email") or "").lower() not in ADMIN_EMAILS:
+    st.error("Admins only.")
+    st.stop()
+
+
+def _with_human(df: pd.DataFrame, col: str) -> pd.DataFrame:
+    out = df.copy()
+    out[col] = out[col].map(lambda v: fmt_bytes(v) if pd.notnull(v) else "")
+    return out
+
+
+# -------- st.cache_data / st.cache_resource --------
+st.subheader("Caches (Streamlit)")
+stats = cache_stats()
+if stats.empty:
+    st.caption("No cached values in this process yet.")
+else:
+    st.caption(f"{stats['entries'].sum()} entries · {fmt_bytes(stats['bytes'].sum())} held (cache_data values are stored pickled)")
+    st.dataframe(_with_human(stats, "bytes"), hide_index=True, use_container_width=True)
+
+st.subheader("Tracked cache entries")
+entries = tracked_entries()
+if entries.empty:
+    st.caption("No tracked calls yet. Functions decorated with `tracked_cache_data` show up after their first call.")
+else:
+    per_fn = (
+        entries.groupby("function")
+               .agg(entries=("args", "size"), hits=("hits", "sum"), misses=("misses", "sum"),
+                    size=("size", "sum"), oldest_s=("age_s", "max"))
+               .reset_index()
+               .sort_values("size", ascending=False)
+    )
+    st.dataframe(_with_human(per_fn, "size"), hide_index=True, use_container_width=True)
+    with st.expander(f"All {len(entries)} entries"):
+        st.dataframe(
+            _with_human(entries.sort_values("size", ascending=False), "size"),
+            hide_index=True, use_container_width=True,
+        )
+
+st.subheader("Bounded caches")
+groups = bounded_cache.group_stats()
+if groups.empty:
+    st.caption("No bounded cache has been used in this process yet.")
+else:
+    st.dataframe(
+        groups.assign(bytes=groups["bytes"].map(fmt_bytes), budget=groups["budget"].map(fmt_bytes)),
+        hide_index=True, use_container_width=True,
+    )
+    with st.expander("Bounded cache entries"):
+        st.dataframe(_with_human(bounded_cache.all_entries(), "size"), hide_index=True, use_container_width=True)
+
+with st.form("evict_cache"):
+    pattern = st.text_input(
+        "Evict cache entries matching (regex)",
+        placeholder=r"fetch_.*_for_fish\(fish_id=12\d\)  or  fish_picker.py:fetch_fish_page",
+    )
+    if st.form_submit_button("Evict") and pattern:
+        try:
+            n = evict(pattern) + bounded_cache.evict(pattern)
+            st.success(f"Evicted {n} entr(y/ies).")
+        except Exception as e:
+            st.error(f"Bad pattern: {e}")
+
+# -------- catalog snapshots --------
+st.subheader("Catalog snapshots")
+snaps = list_snapshots()
+if snaps.empty:
+    st.caption("No snapshots on disk.")
+else:
+    st.caption("Memory-mapped: shared by all sessions and processes via the OS page cache.")
+    st.dataframe(_with_human(snaps, "file_bytes"), hide_index=True, use_container_width=True)
+    drop = st.multiselect("Drop snapshots", snaps["table"].tolist())
+    if drop and st.button("Drop selected"):
+        for name in drop:
+            invalidate_catalog(name)
+        st.rerun()
+
+# -------- session state --------
+st.subheader("Session state")
+sessions = all_sessions_sizes()
+if not sessions.empty:
+    st.caption(f"{len(sessions)} connected sessions · {fmt_bytes(sessions['size'].sum())} in total")
+    st.dataframe(_with_human(sessions.sort_values("size", ascending=False), "size"), hide_index=True, use_container_width=True)
+st.markdown("**This session**")
+st.dataframe(_with_human(session_state_sizes(), "size"), hide_index=True, use_container_width=True)
+
+with st.form("evict_session"):
+    key_pattern = st.text_input("Delete keys of this session matching (regex)", placeholder="fish_picker|election_state")
+    if st.form_submit_button("Delete") and key_pattern:
+        try:
+            gone = evict_session_keys(key_pattern)
+            st.success(f"Deleted: {', '.join(gone) or 'nothing matched'}")
+        except Exception as e:
+            st.error(f"Bad pattern: {e}")
+
+# -------- tracemalloc --------
+st.subheader("Allocation growth (tracemalloc)")
+st.caption("Each rerun of this page compares against the previous one, across all sessions. Tracing slows the app; stop it when done.")
+c1, c2 = st.columns([1, 5])
+with c1:
+    tracing = st.toggle("Trace", key="tracemalloc_on")
+if tracing:
+    diff = tracemalloc_diff()
+    if diff is None:
+        st.info("Tracing started. Use the app, then rerun this page to see what grew.")
+    else:
+        st.dataframe(
+            diff.assign(size_diff=diff["size_diff"].map(fmt_bytes), size=diff["size"].map(fmt_bytes)),
+            hide_index=True, use_container_width=True,
+        )
+    with c2:
+        st.button("↻ Compare now")
+elif tracemalloc.is_tracing():
+    st.caption("Tracing is still running in this process.")
+    if st.button("Stop tracing"):
+        tracemalloc_stop()
+        st.rerun()
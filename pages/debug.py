@@ -1,12 +1,18 @@
 import os
 import streamlit as st
 from urllib.parse import urlparse
-from sqlalchemy import create_engine, text
+from utils.sql_reader import database_url, get_engine, sql_available
 
-db_url = os.environ.get("DATABASE_URL") or st.secrets["database"]["url"]
+if not sql_available():
+    st.info("No DATABASE_URL configured (or SQLAlchemy is not installed); nothing to check.")
+    st.stop()
+
+from sqlalchemy import text
+
+db_url = database_url()
 supa_url = os.environ.get("SUPABASE_URL") or st.secrets["supabase"]["url"]
 
-engine = create_engine(db_url)
+engine = get_engine()
 u = urlparse(db_url)
 is_local_db = u.hostname in ("127.0.0.1", "localhost")
 is_local_api = str(supa_url).startswith("http://127.0.0.1")
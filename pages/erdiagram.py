@@ -1,10 +1,8 @@
-import os
 import streamlit as st
-from sqlalchemy import create_engine
+from utils.sql_reader import get_engine
 from utils.er_mermaid import generate_mermaid_er
 
-db_url = os.environ.get("DATABASE_URL") or st.secrets["database"]["url"]
-engine = create_engine(db_url)
+engine = get_engine()
 
 schema = st.text_input("Schema", "public")
 mermaid_code = generate_mermaid_er(engine, schema=schema)
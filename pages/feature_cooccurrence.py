@@ -0,0 +1,89 @@
+import streamlit as st
+import altair as alt
+from auth import auth_ui, sign_out
+from utils_auth import ensure_auth, sign_out_and_clear
+from utils.query_log import query_panel
+from utils.profiling import profile_page
+from utils.cooccurrence import CATEGORIES, cooccurrence
+
+profile_page(__file__)
+st.set_page_config(page_title="Feature Co-occurrence", page_icon="🧬", layout="wide")
+query_panel("feature_cooccurrence")
+st.title("🧬 Feature Co-occurrence")
+
+sb, user = ensure_auth(auth_ui)
+
+CATEGORY_NAMES = [c.name for c in CATEGORIES]
+
+try:
+    co = cooccurrence(sb)
+except Exception as e:
+    st.error(f"Could not load the colony: {e}")
+    st.stop()
+
+with st.sidebar:
+    cats = st.multiselect("Categories", CATEGORY_NAMES, default=CATEGORY_NAMES)
+    metric = st.radio("Color by", ["count", "lift"], horizontal=True,
+                      help="count: fish carrying both. lift: how much more often than chance (1 = independent).")
+    top_n = st.slider("Most common features", min_value=5, max_value=60, value=25)
+    min_count = st.number_input("Min. fish per pair", min_value=1, value=3)
+    across_only = st.checkbox("Only pairs across categories")
+    st.caption(f"Signed in as {(user or {}).get('email','')}")
+    if st.button("Sign out"):
+        sign_out_and_clear(sign_out)
+        st.rerun()
+
+features = co.features
+c1, c2, c3 = st.columns(3)
+c1.metric("Fish", f"{co.n_fish:,}")
+c2.metric("Features in use", f"{len(features):,}")
+c3.metric("Feature pairs seen", f"{int((co.i < co.j).sum()):,}")
+
+if not cats or features.empty:
+    st.info("No features to show.")
+    st.stop()
+
+# -------- heatmap --------
+st.subheader("Heatmap")
+default_cols = co.top_features(cats, top_n)
+label = lambda n: f"{features.at[n, 'category']}: {features.at[n, 'feature']} ({features.at[n, 'fish']})"  # noqa: E731
+pool = features[features["category"].isin(cats)].sort_values("fish", ascending=False).index.tolist()
+chosen = st.multiselect("Features (empty: the most common)", pool, format_func=label)
+columns = chosen or default_cols
+
+grid = co.matrix(columns, metric)
+long = grid.rename_axis("a").reset_index().melt(id_vars="a", var_name="b", value_name=metric)
+order = list(grid.index)
+scale = alt.Scale(scheme="blues") if metric == "count" else alt.Scale(scheme="redblue", domainMid=1, reverse=True)
+chart = (
+    alt.Chart(long.dropna())
+    .mark_rect()
+    .encode(
+        x=alt.X("b:N", sort=order, title=None),
+        y=alt.Y("a:N", sort=order, title=None),
+        color=alt.Color(f"{metric}:Q", scale=scale),
+        tooltip=["a", "b", alt.Tooltip(f"{metric}:Q", format=",.2f" if metric == "lift" else ",d")],
+    )
+    .properties(height=max(300, 18 * len(order)))
+)
+st.altair_chart(chart, use_container_width=True)
+st.caption("The diagonal holds each feature's own fish count." if metric == "count"
+           else "Red: combined more often than chance. Blue: less often. The diagonal is left blank.")
+
+# -------- pairs --------
+st.subheader("Pairs")
+pairs = co.pairs(cats, min_count=int(min_count), across_only=across_only)
+sort_by = st.radio("Sort by", ["count", "lift", "confidence"], horizontal=True)
+pairs = pairs.sort_values([sort_by, "count"], ascending=False, kind="stable")
+st.dataframe(
+    pairs.head(500),
+    hide_index=True,
+    use_container_width=True,
+    column_config={
+        "lift": st.column_config.NumberColumn("lift", format="%.2f"),
+        "confidence": st.column_config.ProgressColumn("confidence", min_value=0.0, max_value=1.0, format="%.2f",
+                                                      help="Share of the rarer feature's fish that carry both"),
+    },
+)
+st.caption(f"{len(pairs):,} pairs with at least {int(min_count)} fish" + (" (first 500 shown)." if len(pairs) > 500 else "."))
+st.download_button("Download pairs (CSV)", pairs.to_csv(index=False), file_name="feature_pairs.csv", mime="text/csv")
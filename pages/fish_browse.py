@@ -0,0 +1,109 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+from auth import auth_ui, sign_out
+from utils_auth import ensure_auth, sign_out_and_clear
+from utils.query_log import query_panel
+from utils.profiling import profile_page
+from utils.fish_picker import fish_picker
+from utils.facets import facet_index
+from utils.fingerprints import PARTS, genotype_index
+
+profile_page(__file__)
+st.set_page_config(page_title="Browse Fish", page_icon="🐟", layout="wide")
+query_panel("fish_browse")
+st.title("🐟 Browse Fish")
+
+sb, user = ensure_auth(auth_ui)
+
+SELECT_COLUMNS = ["id","name","date_birth","line_building_stage","fish_code","created_at"]
+SEARCHABLE_COLUMNS = ["name","notes","fish_code","line_building_stage"]
+DEFAULT_HEIGHT = 500
+
+try:
+    idx = facet_index(sb)
+except Exception as e:
+    st.error(f"Could not load the colony: {e}")
+    st.stop()
+
+def selection() -> dict:
+    return {name: st.session_state.get(f"facet_{name}", []) for name in idx.facets}
+
+def clear_facets():
+    for name in idx.facets:
+        st.session_state[f"facet_{name}"] = []
+
+# counts for the current selection; each facet is counted under the other facets' filters
+counts = idx.counts(selection())
+
+with st.sidebar:
+    term = st.text_input("Search fish", placeholder="name, notes, code, stage")
+    for name, facet in idx.facets.items():
+        n = counts[name]
+        if not len(facet.values):
+            continue
+        st.multiselect(
+            facet.label,
+            list(facet.values),
+            format_func=lambda v, name=name, n=n: f"{idx.label(name, v)} ({n.get(v, 0)})",
+            key=f"facet_{name}",
+        )
+    st.button("Clear filters", on_click=clear_facets)
+    st.caption(f"Signed in as {(user or {}).get('email','')}")
+    if st.button("Sign out"):
+        sign_out_and_clear(sign_out)
+        st.rerun()
+
+sel = selection()
+ids = idx.match(sel)
+active = {name: vals for name, vals in sel.items() if vals}
+
+c1, c2 = st.columns([1, 3])
+with c1:
+    st.metric("Matching fish", f"{len(ids):,}", help=f"of {len(idx.fish_ids):,} in the colony")
+with c2:
+    if active:
+        st.caption("Filters: " + " · ".join(
+            f"{idx.facets[f].label}: {', '.join(idx.label(f, v) for v in vals)}" for f, vals in active.items()
+        ))
+
+with st.expander("Breakdown", expanded=False):
+    by = st.selectbox("By", list(idx.facets), format_func=lambda f: idx.facets[f].label)
+    sub = idx.counts({**sel, by: []})[by]  # this facet's counts within the current population
+    sub = sub[sub > 0].sort_values(ascending=False).head(30)
+    if sub.empty:
+        st.info("No values.")
+    else:
+        st.bar_chart(pd.Series(sub.to_numpy(), index=[idx.label(by, v) for v in sub.index], name="fish"))
+
+PART_FACETS = {prefix: cat[:-1] for prefix, cat in PARTS}  # "t" -> "transgene" facet
+
+def describe(canon: str) -> str:
+    out = []
+    for part in canon.split("|"):
+        prefix, _, part_ids = part.partition(":")
+        if part_ids:
+            out.append(", ".join(idx.label(PART_FACETS[prefix], int(i)) for i in part_ids.split(",")))
+    return " · ".join(out) or "(no transgenes, mutations or strains)"
+
+with st.expander("Genotype groups", expanded=False):
+    try:
+        gx = genotype_index(sb)
+    except Exception as e:
+        gx = None
+        st.caption(f"Genotype fingerprints unavailable: {e}")
+    if gx is not None:
+        groups = gx.groups(ids if active else None)
+        st.caption(f"{len(groups):,} distinct genotypes among {int(groups['fish'].sum()):,} fish")
+        top = groups.head(50).assign(genotype=lambda g: g["canonical"].map(describe))
+        st.dataframe(top[["fish", "genotype", "genotype_fp"]], hide_index=True, use_container_width=True)
+        pick = st.selectbox("Show only one genotype", [None, *top["genotype_fp"]],
+                            format_func=lambda fp: "All" if fp is None else f"{describe(gx.canonical[fp])} ({len(gx.members[fp])})")
+        if pick is not None:
+            ids = ids[np.isin(ids, gx.members[pick])]
+            active = {**active, "genotype": [pick]}
+
+st.subheader("Fish")
+st.caption("Ticked fish stay selected on the compare and Mom/Dad pages.")
+fish_picker(sb, term, SELECT_COLUMNS, SEARCHABLE_COLUMNS, height=DEFAULT_HEIGHT,
+            only_ids=tuple(int(i) for i in ids) if active else None)
@@ -3,8 +3,17 @@ import pandas as pd
 from datetime import date
 from auth import auth_ui, sign_out
 from utils_auth import ensure_auth, sign_out_and_clear
-
+from utils.query_log import query_panel
+from utils.profiling import profile_page
+from utils.frames import as_text, build_frame
+from utils.fish_picker import pick_pair
+from utils.bounded_cache import bounded_cache
+from utils.progressive import Section, render_progressively
+from utils.minhash import add_fish
+
+profile_page(__file__)
 st.set_page_config(page_title="Assign Mom & Dad + New Fish", page_icon="🐟", layout="wide")
+query_panel("fish_new")
 st.title("🐟 Assign Mom & Dad + New Fish")
 
 sb, user = ensure_auth(auth_ui)
@@ -13,74 +22,64 @@ FISH_SELECT = ["id","name","date_birth","notes","mother_fish_id","father_fish_id
 FISH_SEARCH = ["name","notes","fish_code","line_building_stage"]
 DEFAULT_HEIGHT = 480
 
-@st.cache_data(show_spinner=False)
-def fetch_fish(term, limit=500):
-    cols = ",".join(FISH_SELECT)
-    q = sb.table("fish").select(cols).order("created_at", desc=True).limit(limit)
-    if term:
-        ors = ",".join([f"{c}.ilike.%{term}%" for c in FISH_SEARCH])
-        q = q.or_(ors)
-    data = q.execute().data or []
-    return pd.DataFrame(data)
-
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_transgenes_for_fish(fish_id: int):
     link_rows = sb.table("fish_transgenes").select("transgene_id,created_at").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["transgene_id"] for r in link_rows if r.get("transgene_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","type","plasmid_id","description","created_at","created_by"])
     tgt = sb.table("transgenes").select("id,name,type,plasmid_id,description,created_at,created_by").in_("id", ids).order("name", desc=False).execute().data or []
-    return pd.DataFrame(tgt)
+    return build_frame(tgt, "transgenes")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_strains_for_fish(fish_id: int):
     link = sb.table("fish_strains").select("strain_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["strain_id"] for r in link if r.get("strain_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","description"])
     out = sb.table("strains").select("id,name,description").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "strains")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_mutations_for_fish(fish_id: int):
     link = sb.table("fish_mutations").select("mutation_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["mutation_id"] for r in link if r.get("mutation_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","gene","notes"])
     out = sb.table("mutations").select("id,name,gene,notes").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "mutations")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_selectedphenotypes_for_fish(fish_id: int):
     link = sb.table("fish_selectedphenotypes").select("selectedphenotype_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["selectedphenotype_id"] for r in link if r.get("selectedphenotype_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","type","description"])
     out = sb.table("selectedphenotypes").select("id,name,type,description").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "selectedphenotypes")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_treatments_for_fish(fish_id: int):
     link = sb.table("fish_treatments").select("treatment_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["treatment_id"] for r in link if r.get("treatment_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","type","description"])
     out = sb.table("treatments").select("id,name,type,description").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "treatments")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_mounts_for_fish(fish_id: int):
     link = sb.table("fish_mounts").select("mount_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["mount_id"] for r in link if r.get("mount_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","type","description"])
     out = sb.table("mounts").select("id,name,type,description").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "mounts")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_tanks_for_fish(fish_id: int):
     out = sb.table("tanks").select("id,name,location,description,created_at").eq("fish_id", fish_id).order("created_at", desc=True).execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "tanks")
 
 def pick_display_column(df: pd.DataFrame):
     for c in ["name","label","description","id"]:
@@ -94,7 +93,7 @@ def summarize_list(df: pd.DataFrame, max_items: int = 10):
     col = pick_display_column(df)
     if not col:
         return {"count": len(df), "items": ""}
-    vals = [str(v) for v in df[col].astype(str).tolist() if str(v)]
+    vals = [t for t in map(as_text, df[col].tolist()) if t]
     head = ", ".join(vals[:max_items])
     if len(vals) > max_items:
         head += f" …(+{len(vals)-max_items})"
@@ -103,7 +102,7 @@ def summarize_list(df: pd.DataFrame, max_items: int = 10):
 def summarize_list_on(df: pd.DataFrame, col: str, max_items: int = 10):
     if df is None or df.empty or col not in df.columns:
         return {"count": 0, "items": ""}
-    vals = [str(v) for v in df[col].astype(str).tolist() if str(v)]
+    vals = [t for t in map(as_text, df[col].tolist()) if t]
     head = ", ".join(vals[:max_items])
     if len(vals) > max_items:
         head += f" …(+{len(vals)-max_items})"
@@ -150,40 +149,11 @@ with st.sidebar:
         sign_out_and_clear(sign_out)
         st.rerun()
 
-df = fetch_fish(term)
-if df.empty:
-    st.info("No matches.")
-    st.stop()
-
-if "pick_state" not in st.session_state or len(st.session_state.pick_state) != len(df):
-    st.session_state.pick_state = [False] * len(df)
-
-df_display = df.copy()
-df_display.insert(0, "pick", st.session_state.pick_state)
-
-ed = st.data_editor(
-    df_display,
-    hide_index=True,
-    use_container_width=True,
-    height=DEFAULT_HEIGHT,
-    disabled={c: True for c in df_display.columns if c != "pick"},
-    column_config={"pick": st.column_config.CheckboxColumn("Select")},
-    key="fish_editor",
-)
-
-picks = ed["pick"].tolist()
-st.session_state.pick_state = picks
-picked_idx = [i for i, v in enumerate(picks) if v]
-
-if len(picked_idx) < 2:
-    st.warning("Select two rows to assign Mom & Dad.")
-    st.stop()
-if len(picked_idx) > 2:
-    st.error("You selected more than two. Uncheck until only two remain.")
+pair = pick_pair(sb, term, FISH_SELECT, FISH_SEARCH, prompt="Select two rows to assign Mom & Dad.", height=DEFAULT_HEIGHT)
+if pair is None:
     st.stop()
 
-a_idx, b_idx = picked_idx[0], picked_idx[1]
-a, b = df.iloc[a_idx], df.iloc[b_idx]
+a, b = pair
 
 if "mom_is_a" not in st.session_state:
     st.session_state.mom_is_a = True
@@ -196,16 +166,17 @@ with col_actions[0]:
 mom = a if st.session_state.mom_is_a else b
 dad = b if st.session_state.mom_is_a else a
 
-mom_summary = parent_summary(mom)
-dad_summary = parent_summary(dad)
+def show_summary(summary: dict):
+    st.table(pd.DataFrame([summary]).T.rename(columns={0:"value"}))
 
 c1, c2 = st.columns(2)
-with c1:
-    st.subheader(f"Mom #{mom.get('id')}")
-    st.table(pd.DataFrame([mom_summary]).T.rename(columns={0:"value"}))
-with c2:
-    st.subheader(f"Dad #{dad.get('id')}")
-    st.table(pd.DataFrame([dad_summary]).T.rename(columns={0:"value"}))
+c1.subheader(f"Mom #{mom.get('id')}")
+c2.subheader(f"Dad #{dad.get('id')}")
+# the per-fish fetches below are served from the cache these sections warm
+render_progressively([
+    Section("mom", lambda: parent_summary(mom), show_summary, container=c1, label="Mom's summary"),
+    Section("dad", lambda: parent_summary(dad), show_summary, container=c2, label="Dad's summary"),
+])
 
 st.divider()
 st.subheader("Create New Fish")
@@ -297,6 +268,7 @@ if submitted:
             sb.table("fish_treatments").insert([{"fish_id": new_id, "treatment_id": i} for i in trt_sel]).execute()
         if mnt_sel:
             sb.table("fish_mounts").insert([{"fish_id": new_id, "mount_id": i} for i in mnt_sel]).execute()
+        add_fish(new_id, {"transgenes": tg_sel, "strains": stn_sel, "mutations": mut_sel, "treatments": trt_sel})
         st.success(f"Created fish #{new_id}")
         st.experimental_rerun()
     except Exception as e:
@@ -5,6 +5,11 @@ from typing import List, Dict, Any, Optional, Tuple
 import pandas as pd
 import streamlit as st
 
+from utils.catalog_snapshots import invalidate as invalidate_catalog
+from utils.loader import TableSpec, load_tables
+from utils.query_log import query_panel
+from utils.profiling import profile_page
+
 # Optional Supabase support
 SUPABASE_AVAILABLE = True
 try:
@@ -93,32 +98,14 @@ def fetch_catalogs(sb: Optional[Client]) -> Dict[str, pd.DataFrame]:
             "fish_treatments": fish_treatments,
         }
 
-    # ----- Real Supabase fetches -----
-    def fetch_table(name: str) -> pd.DataFrame:
-        try:
-            data = sb.table(name).select("*").execute().data
-            return pd.DataFrame(data or [])
-        except Exception as e:
-            st.warning(f"Failed to fetch '{name}': {e}")
-            return pd.DataFrame()
-
-    fish = fetch_table("fish")
-    transgenes = fetch_table("transgenes")
-    mutations = fetch_table("mutations")
-    treatments = fetch_table("treatments")
-    fish_transgenes = fetch_table("fish_transgenes")
-    fish_mutations = fetch_table("fish_mutations")
-    fish_treatments = fetch_table("fish_treatments")
-
-    return {
-        "fish": fish,
-        "transgenes": transgenes,
-        "mutations": mutations,
-        "treatments": treatments,
-        "fish_transgenes": fish_transgenes,
-        "fish_mutations": fish_mutations,
-        "fish_treatments": fish_treatments,
-    }
+    # ----- Real Supabase fetches (loaded concurrently) -----
+    # small catalogs from the shared snapshots; fish and its link tables outgrow a
+    # snapshot's row cap, so they are paged in full
+    res = load_tables(sb, [TableSpec(n, snapshot=True) for n in ("transgenes", "mutations", "treatments")]
+                      + [TableSpec(n, limit=None) for n in ("fish", "fish_transgenes", "fish_mutations", "fish_treatments")])
+    for name, err in res.errors.items():
+        st.warning(f"Failed to fetch '{name}': {err}")
+    return res.frames
 
 
 def linked_features_for_parent(parent_id: Any, catalogs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
@@ -185,6 +172,7 @@ def insert_new_treatment_if_needed(sb: Optional[Client], tr_name: str, tr_type:
         return abs(hash((tr_name, tr_type, tr_desc))) % 10_000_000
     try:
         res = sb.table("treatments").insert({"name": tr_name, "type": tr_type, "description": tr_desc}).execute()
+        invalidate_catalog("treatments")
         rows = res.data or []
         if rows and "id" in rows[0]:
             return rows[0]["id"]
@@ -239,6 +227,9 @@ def create_fish_in_supabase(sb: Optional[Client], payload: Dict[str, Any]) -> Di
             sb.table("fish_treatments").insert({"fish_id": fish_id, "treatment_id": tr_id}).execute()
     except Exception as e:
         return {"status": "partial", "fish_id": fish_id, "error": f"Linked features insert issues: {e}"}
+    finally:
+        for name in ("fish", "fish_transgenes", "fish_mutations", "fish_treatments"):
+            invalidate_catalog(name)
 
     return {"status": "ok", "fish_id": fish_id}
 
@@ -247,7 +238,9 @@ def create_fish_in_supabase(sb: Optional[Client], payload: Dict[str, Any]) -> Di
 # UI
 # ----------------------------
 def page():
+    profile_page(__file__)
     st.set_page_config(page_title="Create New Fish", layout="wide")
+    query_panel("fish_new_create")
     st.title("Create New Fish")
     st.caption("Build a new fish by selecting parents, editing details, and choosing features to inherit or add.")
 
@@ -7,18 +7,14 @@ import streamlit as st
 # Project auth (matches fish_view_5.py style)
 from auth import auth_ui, sign_out  # type: ignore
 from utils_auth import ensure_auth, sign_out_and_clear  # type: ignore
+from utils.catalog_snapshots import invalidate as invalidate_catalog
+from utils.loader import TableSpec, load_tables
+from utils.query_log import query_panel
+from utils.profiling import profile_page
 
 # ----------------------------
 # Helpers
 # ----------------------------
-def fetch_table(sb, name: str, limit: int = 10000) -> pd.DataFrame:
-    try:
-        data = sb.table(name).select("*").limit(limit).execute().data
-        return pd.DataFrame(data or [])
-    except Exception as e:
-        st.error(f"Failed to fetch '{name}': {e}")
-        return pd.DataFrame()
-
 def col(df: pd.DataFrame, key: str) -> Optional[str]:
     key_l = key.lower()
     for c in df.columns:
@@ -62,7 +58,9 @@ def compact_feature_table(link_df: pd.DataFrame, target_df: pd.DataFrame, parent
 # Page
 # ----------------------------
 def page():
+    profile_page(__file__)
     st.set_page_config(page_title="Create New Fish", layout="wide")
+    query_panel("fish_new_create_2")
     st.title("Create New Fish")
 
     # Authenticate and get Supabase client
@@ -71,14 +69,21 @@ def page():
         st.error("Authentication failed or no Supabase client available.")
         st.stop()
 
-    # Live tables
-    fish_df         = fetch_table(sb, "fish")
-    transgenes_df   = fetch_table(sb, "transgenes")
-    mutations_df    = fetch_table(sb, "mutations")
-    treatments_df   = fetch_table(sb, "treatments")
-    f_tg_df         = fetch_table(sb, "fish_transgenes")
-    f_mu_df         = fetch_table(sb, "fish_mutations")
-    f_tr_df         = fetch_table(sb, "fish_treatments")
+    # Live tables (fetched concurrently)
+    # small catalogs from the shared snapshots; fish and its link tables outgrow a
+    # snapshot's row cap, so they are paged in full
+    boot = load_tables(sb, [TableSpec(n, snapshot=True) for n in ("transgenes", "mutations", "treatments")]
+                       + [TableSpec(n, limit=None) for n in ("fish", "fish_transgenes", "fish_mutations", "fish_treatments")])
+    for name, err in boot.errors.items():
+        st.error(f"Failed to fetch '{name}': {err}")
+    fish_df         = boot["fish"]
+    transgenes_df   = boot["transgenes"]
+    mutations_df    = boot["mutations"]
+    treatments_df   = boot["treatments"]
+    f_tg_df         = boot["fish_transgenes"]
+    f_mu_df         = boot["fish_mutations"]
+    f_tr_df         = boot["fish_treatments"]
+    st.caption(f"Loaded {boot.summary()}")
 
     # ------------------------------------
     # 0) Checkbox election table (like fish_view_5.py)
@@ -316,7 +321,7 @@ def page():
 
         # Link rows (best effort)
         def link_many(link_table: str, fk_pref: List[str], ids: List[Any]) -> Optional[str]:
-            link_df = fetch_table(sb, link_table)
+            link_df = boot[link_table]
             fish_id_c = col(link_df, "fish_id") or "fish_id"
             fk_c = detect_fk(link_df, fk_pref) or (fk_pref[0] if fk_pref else None)
             try:
@@ -331,6 +336,8 @@ def page():
         if payload.get("mutation_ids"):  errs.append(link_many("fish_mutations", ["mutation_id"], payload["mutation_ids"]) or None)
         if payload.get("treatment_ids"): errs.append(link_many("fish_treatments", ["treatment_id"], payload["treatment_ids"]) or None)
         errs = [e for e in errs if e]
+        for name in ("fish", "fish_transgenes", "fish_mutations", "fish_treatments"):
+            invalidate_catalog(name)
 
         if errs:
             st.warning("Created fish, but linking issues: " + "; ".join(errs))
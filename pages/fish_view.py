@@ -1,72 +1,120 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from auth import auth_ui, sign_out
 from utils_auth import ensure_auth, sign_out_and_clear
+from utils.query_log import query_panel
+from utils.profiling import profile_page
+from utils.fish_picker import pick_many
+from utils.fish_features import CATEGORIES, load_features, feature_matrix, feature_status
+from utils.feature_bitset import genotype_filter
+from utils.fingerprints import genotype_index
+from utils.minhash import similarity_index
 
+profile_page(__file__)
 st.set_page_config(page_title="Compare Fish", page_icon="🐟", layout="wide")
-st.title("🐟 Compare Two Fish")
+query_panel("fish_view")
+st.title("🐟 Compare Fish")
 
 sb, user = ensure_auth(auth_ui)
 
 SELECT_COLUMNS = ["id","name","date_birth","notes","mother_fish_id","father_fish_id","line_building_stage","created_at","fish_code","created_by"]
 SEARCHABLE_COLUMNS = ["name","notes","fish_code","line_building_stage"]
 DEFAULT_HEIGHT = 500
-
-@st.cache_data(show_spinner=False)
-def fetch_fish(term, limit=500):
-    cols = ",".join(SELECT_COLUMNS)
-    q = sb.table("fish").select(cols).order("created_at", desc=True).limit(limit)
-    if term:
-        ors = ",".join([f"{c}.ilike.%{term}%" for c in SEARCHABLE_COLUMNS])
-        q = q.or_(ors)
-    data = q.execute().data or []
-    return pd.DataFrame(data)
+MAX_COMPARE = 50
+STATUS_COLORS = {"shared": "background-color: rgba(33, 195, 84, 0.15)", "differs": "background-color: rgba(255, 189, 69, 0.20)"}
 
 with st.sidebar:
     term = st.text_input("Search fish", placeholder="name, notes, code, stage")
+    with st.expander("Genotype filter"):
+        only_ids = genotype_filter(sb)
     st.caption(f"Signed in as {(user or {}).get('email','')}")
     if st.button("Sign out"):
         sign_out_and_clear(sign_out)
         st.rerun()
 
-df = fetch_fish(term)
-if df.empty:
-    st.info("No matches.")
+picked = pick_many(sb, term, SELECT_COLUMNS, SEARCHABLE_COLUMNS, max_picks=MAX_COMPARE,
+                   prompt=f"Select 2–{MAX_COMPARE} rows to compare.", height=DEFAULT_HEIGHT, only_ids=only_ids)
+if picked is None:
     st.stop()
 
-if "pick_state" not in st.session_state or len(st.session_state.pick_state) != len(df):
-    st.session_state.pick_state = [False] * len(df)
+ids = [int(i) for i in picked["id"].tolist()]
+labels = {int(r["id"]): f"{r['name']} #{int(r['id'])}" for r in picked[["id", "name"]].to_dict("records")}
 
-df_display = df.copy()
-df_display.insert(0, "pick", st.session_state.pick_state)
+st.subheader(f"{len(ids)} fish")
+st.dataframe(picked.set_index("id").rename(index=labels).T.astype("string"), use_container_width=True)
 
-ed = st.data_editor(
-    df_display,
-    hide_index=True,
-    use_container_width=True,
-    height=DEFAULT_HEIGHT,
-    disabled={c: True for c in df_display.columns if c != "pick"},
-    column_config={"pick": st.column_config.CheckboxColumn("Select")},
-    key="fish_editor",
-)
+# fish with the same fingerprint carry identical transgene/mutation/strain sets
+try:
+    gx = genotype_index(sb)
+except Exception as e:
+    st.caption(f"Genotype fingerprints unavailable: {e}")
+else:
+    fps = pd.Series([gx.of(i) for i in ids], index=ids)
+    letters = {fp: chr(ord("A") + n % 26) + ("" if n < 26 else str(n // 26)) for n, fp in enumerate(fps.dropna().unique())}
+    st.dataframe(pd.DataFrame({
+        "fish": [labels[i] for i in ids],
+        "genotype": fps.map(letters).to_numpy(),
+        "same genotype here": fps.map(fps.value_counts()).to_numpy() - 1,
+        "same genotype in colony": [len(gx.identical_to(i)) for i in ids],
+    }), hide_index=True, use_container_width=True)
 
-picks = ed["pick"].tolist()
-st.session_state.pick_state = picks
-picked_idx = [i for i, v in enumerate(picks) if v]
+with st.expander("Most similar fish", expanded=False):
+    try:
+        sx = similarity_index(sb)
+    except Exception as e:
+        st.caption(f"Similarity search unavailable: {e}")
+    else:
+        c1, c2 = st.columns([3, 1])
+        with c1:
+            ref = st.selectbox("Similar to", ids, format_func=labels.get)
+        with c2:
+            top_k = st.number_input("Show", min_value=1, max_value=100, value=10)
+        similar = sx.similar(ref, k=int(top_k))
+        if similar.empty:
+            st.info("No fish share features with this one.")
+        else:
+            st.dataframe(similar, hide_index=True, use_container_width=True, column_config={
+                "jaccard": st.column_config.ProgressColumn("Jaccard", min_value=0.0, max_value=1.0, format="%.2f"),
+            })
+            st.caption(f"Ranked exactly among {similar.attrs['candidates']:,} LSH candidates "
+                       f"of {len(sx.fish_ids):,} fish with features.")
 
-if len(picked_idx) < 2:
-    st.warning("Select two rows to compare.")
-    st.stop()
-if len(picked_idx) > 2:
-    st.error("You selected more than two. Uncheck until only two remain.")
-    st.stop()
+# one request per link category for all picked fish
+links = load_features(sb, tuple(ids))
+for table, err in links.attrs.get("errors", {}).items():
+    st.warning(f"{table} could not be loaded: {err}")
 
-a, b = df.iloc[picked_idx[0]], df.iloc[picked_idx[1]]
+matrix = feature_matrix(links, ids)
+status = feature_status(matrix)
 
-c1, c2 = st.columns(2)
+st.subheader("Features")
+c1, c2, c3 = st.columns([2, 3, 2])
 with c1:
-    st.subheader(f"Fish A #{a.get('id')}")
-    st.table(pd.DataFrame(a).reset_index().rename(columns={"index":"field",0:"value"}))
+    show = st.radio("Show", ["All", "Differing", "Shared"], horizontal=True)
 with c2:
-    st.subheader(f"Fish B #{b.get('id')}")
-    st.table(pd.DataFrame(b).reset_index().rename(columns={"index":"field",0:"value"}))
+    cats = st.multiselect("Categories", [c.name for c in CATEGORIES], default=[c.name for c in CATEGORIES])
+with c3:
+    st.metric("Shared / differing", f"{int((status == 'shared').sum())} / {int((status == 'differs').sum())}")
+
+keep = matrix.index.get_level_values("category").isin(cats)
+if show == "Differing":
+    keep &= (status == "differs").to_numpy()
+elif show == "Shared":
+    keep &= (status == "shared").to_numpy()
+view, view_status = matrix[keep], status[keep]
+
+if view.empty:
+    st.info("No features to show.")
+    st.stop()
+
+grid = pd.DataFrame(np.where(view.to_numpy(), "✓", ""), index=view.index, columns=[labels[i] for i in view.columns])
+grid.insert(0, "have", view.sum(axis=1).astype(str) + f"/{len(ids)}")
+grid = grid.reset_index()
+css = np.repeat(view_status.map(STATUS_COLORS).to_numpy()[:, None], grid.shape[1], axis=1)
+st.dataframe(
+    grid.style.apply(lambda _: pd.DataFrame(css, index=grid.index, columns=grid.columns), axis=None),
+    hide_index=True,
+    use_container_width=True,
+)
+st.caption("Green: every selected fish has the feature. Amber: only some do.")
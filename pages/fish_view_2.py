@@ -2,8 +2,13 @@ import streamlit as st
 import pandas as pd
 from auth import auth_ui, sign_out
 from utils_auth import ensure_auth, sign_out_and_clear
+from utils.query_log import query_panel
+from utils.profiling import profile_page
+from utils.fish_picker import pick_pair
 
+profile_page(__file__)
 st.set_page_config(page_title="Assign Mom & Dad", page_icon="🐟", layout="wide")
+query_panel("fish_view_2")
 st.title("🐟 Assign Mom & Dad")
 
 sb, user = ensure_auth(auth_ui)
@@ -12,16 +17,6 @@ SELECT_COLUMNS = ["id","name","date_birth","notes","mother_fish_id","father_fish
 SEARCHABLE_COLUMNS = ["name","notes","fish_code","line_building_stage"]
 DEFAULT_HEIGHT = 500
 
-@st.cache_data(show_spinner=False)
-def fetch_fish(term, limit=500):
-    cols = ",".join(SELECT_COLUMNS)
-    q = sb.table("fish").select(cols).order("created_at", desc=True).limit(limit)
-    if term:
-        ors = ",".join([f"{c}.ilike.%{term}%" for c in SEARCHABLE_COLUMNS])
-        q = q.or_(ors)
-    data = q.execute().data or []
-    return pd.DataFrame(data)
-
 with st.sidebar:
     term = st.text_input("Search fish", placeholder="name, notes, code, stage")
     st.caption(f"Signed in as {(user or {}).get('email','')}")
@@ -29,40 +24,11 @@ with st.sidebar:
         sign_out_and_clear(sign_out)
         st.rerun()
 
-df = fetch_fish(term)
-if df.empty:
-    st.info("No matches.")
-    st.stop()
-
-if "pick_state" not in st.session_state or len(st.session_state.pick_state) != len(df):
-    st.session_state.pick_state = [False] * len(df)
-
-df_display = df.copy()
-df_display.insert(0, "pick", st.session_state.pick_state)
-
-ed = st.data_editor(
-    df_display,
-    hide_index=True,
-    use_container_width=True,
-    height=DEFAULT_HEIGHT,
-    disabled={c: True for c in df_display.columns if c != "pick"},
-    column_config={"pick": st.column_config.CheckboxColumn("Select")},
-    key="fish_editor",
-)
-
-picks = ed["pick"].tolist()
-st.session_state.pick_state = picks
-picked_idx = [i for i, v in enumerate(picks) if v]
-
-if len(picked_idx) < 2:
-    st.warning("Select two rows to assign Mom & Dad.")
-    st.stop()
-if len(picked_idx) > 2:
-    st.error("You selected more than two. Uncheck until only two remain.")
+pair = pick_pair(sb, term, SELECT_COLUMNS, SEARCHABLE_COLUMNS, prompt="Select two rows to assign Mom & Dad.", height=DEFAULT_HEIGHT)
+if pair is None:
     st.stop()
 
-a_idx, b_idx = picked_idx[0], picked_idx[1]
-a, b = df.iloc[a_idx], df.iloc[b_idx]
+a, b = pair
 
 if "mom_is_a" not in st.session_state:
     st.session_state.mom_is_a = True
@@ -2,8 +2,16 @@ import streamlit as st
 import pandas as pd
 from auth import auth_ui, sign_out
 from utils_auth import ensure_auth, sign_out_and_clear
-
+from utils.query_log import query_panel
+from utils.profiling import profile_page
+from utils.frames import as_text, build_frame
+from utils.fish_picker import pick_pair
+from utils.bounded_cache import bounded_cache
+from utils.progressive import Section, render_progressively
+
+profile_page(__file__)
 st.set_page_config(page_title="Assign Mom & Dad + Compact Tables", page_icon="🐟", layout="wide")
+query_panel("fish_view_4")
 st.title("🐟 Assign Mom & Dad + Compact Tables")
 
 sb, user = ensure_auth(auth_ui)
@@ -12,32 +20,22 @@ FISH_SELECT = ["id","name","date_birth","notes","mother_fish_id","father_fish_id
 FISH_SEARCH = ["name","notes","fish_code","line_building_stage"]
 DEFAULT_HEIGHT = 480
 
-@st.cache_data(show_spinner=False)
-def fetch_fish(term, limit=500):
-    cols = ",".join(FISH_SELECT)
-    q = sb.table("fish").select(cols).order("created_at", desc=True).limit(limit)
-    if term:
-        ors = ",".join([f"{c}.ilike.%{term}%" for c in FISH_SEARCH])
-        q = q.or_(ors)
-    data = q.execute().data or []
-    return pd.DataFrame(data)
-
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_table_rows_by_fish(table: str, fish_id: int, select_cols: str = "*", order_col: str | None = None, desc: bool = True, limit: int = 500):
     q = sb.table(table).select(select_cols).eq("fish_id", fish_id).limit(limit)
     if order_col:
         q = q.order(order_col, desc=desc)
-    return pd.DataFrame(q.execute().data or [])
+    return build_frame(q.execute().data, table)
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_transgenes_for_fish(fish_id: int):
     link_rows = sb.table("fish_transgenes").select("transgene_id,created_at").eq("fish_id", fish_id).execute().data or []
     tg_ids = sorted({r["transgene_id"] for r in link_rows if r.get("transgene_id") is not None})
     if not tg_ids:
         return pd.DataFrame(columns=["id","name","type","plasmid_id","description","created_at","created_by"])
     tg = sb.table("transgenes").select("*").in_("id", tg_ids).order("name", desc=False).execute().data or []
-    df_tg = pd.DataFrame(tg)
-    df_link = pd.DataFrame(link_rows)
+    df_tg = build_frame(tg, "transgenes")
+    df_link = build_frame(link_rows, "fish_transgenes")
     if not df_link.empty and not df_tg.empty and "transgene_id" in df_link.columns:
         df_tg = df_tg.merge(df_link.rename(columns={"transgene_id":"id"}), on="id", how="left", suffixes=("","_linked"))
     return df_tg
@@ -54,43 +52,38 @@ def summarize_list(df: pd.DataFrame, max_items: int = 10):
     col = pick_display_column(df)
     if not col:
         return {"count": len(df), "items": ""}
-    vals = [str(v) for v in df[col].astype(str).tolist() if str(v)]
+    vals = [t for t in map(as_text, df[col].tolist()) if t]
     head = ", ".join(vals[:max_items])
     if len(vals) > max_items:
         head += f" …(+{len(vals)-max_items})"
     return {"count": len(vals), "items": head}
 
-def bundle_parent(fish_row: pd.Series):
-    fid = int(fish_row["id"])
-    tg = fetch_transgenes_for_fish(fid)
-    mut = fetch_table_rows_by_fish("fish_mutations", fid)
-    phen = fetch_table_rows_by_fish("fish_selectedphenotypes", fid)
-    strain = fetch_table_rows_by_fish("fish_strains", fid)
-    treat = fetch_table_rows_by_fish("fish_treatments", fid)
-    mounts = fetch_table_rows_by_fish("fish_mounts", fid)
-    tanks = fetch_table_rows_by_fish("tanks", fid)
-    summary = {
+# one progressive section per parent and dataset: each is a single query, so
+# the first line paints after the fastest query, not after a serial bundle
+DATASETS = [
+    ("transgenes", lambda fid: fetch_transgenes_for_fish(fid)),
+    ("mutations", lambda fid: fetch_table_rows_by_fish("fish_mutations", fid)),
+    ("phenotypes", lambda fid: fetch_table_rows_by_fish("fish_selectedphenotypes", fid)),
+    ("strains", lambda fid: fetch_table_rows_by_fish("fish_strains", fid)),
+    ("treatments", lambda fid: fetch_table_rows_by_fish("fish_treatments", fid)),
+    ("mounts", lambda fid: fetch_table_rows_by_fish("fish_mounts", fid)),
+    ("tanks", lambda fid: fetch_table_rows_by_fish("tanks", fid)),
+]
+
+def parent_fields(fish_row: pd.Series) -> dict:
+    return {
         "fish_id": fish_row.get("id"),
         "name": fish_row.get("name"),
         "fish_code": fish_row.get("fish_code"),
         "date_birth": fish_row.get("date_birth"),
         "line_building_stage": fish_row.get("line_building_stage"),
-        "transgenes_count": summarize_list(tg)["count"],
-        "transgenes_items": summarize_list(tg)["items"],
-        "mutations_count": summarize_list(mut)["count"],
-        "mutations_items": summarize_list(mut)["items"],
-        "phenotypes_count": summarize_list(phen)["count"],
-        "phenotypes_items": summarize_list(phen)["items"],
-        "strains_count": summarize_list(strain)["count"],
-        "strains_items": summarize_list(strain)["items"],
-        "treatments_count": summarize_list(treat)["count"],
-        "treatments_items": summarize_list(treat)["items"],
-        "mounts_count": summarize_list(mounts)["count"],
-        "mounts_items": summarize_list(mounts)["items"],
-        "tanks_count": summarize_list(tanks)["count"],
-        "tanks_items": summarize_list(tanks)["items"],
     }
-    return summary
+
+def show_items(name: str):
+    def render(df: pd.DataFrame):
+        s = summarize_list(df)
+        st.markdown(f"**{name.title()}** ({s['count']}): {s['items'] or '—'}")
+    return render
 
 with st.sidebar:
     term = st.text_input("Search fish", placeholder="name, notes, code, stage")
@@ -99,40 +92,11 @@ with st.sidebar:
         sign_out_and_clear(sign_out)
         st.rerun()
 
-df = fetch_fish(term)
-if df.empty:
-    st.info("No matches.")
-    st.stop()
-
-if "pick_state" not in st.session_state or len(st.session_state.pick_state) != len(df):
-    st.session_state.pick_state = [False] * len(df)
-
-df_display = df.copy()
-df_display.insert(0, "pick", st.session_state.pick_state)
-
-ed = st.data_editor(
-    df_display,
-    hide_index=True,
-    use_container_width=True,
-    height=DEFAULT_HEIGHT,
-    disabled={c: True for c in df_display.columns if c != "pick"},
-    column_config={"pick": st.column_config.CheckboxColumn("Select")},
-    key="fish_editor",
-)
-
-picks = ed["pick"].tolist()
-st.session_state.pick_state = picks
-picked_idx = [i for i, v in enumerate(picks) if v]
-
-if len(picked_idx) < 2:
-    st.warning("Select two rows to assign Mom & Dad.")
-    st.stop()
-if len(picked_idx) > 2:
-    st.error("You selected more than two. Uncheck until only two remain.")
+pair = pick_pair(sb, term, FISH_SELECT, FISH_SEARCH, prompt="Select two rows to assign Mom & Dad.", height=DEFAULT_HEIGHT)
+if pair is None:
     st.stop()
 
-a_idx, b_idx = picked_idx[0], picked_idx[1]
-a, b = df.iloc[a_idx], df.iloc[b_idx]
+a, b = pair
 
 if "mom_is_a" not in st.session_state:
     st.session_state.mom_is_a = True
@@ -145,17 +109,29 @@ with col_actions[0]:
 mom = a if st.session_state.mom_is_a else b
 dad = b if st.session_state.mom_is_a else a
 
-mom_summary = bundle_parent(mom)
-dad_summary = bundle_parent(dad)
+def show_summary(summary: dict):
+    st.table(pd.DataFrame([summary]).T.rename(columns={0:"value"}))
 
 c1, c2 = st.columns(2)
-with c1:
-    st.subheader(f"Mom #{mom.get('id')}")
-    st.table(pd.DataFrame([mom_summary]).T.rename(columns={0:"value"}))
-with c2:
-    st.subheader(f"Dad #{dad.get('id')}")
-    st.table(pd.DataFrame([dad_summary]).T.rename(columns={0:"value"}))
+sections = []
+for col, who, row in [(c1, "mom", mom), (c2, "dad", dad)]:
+    col.subheader(f"{who.title()} #{row.get('id')}")
+    with col:
+        show_summary(parent_fields(row))
+    fid = int(row["id"])
+    for name, fetch in DATASETS:
+        sections.append(Section(f"{who}_{name}", lambda f=fetch, i=fid: f(i), show_items(name),
+                                container=col, label=name))
+results = render_progressively(sections)
 
 st.divider()
 st.subheader("Assigned Parents")
-st.table(pd.DataFrame([mom_summary, dad_summary]).set_index("fish_id"))
+if len(results) == len(sections):
+    summaries = []
+    for who, row in [("mom", mom), ("dad", dad)]:
+        summary = parent_fields(row)
+        for name, _ in DATASETS:
+            items = summarize_list(results[f"{who}_{name}"])
+            summary[f"{name}_count"], summary[f"{name}_items"] = items["count"], items["items"]
+        summaries.append(summary)
+    st.table(pd.DataFrame(summaries).set_index("fish_id"))
@@ -2,8 +2,18 @@ import streamlit as st
 import pandas as pd
 from auth import auth_ui, sign_out
 from utils_auth import ensure_auth, sign_out_and_clear
-
+from utils.async_data import ASYNC_AVAILABLE, afetch_fish_bundles, bundles_complete, run_async
+from utils.query_log import query_panel
+from utils.profiling import profile_page
+from utils.frames import as_text, build_frame
+from utils.fish_picker import pick_pair
+from utils.fragments import fragment
+from utils.bounded_cache import bounded_cache
+from utils.progressive import Section, render_progressively
+
+profile_page(__file__)
 st.set_page_config(page_title="Assign Mom & Dad + Compact Tables", page_icon="🐟", layout="wide")
+query_panel("fish_view_5")
 st.title("🐟 Assign Mom & Dad + Compact Tables")
 
 sb, user = ensure_auth(auth_ui)
@@ -12,74 +22,64 @@ FISH_SELECT = ["id","name","date_birth","notes","mother_fish_id","father_fish_id
 FISH_SEARCH = ["name","notes","fish_code","line_building_stage"]
 DEFAULT_HEIGHT = 480
 
-@st.cache_data(show_spinner=False)
-def fetch_fish(term, limit=500):
-    cols = ",".join(FISH_SELECT)
-    q = sb.table("fish").select(cols).order("created_at", desc=True).limit(limit)
-    if term:
-        ors = ",".join([f"{c}.ilike.%{term}%" for c in FISH_SEARCH])
-        q = q.or_(ors)
-    data = q.execute().data or []
-    return pd.DataFrame(data)
-
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_transgenes_for_fish(fish_id: int):
     link_rows = sb.table("fish_transgenes").select("transgene_id,created_at").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["transgene_id"] for r in link_rows if r.get("transgene_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","type","plasmid_id","description","created_at","created_by"])
     tgt = sb.table("transgenes").select("id,name,type,plasmid_id,description,created_at,created_by").in_("id", ids).order("name", desc=False).execute().data or []
-    return pd.DataFrame(tgt)
+    return build_frame(tgt, "transgenes")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_strains_for_fish(fish_id: int):
     link = sb.table("fish_strains").select("strain_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["strain_id"] for r in link if r.get("strain_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","description"])
     out = sb.table("strains").select("id,name,description").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "strains")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_mutations_for_fish(fish_id: int):
     link = sb.table("fish_mutations").select("mutation_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["mutation_id"] for r in link if r.get("mutation_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","gene","notes"])
     out = sb.table("mutations").select("id,name,gene,notes").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "mutations")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_selectedphenotypes_for_fish(fish_id: int):
     link = sb.table("fish_selectedphenotypes").select("selectedphenotype_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["selectedphenotype_id"] for r in link if r.get("selectedphenotype_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","type","description"])
     out = sb.table("selectedphenotypes").select("id,name,type,description").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "selectedphenotypes")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_treatments_for_fish(fish_id: int):
     link = sb.table("fish_treatments").select("treatment_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["treatment_id"] for r in link if r.get("treatment_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","type","description"])
     out = sb.table("treatments").select("id,name,type,description").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "treatments")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_mounts_for_fish(fish_id: int):
     link = sb.table("fish_mounts").select("mount_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["mount_id"] for r in link if r.get("mount_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","type","description"])
     out = sb.table("mounts").select("id,name,type,description").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "mounts")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_tanks_for_fish(fish_id: int):
     out = sb.table("tanks").select("id,name,location,description,created_at").eq("fish_id", fish_id).order("created_at", desc=True).execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "tanks")
 
 def pick_display_column(df: pd.DataFrame):
     for c in ["name","label","description","id"]:
@@ -90,7 +90,7 @@ def pick_display_column(df: pd.DataFrame):
 def summarize_list_on(df: pd.DataFrame, col: str, max_items: int = 10):
     if df is None or df.empty or col not in df.columns:
         return {"count": 0, "items": ""}
-    vals = [str(v) for v in df[col].astype(str).tolist() if str(v)]
+    vals = [t for t in map(as_text, df[col].tolist()) if t]
     head = ", ".join(vals[:max_items])
     if len(vals) > max_items:
         head += f" …(+{len(vals)-max_items})"
@@ -101,8 +101,8 @@ def summarize_pair(df: pd.DataFrame, col_a: str, col_b: str, sep: str = " — ",
         return {"count": 0, "items": ""}
     items = []
     for _, r in df.iterrows():
-        a = str(r.get(col_a,"") or "").strip()
-        b = str(r.get(col_b,"") or "").strip() if col_b in df.columns else ""
+        a = as_text(r.get(col_a)).strip()
+        b = as_text(r.get(col_b)).strip() if col_b in df.columns else ""
         if a or b:
             items.append(a if not b else f"{a}{sep}{b}")
     head = ", ".join(items[:max_items])
@@ -117,21 +117,46 @@ def summarize_list(df: pd.DataFrame, max_items: int = 10):
     col = pick_display_column(df)
     if not col:
         return {"count": len(df), "items": ""}
-    vals = [str(v) for v in df[col].astype(str).tolist() if str(v)]
+    vals = [t for t in map(as_text, df[col].tolist()) if t]
     head = ", ".join(vals[:max_items])
     if len(vals) > max_items:
         head += f" …(+{len(vals)-max_items})"
     return {"count": len(vals), "items": head}
 
-def parent_summary(fish_row: pd.Series):
+def _sync_bundle(fid: int) -> dict:
+    return {
+        "transgenes": fetch_transgenes_for_fish(fid),
+        "strains": fetch_strains_for_fish(fid),
+        "mutations": fetch_mutations_for_fish(fid),
+        "phenotypes": fetch_selectedphenotypes_for_fish(fid),
+        "treatments": fetch_treatments_for_fish(fid),
+        "mounts": fetch_mounts_for_fish(fid),
+        "tanks": fetch_tanks_for_fish(fid),
+    }
+
+@bounded_cache("parent_bundles", keep=bundles_complete)
+def fetch_parent_bundles(fish_ids: tuple):
+    # all categories of the given parents in one concurrent gather;
+    # bundles with failed categories are shown with a warning and not cached
+    if ASYNC_AVAILABLE:
+        try:
+            return run_async(sb, afetch_fish_bundles, list(fish_ids))
+        except Exception as e:
+            # the sync fetchers raise on their own failures
+            note = f"Concurrent fetch failed ({e}); loaded one query at a time."
+            return {fid: {**_sync_bundle(fid), "note": note} for fid in fish_ids}
+    return {fid: _sync_bundle(fid) for fid in fish_ids}
+
+def parent_summary(fish_row: pd.Series, bundle: dict = None):
     fid = int(fish_row["id"])
-    tg = fetch_transgenes_for_fish(fid)
-    stn = fetch_strains_for_fish(fid)
-    mut = fetch_mutations_for_fish(fid)
-    phen = fetch_selectedphenotypes_for_fish(fid)
-    trt = fetch_treatments_for_fish(fid)
-    mnt = fetch_mounts_for_fish(fid)
-    tnk = fetch_tanks_for_fish(fid)
+    bundle = bundle or _sync_bundle(fid)
+    tg = bundle["transgenes"]
+    stn = bundle["strains"]
+    mut = bundle["mutations"]
+    phen = bundle["phenotypes"]
+    trt = bundle["treatments"]
+    mnt = bundle["mounts"]
+    tnk = bundle["tanks"]
 
     tg_names = summarize_list_on(tg, "name")
     tg_descs = summarize_list_on(tg, "description")
@@ -168,60 +193,50 @@ with st.sidebar:
         sign_out_and_clear(sign_out)
         st.rerun()
 
-df = fetch_fish(term)
-if df.empty:
-    st.info("No matches.")
-    st.stop()
-
-if "pick_state" not in st.session_state or len(st.session_state.pick_state) != len(df):
-    st.session_state.pick_state = [False] * len(df)
-
-df_display = df.copy()
-df_display.insert(0, "pick", st.session_state.pick_state)
-
-ed = st.data_editor(
-    df_display,
-    hide_index=True,
-    use_container_width=True,
-    height=DEFAULT_HEIGHT,
-    disabled={c: True for c in df_display.columns if c != "pick"},
-    column_config={"pick": st.column_config.CheckboxColumn("Select")},
-    key="fish_editor",
-)
-
-picks = ed["pick"].tolist()
-st.session_state.pick_state = picks
-picked_idx = [i for i, v in enumerate(picks) if v]
-
-if len(picked_idx) < 2:
-    st.warning("Select two rows to assign Mom & Dad.")
-    st.stop()
-if len(picked_idx) > 2:
-    st.error("You selected more than two. Uncheck until only two remain.")
+pair = pick_pair(sb, term, FISH_SELECT, FISH_SEARCH, prompt="Select two rows to assign Mom & Dad.", height=DEFAULT_HEIGHT)
+if pair is None:
     st.stop()
 
-a_idx, b_idx = picked_idx[0], picked_idx[1]
-a, b = df.iloc[a_idx], df.iloc[b_idx]
+a, b = pair
 
 if "mom_is_a" not in st.session_state:
     st.session_state.mom_is_a = True
 
-col_actions = st.columns([1,3,3])
-with col_actions[0]:
-    if st.button("Swap Mom/Dad"):
-        st.session_state.mom_is_a = not st.session_state.mom_is_a
-
-mom = a if st.session_state.mom_is_a else b
-dad = b if st.session_state.mom_is_a else a
-
-mom_summary = parent_summary(mom)
-dad_summary = parent_summary(dad)
-
-c1, c2 = st.columns(2)
-with c1:
-    st.subheader(f"Mom #{mom.get('id')}")
-    st.table(pd.DataFrame([mom_summary]).T.rename(columns={0:"value"}))
-with c2:
-    st.subheader(f"Dad #{dad.get('id')}")
-    st.table(pd.DataFrame([dad_summary]).T.rename(columns={0:"value"}))
+def show_summary(summary: dict):
+    st.table(pd.DataFrame([summary]).T.rename(columns={0:"value"}))
+
+def load_parent(row: pd.Series):
+    fid = int(row["id"])
+    bundle = fetch_parent_bundles((fid,))[fid]
+    return parent_summary(row, bundle), bundle
+
+def show_parent(result):
+    summary, bundle = result
+    if bundle.get("note"):
+        st.info(bundle["note"])
+    for cat, err in (bundle.get("errors") or {}).items():
+        st.warning(f"Could not load {cat} (shown as none): {err}")
+    show_summary(summary)
+
+@fragment
+def parent_summaries(a: pd.Series, b: pd.Series):
+    # the swap button reruns only this section
+    col_actions = st.columns([1,3,3])
+    with col_actions[0]:
+        if st.button("Swap Mom/Dad"):
+            st.session_state.mom_is_a = not st.session_state.mom_is_a
+
+    mom = a if st.session_state.mom_is_a else b
+    dad = b if st.session_state.mom_is_a else a
+
+    c1, c2 = st.columns(2)
+    c1.subheader(f"Mom #{mom.get('id')}")
+    c2.subheader(f"Dad #{dad.get('id')}")
+    # one section per parent: the first summary shows as soon as its bundle is in
+    render_progressively([
+        Section(who, lambda row=row: load_parent(row), show_parent, container=col, label=f"{who.title()}'s summary")
+        for who, row, col in [("mom", mom, c1), ("dad", dad, c2)]
+    ])
+
+parent_summaries(a, b)
 
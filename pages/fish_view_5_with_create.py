@@ -22,9 +22,9 @@ def _options_rows(df: pd.DataFrame) -> List[Dict[str, Any]]:
     rows: List[Dict[str, Any]] = []
     for _, r in df.iterrows():
         _id = r.get(id_c) if id_c else None
-        _name = (str(r.get(name_c)).strip() if name_c else "") or ""
-        _type = (str(r.get(type_c)).strip() if type_c else "") or ""
-        _desc = (str(r.get(desc_c)).strip() if desc_c else "") or ""
+        _name = as_text(r.get(name_c)).strip() if name_c else ""
+        _type = as_text(r.get(type_c)).strip() if type_c else ""
+        _desc = as_text(r.get(desc_c)).strip() if desc_c else ""
         label = _name if _name else (_type if _type else (str(_id) if _id is not None else ""))
         rows.append({"id": _id, "name": _name or None, "type": _type or None, "description": _desc or None, "label": label})
     return rows
@@ -34,10 +34,27 @@ def _options_map(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
     return {row["label"]: row for row in _options_rows(df)}
 
 import pandas as pd
+import numpy as np
 from auth import auth_ui, sign_out
 from utils_auth import ensure_auth, sign_out_and_clear
-
+from utils.catalog_snapshots import load_catalog, invalidate as invalidate_catalog, render_freshness
+from utils.async_data import ASYNC_AVAILABLE, afetch_fish_bundles, ainsert_many, bundles_complete, run_async, warm_catalogs
+from utils.loader import TableSpec, fetch_spec
+from utils.query_log import query_panel
+from utils.profiling import profile_page
+from utils.frames import as_text, build_frame
+from utils.fish_picker import pick_pair
+from utils.fragments import fragment, rerun_app_if_changed
+from utils.bounded_cache import bounded_cache
+from utils.progressive import Section, render_progressively
+from utils.minhash import add_fish
+from utils.pedigree import pedigree, rank_partners
+from utils.feature_bitset import feature_index
+from utils.mendel import crosses, load_genotypes
+
+profile_page(__file__)
 st.set_page_config(page_title="Assign Mom & Dad + Compact Tables", page_icon="🐟", layout="wide")
+query_panel("fish_view_5_with_create")
 st.title("🐟 Assign Mom & Dad + Compact Tables")
 
 sb, user = ensure_auth(auth_ui)
@@ -46,74 +63,64 @@ FISH_SELECT = ["id","name","date_birth","notes","mother_fish_id","father_fish_id
 FISH_SEARCH = ["name","notes","fish_code","line_building_stage"]
 DEFAULT_HEIGHT = 480
 
-@st.cache_data(show_spinner=False)
-def fetch_fish(term, limit=500):
-    cols = ",".join(FISH_SELECT)
-    q = sb.table("fish").select(cols).order("created_at", desc=True).limit(limit)
-    if term:
-        ors = ",".join([f"{c}.ilike.%{term}%" for c in FISH_SEARCH])
-        q = q.or_(ors)
-    data = q.execute().data or []
-    return pd.DataFrame(data)
-
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_transgenes_for_fish(fish_id: int):
     link_rows = sb.table("fish_transgenes").select("transgene_id,created_at").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["transgene_id"] for r in link_rows if r.get("transgene_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","type","plasmid_id","description","created_at","created_by"])
     tgt = sb.table("transgenes").select("id,name,type,plasmid_id,description,created_at,created_by").in_("id", ids).order("name", desc=False).execute().data or []
-    return pd.DataFrame(tgt)
+    return build_frame(tgt, "transgenes")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_strains_for_fish(fish_id: int):
     link = sb.table("fish_strains").select("strain_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["strain_id"] for r in link if r.get("strain_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","description"])
     out = sb.table("strains").select("id,name,description").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "strains")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_mutations_for_fish(fish_id: int):
     link = sb.table("fish_mutations").select("mutation_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["mutation_id"] for r in link if r.get("mutation_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","gene","notes"])
     out = sb.table("mutations").select("id,name,gene,notes").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "mutations")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_selectedphenotypes_for_fish(fish_id: int):
     link = sb.table("fish_selectedphenotypes").select("selectedphenotype_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["selectedphenotype_id"] for r in link if r.get("selectedphenotype_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","type","description"])
     out = sb.table("selectedphenotypes").select("id,name,type,description").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "selectedphenotypes")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_treatments_for_fish(fish_id: int):
     link = sb.table("fish_treatments").select("treatment_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["treatment_id"] for r in link if r.get("treatment_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","type","description"])
     out = sb.table("treatments").select("id,name,type,description").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "treatments")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_mounts_for_fish(fish_id: int):
     link = sb.table("fish_mounts").select("mount_id").eq("fish_id", fish_id).execute().data or []
     ids = sorted({r["mount_id"] for r in link if r.get("mount_id") is not None})
     if not ids:
         return pd.DataFrame(columns=["id","name","type","description"])
     out = sb.table("mounts").select("id,name,type,description").in_("id", ids).order("name").execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "mounts")
 
-@st.cache_data(show_spinner=False)
+@bounded_cache("per_fish")
 def fetch_tanks_for_fish(fish_id: int):
     out = sb.table("tanks").select("id,name,location,description,created_at").eq("fish_id", fish_id).order("created_at", desc=True).execute().data or []
-    return pd.DataFrame(out)
+    return build_frame(out, "tanks")
 
 def pick_display_column(df: pd.DataFrame):
     for c in ["name","label","description","id"]:
@@ -124,7 +131,7 @@ def pick_display_column(df: pd.DataFrame):
 def summarize_list_on(df: pd.DataFrame, col: str, max_items: int = 10):
     if df is None or df.empty or col not in df.columns:
         return {"count": 0, "items": ""}
-    vals = [str(v) for v in df[col].astype(str).tolist() if str(v)]
+    vals = [t for t in map(as_text, df[col].tolist()) if t]
     head = ", ".join(vals[:max_items])
     if len(vals) > max_items:
         head += f" …(+{len(vals)-max_items})"
@@ -135,8 +142,8 @@ def summarize_pair(df: pd.DataFrame, col_a: str, col_b: str, sep: str = " — ",
         return {"count": 0, "items": ""}
     items = []
     for _, r in df.iterrows():
-        a = str(r.get(col_a,"") or "").strip()
-        b = str(r.get(col_b,"") or "").strip() if col_b in df.columns else ""
+        a = as_text(r.get(col_a)).strip()
+        b = as_text(r.get(col_b)).strip() if col_b in df.columns else ""
         if a or b:
             items.append(a if not b else f"{a}{sep}{b}")
     head = ", ".join(items[:max_items])
@@ -151,21 +158,46 @@ def summarize_list(df: pd.DataFrame, max_items: int = 10):
     col = pick_display_column(df)
     if not col:
         return {"count": len(df), "items": ""}
-    vals = [str(v) for v in df[col].astype(str).tolist() if str(v)]
+    vals = [t for t in map(as_text, df[col].tolist()) if t]
     head = ", ".join(vals[:max_items])
     if len(vals) > max_items:
         head += f" …(+{len(vals)-max_items})"
     return {"count": len(vals), "items": head}
 
-def parent_summary(fish_row: pd.Series):
+def _sync_bundle(fid: int) -> dict:
+    return {
+        "transgenes": fetch_transgenes_for_fish(fid),
+        "strains": fetch_strains_for_fish(fid),
+        "mutations": fetch_mutations_for_fish(fid),
+        "phenotypes": fetch_selectedphenotypes_for_fish(fid),
+        "treatments": fetch_treatments_for_fish(fid),
+        "mounts": fetch_mounts_for_fish(fid),
+        "tanks": fetch_tanks_for_fish(fid),
+    }
+
+@bounded_cache("parent_bundles", keep=bundles_complete)
+def fetch_parent_bundles(fish_ids: tuple):
+    # all categories of the given parents in one concurrent gather;
+    # bundles with failed categories are shown with a warning and not cached
+    if ASYNC_AVAILABLE:
+        try:
+            return run_async(sb, afetch_fish_bundles, list(fish_ids))
+        except Exception as e:
+            # the sync fetchers raise on their own failures
+            note = f"Concurrent fetch failed ({e}); loaded one query at a time."
+            return {fid: {**_sync_bundle(fid), "note": note} for fid in fish_ids}
+    return {fid: _sync_bundle(fid) for fid in fish_ids}
+
+def parent_summary(fish_row: pd.Series, bundle: dict = None):
     fid = int(fish_row["id"])
-    tg = fetch_transgenes_for_fish(fid)
-    stn = fetch_strains_for_fish(fid)
-    mut = fetch_mutations_for_fish(fid)
-    phen = fetch_selectedphenotypes_for_fish(fid)
-    trt = fetch_treatments_for_fish(fid)
-    mnt = fetch_mounts_for_fish(fid)
-    tnk = fetch_tanks_for_fish(fid)
+    bundle = bundle or _sync_bundle(fid)
+    tg = bundle["transgenes"]
+    stn = bundle["strains"]
+    mut = bundle["mutations"]
+    phen = bundle["phenotypes"]
+    trt = bundle["treatments"]
+    mnt = bundle["mounts"]
+    tnk = bundle["tanks"]
 
     tg_names = summarize_list_on(tg, "name")
     tg_descs = summarize_list_on(tg, "description")
@@ -202,62 +234,142 @@ with st.sidebar:
         sign_out_and_clear(sign_out)
         st.rerun()
 
-df = fetch_fish(term)
-if df.empty:
-    st.info("No matches.")
-    st.stop()
-
-if "pick_state" not in st.session_state or len(st.session_state.pick_state) != len(df):
-    st.session_state.pick_state = [False] * len(df)
-
-df_display = df.copy()
-df_display.insert(0, "pick", st.session_state.pick_state)
-
-ed = st.data_editor(
-    df_display,
-    hide_index=True,
-    use_container_width=True,
-    height=DEFAULT_HEIGHT,
-    disabled={c: True for c in df_display.columns if c != "pick"},
-    column_config={"pick": st.column_config.CheckboxColumn("Select")},
-    key="fish_editor",
-)
-
-picks = ed["pick"].tolist()
-st.session_state.pick_state = picks
-picked_idx = [i for i, v in enumerate(picks) if v]
-
-if len(picked_idx) < 2:
-    st.warning("Select two rows to assign Mom & Dad.")
-    st.stop()
-if len(picked_idx) > 2:
-    st.error("You selected more than two. Uncheck until only two remain.")
+pair = pick_pair(sb, term, FISH_SELECT, FISH_SEARCH, prompt="Select two rows to assign Mom & Dad.", height=DEFAULT_HEIGHT)
+if pair is None:
     st.stop()
 
-a_idx, b_idx = picked_idx[0], picked_idx[1]
-a, b = df.iloc[a_idx], df.iloc[b_idx]
+a, b = pair
 
 if "mom_is_a" not in st.session_state:
     st.session_state.mom_is_a = True
 
-col_actions = st.columns([1,3,3])
-with col_actions[0]:
-    if st.button("Swap Mom/Dad"):
-        st.session_state.mom_is_a = not st.session_state.mom_is_a
-
+def show_summary(summary: dict):
+    st.table(pd.DataFrame([summary]).T.rename(columns={0:"value"}))
+
+def load_parent(row: pd.Series):
+    fid = int(row["id"])
+    bundle = fetch_parent_bundles((fid,))[fid]
+    return parent_summary(row, bundle), bundle
+
+def show_parent(result):
+    summary, bundle = result
+    if bundle.get("note"):
+        st.info(bundle["note"])
+    for cat, err in (bundle.get("errors") or {}).items():
+        st.warning(f"Could not load {cat} (shown as none): {err}")
+    show_summary(summary)
+
+@fragment
+def parent_summaries(a: pd.Series, b: pd.Series):
+    # the swap button reruns only this section
+    col_actions = st.columns([1,3,3])
+    with col_actions[0]:
+        if st.button("Swap Mom/Dad"):
+            st.session_state.mom_is_a = not st.session_state.mom_is_a
+
+    mom = a if st.session_state.mom_is_a else b
+    dad = b if st.session_state.mom_is_a else a
+
+    c1, c2 = st.columns(2)
+    c1.subheader(f"Mom #{mom.get('id')}")
+    c2.subheader(f"Dad #{dad.get('id')}")
+    # one section per parent: the first summary shows as soon as its bundle is in
+    render_progressively([
+        Section(who, lambda row=row: load_parent(row), show_parent, container=col, label=f"{who.title()}'s summary")
+        for who, row, col in [("mom", mom, c1), ("dad", dad, c2)]
+    ])
+
+    # the create workflow below is built for these parents: rerun it after a swap
+    rerun_app_if_changed("parent_order", (int(mom["id"]), int(dad["id"])))
+
+parent_summaries(a, b)
 mom = a if st.session_state.mom_is_a else b
 dad = b if st.session_state.mom_is_a else a
 
-mom_summary = parent_summary(mom)
-dad_summary = parent_summary(dad)
 
-c1, c2 = st.columns(2)
-with c1:
-    st.subheader(f"Mom #{mom.get('id')}")
-    st.table(pd.DataFrame([mom_summary]).T.rename(columns={0:"value"}))
-with c2:
-    st.subheader(f"Dad #{dad.get('id')}")
-    st.table(pd.DataFrame([dad_summary]).T.rename(columns={0:"value"}))
+@fragment
+def kinship_section(mom: pd.Series, dad: pd.Series):
+    with st.expander("🧬 Kinship & partner suggestions", expanded=False):
+        try:
+            ped = pedigree(sb)
+        except Exception as e:
+            st.caption(f"Pedigree unavailable: {e}")
+            return
+        mom_id, dad_id = int(mom["id"]), int(dad["id"])
+        F = ped.inbreeding
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Offspring inbreeding", f"{ped.kinship_between(mom_id, dad_id):.4f}",
+                  help="Kinship of Mom and Dad = inbreeding coefficient of their offspring")
+        c2.metric("Mom's inbreeding", f"{F.get(mom_id, 0.0):.4f}")
+        c3.metric("Dad's inbreeding", f"{F.get(dad_id, 0.0):.4f}")
+
+        st.markdown("**Suggest partners**")
+        c1, c2, c3 = st.columns([1, 2, 1])
+        with c1:
+            focal = st.radio("For", ["Mom", "Dad"], horizontal=True, key="partner_for")
+        focal_id = mom_id if focal == "Mom" else dad_id
+        try:
+            idx = feature_index(sb)
+        except Exception as e:
+            idx = None
+            st.caption(f"Genotype features unavailable: {e}")
+        with c2:
+            desired = st.multiselect("Desired offspring features", idx.options() if idx else [],
+                                     format_func=lambda f: f"{f[0]}: {idx.labels.get(f, f[1])}", key="partner_features")
+        with c3:
+            max_kin = st.number_input("Max. kinship", min_value=0.0, max_value=1.0, value=0.0625, step=0.0625, format="%.4f",
+                                      help="0.0625 = first cousins, 0.125 = half sibs, 0.25 = full sibs")
+        # carriers of each desired feature, aligned with the pedigree's fish order
+        rows = pd.Index(idx.fish_ids).get_indexer(ped.fish_ids) if idx else None
+        has = {f: np.where(rows >= 0, idx.select(all_of=[f])[rows], False) for f in desired}
+        ranked = rank_partners(ped, focal_id, has, max_kinship=max_kin, k=200 if desired else 50)
+        if ranked.empty:
+            st.info("No fish within that kinship.")
+            return
+        if desired:
+            # every candidate cross in one computation, then rank by the chance of the wanted offspring
+            partners = ranked["fish_id"].tolist()
+            genotypes = load_genotypes(sb, tuple([focal_id, *partners]))
+            for table, err in genotypes.attrs.get("errors", {}).items():
+                st.warning(f"{table} could not be loaded: {err}")
+            cx = crosses(genotypes, [focal_id] * len(partners), partners)
+            ranked["p_all"] = cx.p_all(desired)
+            ranked["expected"] = cx.expected(desired)
+            ranked = ranked.sort_values(["p_all", "kinship"], ascending=[False, True], kind="stable").head(50)
+        st.dataframe(ranked, hide_index=True, use_container_width=True, column_config={
+            "kinship": st.column_config.NumberColumn("kinship", format="%.4f", help="= the offspring's inbreeding"),
+            "covers": st.column_config.NumberColumn(f"covers (of {len(desired)})", help="Desired features Mom/Dad and partner carry between them"),
+            "adds": st.column_config.NumberColumn("adds", help="Desired features only the partner carries"),
+            "p_all": st.column_config.ProgressColumn("P(all desired)", min_value=0.0, max_value=1.0, format="%.2f",
+                                                     help="Chance an offspring carries every desired feature"),
+            "expected": st.column_config.NumberColumn("expected", format="%.2f", help="Expected desired features per offspring"),
+        })
+        st.caption("Fish have no sex column, so partners of either sex are listed. Tick one in the picker to use it.")
+
+
+kinship_section(mom, dad)
+
+
+@fragment
+def offspring_section(mom: pd.Series, dad: pd.Series):
+    with st.expander("🧮 Predicted offspring genotypes", expanded=False):
+        mom_id, dad_id = int(mom["id"]), int(dad["id"])
+        genotypes = load_genotypes(sb, (mom_id, dad_id))
+        for table, err in genotypes.attrs.get("errors", {}).items():
+            st.warning(f"{table} could not be loaded: {err}")
+        predicted = crosses(genotypes, [mom_id], [dad_id]).table(0)
+        if predicted.empty:
+            st.info("Neither parent carries a transgene or mutation.")
+            return
+        pct = {c: st.column_config.ProgressColumn(label, min_value=0.0, max_value=1.0, format="%.2f")
+               for c, label in [("p_hom", "hom"), ("p_het", "het / hemi"), ("p_none", "none")]}
+        st.dataframe(predicted, hide_index=True, use_container_width=True, column_config={
+            **pct, "assumed": st.column_config.CheckboxColumn("assumed", help="Zygosity not recorded for a parent: het assumed"),
+        })
+        st.caption("Independent loci and Mendelian ratios. Treatments and strains are not inherited this way.")
+
+
+offspring_section(mom, dad)
 
 
 
@@ -277,11 +389,20 @@ def _col(_df: pd.DataFrame, key: str) -> str | None:
             return c
     return None
 
-@st.cache_data(show_spinner=False)
-def _fetch_table(name: str, limit: int = 10000) -> pd.DataFrame:
+def _fetch_table(name: str) -> pd.DataFrame:
+    # Memory-mapped Arrow snapshot shared by all sessions; treat as read-only.
     try:
-        data = sb.table(name).select("*").limit(limit).execute().data or []
-        return pd.DataFrame(data)
+        return load_catalog(sb, name)
+    except Exception as e:
+        st.error(f"Failed to fetch '{name}': {e}")
+        return pd.DataFrame()
+
+
+def _fetch_rows(name: str, limit: Optional[int] = None, **eq: Any) -> pd.DataFrame:
+    # fish and the fish_* link tables outgrow a snapshot's row cap: read them live,
+    # filtered server-side and paged in full
+    try:
+        return fetch_spec(sb, TableSpec(name, filters=tuple((c, "eq", v) for c, v in eq.items()), limit=limit))
     except Exception as e:
         st.error(f"Failed to fetch '{name}': {e}")
         return pd.DataFrame()
@@ -318,7 +439,7 @@ def _detect_fk(link_df: pd.DataFrame, preferred: list[str]) -> str | None:
 def _parent_unified_features(parent_id: int) -> pd.DataFrame:
     rows: list[dict] = []
     # Transgenes
-    f_tg = _fetch_table("fish_transgenes")
+    f_tg = _fetch_rows("fish_transgenes", fish_id=parent_id)
     tg = _fetch_table("transgenes")
     if not f_tg.empty and not tg.empty:
         fish_id_c = _col(f_tg, "fish_id")
@@ -335,7 +456,7 @@ def _parent_unified_features(parent_id: int) -> pd.DataFrame:
                 if tgt_desc: row["description"] = r.get(tgt_desc)
                 rows.append(row)
     # Mutations
-    f_mu = _fetch_table("fish_mutations")
+    f_mu = _fetch_rows("fish_mutations", fish_id=parent_id)
     mu = _fetch_table("mutations")
     if not f_mu.empty and not mu.empty:
         fish_id_c = _col(f_mu, "fish_id")
@@ -352,7 +473,7 @@ def _parent_unified_features(parent_id: int) -> pd.DataFrame:
                 if tgt_desc: row["description"] = r.get(tgt_desc)
                 rows.append(row)
     # Treatments
-    f_tr = _fetch_table("fish_treatments")
+    f_tr = _fetch_rows("fish_treatments", fish_id=parent_id)
     tr = _fetch_table("treatments")
     if not f_tr.empty and not tr.empty:
         fish_id_c = _col(f_tr, "fish_id")
@@ -379,253 +500,284 @@ def _id_map(df: pd.DataFrame) -> dict[str, int]:
 
 # ---- Toggle to open creation workflow ----
 st.divider()
-with st.expander("➕ Create a New Fish (extend this page)", expanded=True):
-    # Use the mom/dad already picked above
-    try:
-        mom_id_val = int(mom.get("id"))
-        dad_id_val = int(dad.get("id"))
-    except Exception:
-        st.warning("Pick two parents above to proceed with creation.")
-        st.stop()
-
-    
-    
-    # 1) Unified Features (inheritance only)
-    st.markdown("### 1) Unified Features (inheritance only)")
-
-    unified = pd.DataFrame(columns=["feature_type","id","name","source","inherit"])
-    pf_m = _parent_unified_features(mom_id_val)
-    pf_d = _parent_unified_features(dad_id_val)
-    unified = pd.concat([unified, pf_m, pf_d], ignore_index=True)
-    unified.drop_duplicates(subset=["feature_type","id"], inplace=True, ignore_index=True)
-
-    # Optional columns only if present in any target table
-    tg_all = _fetch_table("transgenes")
-    mu_all = _fetch_table("mutations")
-    tr_all = _fetch_table("treatments")
-    if _col(tg_all, "type") or _col(mu_all, "type") or _col(tr_all, "type"):
-        if "type" not in unified.columns: unified["type"] = None
-    if _col(tg_all, "description") or _col(mu_all, "description") or _col(tr_all, "description"):
-        if "description" not in unified.columns: unified["description"] = None
-
-    st.markdown("**Unified Features** (toggle 'inherit' to include/exclude)")
-    unified = st.data_editor(unified, num_rows="dynamic", hide_index=True, use_container_width=True, key="unified_editor_create")
-
-
-    # 2) Add a New Treatment (table)
-    st.markdown("### 2) Add a New Treatment")
-    tr_live = _fetch_table("treatments")
-    tr_cols = list(tr_live.columns) if not tr_live.empty else ["name", "type", "description"]
-    # Keep only columns that actually exist among common set
-    allowed_tr_cols = []
-    for k in ["name", "type", "description"]:
-        c = _col(tr_live, k)
-        if c: allowed_tr_cols.append(c)
-    if not allowed_tr_cols:
-        # fallback to any writable-looking columns (exclude id)
-        allowed_tr_cols = [c for c in tr_cols if c.lower() != "id"]
-
-    # One blank row for entry; user can add more with "Add rows"
-    new_tr_df = pd.DataFrame([{c: "" for c in allowed_tr_cols}])
-    new_tr_df = st.data_editor(
-        new_tr_df,
-        num_rows="dynamic",
-        hide_index=True,
-        use_container_width=True,
-        key="new_treatments_editor",
-    )
-
-    # Insert button
-    if st.button("Insert New Treatment(s)"):
-        inserted_ids = []
-        for _, row in new_tr_df.iterrows():
-            payload = {c: (row[c] if c in row and str(row[c]).strip() != "" else None) for c in allowed_tr_cols}
-            # Skip empty rows
-            if all(v in (None, "") for v in payload.values()):
-                continue
-            try:
-                res = sb.table("treatments").insert(payload).execute().data or []
-                if res:
-                    # Detect id column from returned row
-                    id_key = next((k for k in res[0].keys() if k.lower() == "id"), None)
-                    if id_key:
-                        inserted_ids.append(res[0][id_key])
-            except Exception as e:
-                st.error(f"Failed to insert treatment: {e}")
-        if inserted_ids:
-            st.success(f"Inserted {len(inserted_ids)} new treatment(s): {inserted_ids}")
-            # Refresh tr_all and tr_map; append to unified as 'treatment' entries
-            tr_all = _fetch_table("treatments")
-            tr_map = _options_map(tr_all)
-            for _id in inserted_ids:
-                # Find the label row for this id
-                ent = next((v for v in tr_map.values() if v.get("id") == _id), None)
-                if ent:
-                    add_row = {"feature_type":"treatment","id":ent["id"],"name":ent.get("name"),"type":ent.get("type"),"description":ent.get("description"),"source":"added-new","inherit":True}
-                    globals()["unified"] = pd.concat([globals()["unified"], pd.DataFrame([add_row])], ignore_index=True)
-        else:
-            st.info("No non-empty rows to insert.")
-
-
-    
-    
-    
-    # 3) Preview of the New Fish
-    st.markdown("### 3) Preview of the New Fish")
-
-    # Compact feature summaries (same compact style as mom/dad summaries)
-    # Build from unified (inherit == True), including any newly added treatments
-    def _collect_items(unified_df: pd.DataFrame, ftype: str, key: str) -> list[str]:
-        if unified_df is None or unified_df.empty:
-            return []
-        df = unified_df.copy()
-        if "inherit" in df.columns:
-            df = df[df["inherit"] == True]  # noqa: E712
-        if "feature_type" in df.columns:
-            df = df[df["feature_type"] == ftype]
-        return [str(x).strip() for x in df[key].dropna().astype(str).tolist()] if key in df.columns else []
-
-    tg_names = _collect_items(unified, "transgene", "name")
-    tg_descs = _collect_items(unified, "transgene", "description")
-    mu_names = _collect_items(unified, "mutation", "name")
-    tr_names = _collect_items(unified, "treatment", "name")
-
-    # Show three compact tables like mom/dad
-    cL, cC, cR = st.columns(3)
-    with cL:
-        st.markdown("**Transgenes**")
-        tg_prev = _compact_from_unified(unified, "transgene")
-        st.dataframe(tg_prev if not tg_prev.empty else pd.DataFrame(), use_container_width=True)
-    with cC:
-        st.markdown("**Mutations**")
-        mu_prev = _compact_from_unified(unified, "mutation")
-        st.dataframe(mu_prev if not mu_prev.empty else pd.DataFrame(), use_container_width=True)
-    with cR:
-        st.markdown("**Treatments**")
-        tr_prev = _compact_from_unified(unified, "treatment")
-        st.dataframe(tr_prev if not tr_prev.empty else pd.DataFrame(), use_container_width=True)
-
-    # New Fish Details editor (but final preview is shown as a field/value table)
-    fish_live = _fetch_table("fish")
-    fish_lc = _live_cols(fish_live)
-    preferred = ["fish_code", "name", "date_birth", "line_building_stage", "notes", "mother_fish_id", "father_fish_id", "created_by", "created_at"]
-    fish_cols = [fish_lc[p] for p in fish_lc if p in [x.lower() for x in preferred]] or list(fish_live.columns)
-
-    defaults: Dict[str, Any] = {}
-for c in fish_cols:
-    lc = c.lower()
-    if lc in ("date_birth", "dob"):
-        defaults[c] = _dt.date.today().isoformat()
-    elif lc in ("mother_fish_id",):
-        defaults[c] = mom_id_val
-    elif lc in ("father_fish_id",):
-        defaults[c] = dad_id_val
-    elif lc in ("created_at",):
-        # leave created_at empty; DB default may handle it
-        defaults[c] = ""
-    else:
-        defaults[c] = ""
-
-
-    st.markdown("**New Fish Details**")
-    # Removed redundant details editor; using defaults below
-    fish_details = defaults.copy()
-
-    # Build a compact one-column 'value' table mirroring the mom/dad details style
-    # Some rows (strains/phenotypes/mounts/tanks) may not exist yet; we leave them empty/zero
-    line_building_stage = fish_details.get(next((k for k in fish_details.keys() if k.lower()=="line_building_stage"), "line_building_stage"), None)
-
-    table_rows = [
-        ("fish_id", ""),  # will be known after creation
-        ("name", fish_details.get(next((k for k in fish_details if k.lower()=="name"), "name"), "")),
-        ("fish_code", fish_details.get(next((k for k in fish_details if k.lower()=="fish_code"), "fish_code"), "")),
-        ("date_birth", fish_details.get(next((k for k in fish_details if k.lower()=="date_birth"), "date_birth"), "")),
-        ("line_building_stage", line_building_stage if line_building_stage is not None else ""),
-        ("transgenes_count", len([x for x in tg_names if x])),
-        ("transgenes_items", ", ".join([x for x in tg_names if x])),
-        ("transgenes_descriptions", "; ".join([x for x in tg_descs if x])),
-        ("strains_count", 0),
-        ("strains_items", ""),
-        ("mutations_count", len([x for x in mu_names if x])),
-        ("mutations_items", ", ".join([x for x in mu_names if x])),
-        ("phenotypes_count", 0),
-        ("phenotypes_items", ""),
-        ("treatments_count", len([x for x in tr_names if x])),
-        ("treatments_items", ", ".join([x for x in tr_names if x])),
-        ("mounts_count", 0),
-        ("mounts_items", ""),
-        ("tanks_count", 0),
-        ("tanks_items", ""),
-    ]
-    preview_df = pd.DataFrame({"value": [v for _, v in table_rows]}, index=[k for k, _ in table_rows])
-    edited_preview = st.data_editor(
-        preview_df, height=800,
-        num_rows="fixed",
-        hide_index=False,
-        use_container_width=True,
-        key="new_fish_details_value_editor",
-    )
-    # Rebuild fish_details from the edited value column (only real schema fields)
-    fish_details = defaults.copy()
-    editable_keys = [
-        "name","fish_code","date_birth","line_building_stage","notes",
-        "mother_fish_id","father_fish_id","created_by","created_at"
-    ]
-    for k in editable_keys:
-        if k in edited_preview.index:
-            fish_details[k] = edited_preview.loc[k, "value"]
-
-
-
-    # Build payload internally (no JSON shown)
-    def _build_payload() -> dict:
-        f = unified.copy()
-        if "inherit" in f.columns:
-            f = f[f["inherit"] == True]  # noqa: E712
-        getids = lambda t: f.loc[f["feature_type"] == t, "id"].dropna().unique().tolist() if "id" in f.columns else []
-        return {
-            "fish": fish_details,
-            "parents": {"mother_id": mom_id_val, "father_id": dad_id_val},
-            "transgene_ids": getids("transgene"),
-            "mutation_ids": getids("mutation"),
-            "treatment_ids": getids("treatment"),
-        }
-
-    payload = _build_payload()
-
-    if st.button("Create New Fish", type="primary"):
-        # Insert fish (only allowed columns)
-        live_cols_map = _live_cols(fish_live)
-        safe_fish = {live_cols_map[k.lower()]: v for k, v in fish_details.items() if k.lower() in live_cols_map}
+
+
+@fragment
+def create_section(mom: pd.Series, dad: pd.Series):
+    with st.expander("➕ Create a New Fish (extend this page)", expanded=True):
+        # Use the mom/dad already picked above
         try:
-            inserted = sb.table("fish").insert(safe_fish).execute().data
-            if not inserted:
-                raise RuntimeError("Insert returned no row")
-            new_fish_id = inserted[0].get(_col(pd.DataFrame([inserted[0]]), "id") or "id")
-        except Exception as e:
-            st.error(f"Create failed: {e}")
-            st.stop()
-
-        # Link junction rows
-        def _link_many(link_table: str, fk_pref: list[str], ids: list[int]) -> str | None:
-            link_live = _fetch_table(link_table)
-            fish_id_c = _col(link_live, "fish_id") or "fish_id"
-            fk_c = _detect_fk(link_live, fk_pref) or (fk_pref[0] if fk_pref else None)
+            mom_id_val = int(mom.get("id"))
+            dad_id_val = int(dad.get("id"))
+        except Exception:
+            st.warning("Pick two parents above to proceed with creation.")
+            return
+
+
+
+        # 1) Unified Features (inheritance only)
+        st.markdown("### 1) Unified Features (inheritance only)")
+        _catalogs = ["transgenes", "mutations", "treatments"]
+        try:
+            # first visit: fetch all missing catalogs concurrently instead of one by one below
+            warm_catalogs(sb, _catalogs)
+        except Exception:
+            pass
+        render_freshness(_catalogs)
+
+        unified = pd.DataFrame(columns=["feature_type","id","name","source","inherit"])
+        pf_m = _parent_unified_features(mom_id_val)
+        pf_d = _parent_unified_features(dad_id_val)
+        unified = pd.concat([unified, pf_m, pf_d], ignore_index=True)
+        unified.drop_duplicates(subset=["feature_type","id"], inplace=True, ignore_index=True)
+
+        # Optional columns only if present in any target table
+        tg_all = _fetch_table("transgenes")
+        mu_all = _fetch_table("mutations")
+        tr_all = _fetch_table("treatments")
+        if _col(tg_all, "type") or _col(mu_all, "type") or _col(tr_all, "type"):
+            if "type" not in unified.columns: unified["type"] = None
+        if _col(tg_all, "description") or _col(mu_all, "description") or _col(tr_all, "description"):
+            if "description" not in unified.columns: unified["description"] = None
+
+        st.markdown("**Unified Features** (toggle 'inherit' to include/exclude)")
+        unified = st.data_editor(unified, num_rows="dynamic", hide_index=True, use_container_width=True, key="unified_editor_create")
+
+
+        # 2) Add a New Treatment (table)
+        st.markdown("### 2) Add a New Treatment")
+        tr_live = _fetch_table("treatments")
+        tr_cols = list(tr_live.columns) if not tr_live.empty else ["name", "type", "description"]
+        # Keep only columns that actually exist among common set
+        allowed_tr_cols = []
+        for k in ["name", "type", "description"]:
+            c = _col(tr_live, k)
+            if c: allowed_tr_cols.append(c)
+        if not allowed_tr_cols:
+            # fallback to any writable-looking columns (exclude id)
+            allowed_tr_cols = [c for c in tr_cols if c.lower() != "id"]
+
+        # One blank row for entry; user can add more with "Add rows"
+        new_tr_df = pd.DataFrame([{c: "" for c in allowed_tr_cols}])
+        new_tr_df = st.data_editor(
+            new_tr_df,
+            num_rows="dynamic",
+            hide_index=True,
+            use_container_width=True,
+            key="new_treatments_editor",
+        )
+
+        # Insert button
+        if st.button("Insert New Treatment(s)"):
+            inserted_ids = []
+            for _, row in new_tr_df.iterrows():
+                payload = {c: (row[c] if c in row and str(row[c]).strip() != "" else None) for c in allowed_tr_cols}
+                # Skip empty rows
+                if all(v in (None, "") for v in payload.values()):
+                    continue
+                try:
+                    res = sb.table("treatments").insert(payload).execute().data or []
+                    if res:
+                        # Detect id column from returned row
+                        id_key = next((k for k in res[0].keys() if k.lower() == "id"), None)
+                        if id_key:
+                            inserted_ids.append(res[0][id_key])
+                except Exception as e:
+                    st.error(f"Failed to insert treatment: {e}")
+            if inserted_ids:
+                st.success(f"Inserted {len(inserted_ids)} new treatment(s): {inserted_ids}")
+                invalidate_catalog("treatments")
+                # Refresh tr_all and tr_map; append to unified as 'treatment' entries
+                tr_all = _fetch_table("treatments")
+                tr_map = _options_map(tr_all)
+                for _id in inserted_ids:
+                    # Find the label row for this id
+                    ent = next((v for v in tr_map.values() if v.get("id") == _id), None)
+                    if ent:
+                        add_row = {"feature_type":"treatment","id":ent["id"],"name":ent.get("name"),"type":ent.get("type"),"description":ent.get("description"),"source":"added-new","inherit":True}
+                        unified = pd.concat([unified, pd.DataFrame([add_row])], ignore_index=True)
+            else:
+                st.info("No non-empty rows to insert.")
+
+
+
+
+
+        # 3) Preview of the New Fish
+        st.markdown("### 3) Preview of the New Fish")
+
+        # Compact feature summaries (same compact style as mom/dad summaries)
+        # Build from unified (inherit == True), including any newly added treatments
+        def _collect_items(unified_df: pd.DataFrame, ftype: str, key: str) -> list[str]:
+            if unified_df is None or unified_df.empty:
+                return []
+            df = unified_df.copy()
+            if "inherit" in df.columns:
+                df = df[df["inherit"] == True]  # noqa: E712
+            if "feature_type" in df.columns:
+                df = df[df["feature_type"] == ftype]
+            return [str(x).strip() for x in df[key].dropna().astype(str).tolist()] if key in df.columns else []
+
+        tg_names = _collect_items(unified, "transgene", "name")
+        tg_descs = _collect_items(unified, "transgene", "description")
+        mu_names = _collect_items(unified, "mutation", "name")
+        tr_names = _collect_items(unified, "treatment", "name")
+
+        # Show three compact tables like mom/dad
+        cL, cC, cR = st.columns(3)
+        with cL:
+            st.markdown("**Transgenes**")
+            tg_prev = _compact_from_unified(unified, "transgene")
+            st.dataframe(tg_prev if not tg_prev.empty else pd.DataFrame(), use_container_width=True)
+        with cC:
+            st.markdown("**Mutations**")
+            mu_prev = _compact_from_unified(unified, "mutation")
+            st.dataframe(mu_prev if not mu_prev.empty else pd.DataFrame(), use_container_width=True)
+        with cR:
+            st.markdown("**Treatments**")
+            tr_prev = _compact_from_unified(unified, "treatment")
+            st.dataframe(tr_prev if not tr_prev.empty else pd.DataFrame(), use_container_width=True)
+
+        # New Fish Details editor (but final preview is shown as a field/value table)
+        fish_live = _fetch_rows("fish", limit=1)  # only its columns are used
+        fish_lc = _live_cols(fish_live)
+        preferred = ["fish_code", "name", "date_birth", "line_building_stage", "notes", "mother_fish_id", "father_fish_id", "created_by", "created_at"]
+        fish_cols = [fish_lc[p] for p in fish_lc if p in [x.lower() for x in preferred]] or list(fish_live.columns)
+
+        defaults: Dict[str, Any] = {}
+        for c in fish_cols:
+            lc = c.lower()
+            if lc in ("date_birth", "dob"):
+                defaults[c] = _dt.date.today().isoformat()
+            elif lc in ("mother_fish_id",):
+                defaults[c] = mom_id_val
+            elif lc in ("father_fish_id",):
+                defaults[c] = dad_id_val
+            elif lc in ("created_at",):
+                # leave created_at empty; DB default may handle it
+                defaults[c] = ""
+            else:
+                defaults[c] = ""
+
+
+        st.markdown("**New Fish Details**")
+        # Removed redundant details editor; using defaults below
+        fish_details = defaults.copy()
+
+        # Build a compact one-column 'value' table mirroring the mom/dad details style
+        # Some rows (strains/phenotypes/mounts/tanks) may not exist yet; we leave them empty/zero
+        line_building_stage = fish_details.get(next((k for k in fish_details.keys() if k.lower()=="line_building_stage"), "line_building_stage"), None)
+
+        table_rows = [
+            ("fish_id", ""),  # will be known after creation
+            ("name", fish_details.get(next((k for k in fish_details if k.lower()=="name"), "name"), "")),
+            ("fish_code", fish_details.get(next((k for k in fish_details if k.lower()=="fish_code"), "fish_code"), "")),
+            ("date_birth", fish_details.get(next((k for k in fish_details if k.lower()=="date_birth"), "date_birth"), "")),
+            ("line_building_stage", line_building_stage if line_building_stage is not None else ""),
+            ("transgenes_count", len([x for x in tg_names if x])),
+            ("transgenes_items", ", ".join([x for x in tg_names if x])),
+            ("transgenes_descriptions", "; ".join([x for x in tg_descs if x])),
+            ("strains_count", 0),
+            ("strains_items", ""),
+            ("mutations_count", len([x for x in mu_names if x])),
+            ("mutations_items", ", ".join([x for x in mu_names if x])),
+            ("phenotypes_count", 0),
+            ("phenotypes_items", ""),
+            ("treatments_count", len([x for x in tr_names if x])),
+            ("treatments_items", ", ".join([x for x in tr_names if x])),
+            ("mounts_count", 0),
+            ("mounts_items", ""),
+            ("tanks_count", 0),
+            ("tanks_items", ""),
+        ]
+        preview_df = pd.DataFrame({"value": [v for _, v in table_rows]}, index=[k for k, _ in table_rows])
+        edited_preview = st.data_editor(
+            preview_df, height=800,
+            num_rows="fixed",
+            hide_index=False,
+            use_container_width=True,
+            key="new_fish_details_value_editor",
+        )
+        # Rebuild fish_details from the edited value column (only real schema fields)
+        fish_details = defaults.copy()
+        editable_keys = [
+            "name","fish_code","date_birth","line_building_stage","notes",
+            "mother_fish_id","father_fish_id","created_by","created_at"
+        ]
+        for k in editable_keys:
+            if k in edited_preview.index:
+                fish_details[k] = edited_preview.loc[k, "value"]
+
+
+
+        # Build payload internally (no JSON shown)
+        def _build_payload() -> dict:
+            f = unified.copy()
+            if "inherit" in f.columns:
+                f = f[f["inherit"] == True]  # noqa: E712
+            getids = lambda t: f.loc[f["feature_type"] == t, "id"].dropna().unique().tolist() if "id" in f.columns else []
+            return {
+                "fish": fish_details,
+                "parents": {"mother_id": mom_id_val, "father_id": dad_id_val},
+                "transgene_ids": getids("transgene"),
+                "mutation_ids": getids("mutation"),
+                "treatment_ids": getids("treatment"),
+            }
+
+        payload = _build_payload()
+
+        if st.button("Create New Fish", type="primary"):
+            # Insert fish (only allowed columns)
+            live_cols_map = _live_cols(fish_live)
+            safe_fish = {live_cols_map[k.lower()]: v for k, v in fish_details.items() if k.lower() in live_cols_map}
             try:
-                for x in ids:
-                    sb.table(link_table).insert({fish_id_c: new_fish_id, fk_c: x}).execute()
-                return None
+                inserted = sb.table("fish").insert(safe_fish).execute().data
+                if not inserted:
+                    raise RuntimeError("Insert returned no row")
+                new_fish_id = inserted[0].get(_col(pd.DataFrame([inserted[0]]), "id") or "id")
             except Exception as e:
-                return f"{link_table}: {e}"
-
-        errs = []
-        pl = payload
-        if pl.get("transgene_ids"): errs.append(_link_many("fish_transgenes", ["transgene_id"], pl["transgene_ids"]) or None)
-        if pl.get("mutation_ids"):  errs.append(_link_many("fish_mutations",  ["mutation_id"],  pl["mutation_ids"]) or None)
-        if pl.get("treatment_ids"): errs.append(_link_many("fish_treatments", ["treatment_id"], pl["treatment_ids"]) or None)
-        errs = [e for e in errs if e]
-
-        if errs:
-            st.warning("Created fish, but linking issues: " + "; ".join(errs))
-        else:
-            st.success(f"✅ Fish created (id={new_fish_id}).")
\ No newline at end of file
+                st.error(f"Create failed: {e}")
+                return
+
+            # Link junction rows
+            def _link_rows(link_table: str, fk_pref: list[str], ids: list[int]) -> list[dict]:
+                link_live = _fetch_rows(link_table, limit=1)  # only its columns are used
+                fish_id_c = _col(link_live, "fish_id") or "fish_id"
+                fk_c = _detect_fk(link_live, fk_pref) or (fk_pref[0] if fk_pref else None)
+                return [{fish_id_c: new_fish_id, fk_c: x} for x in ids]
+
+            pl = payload
+            batches = {
+                "fish_transgenes": _link_rows("fish_transgenes", ["transgene_id"], pl.get("transgene_ids") or []),
+                "fish_mutations": _link_rows("fish_mutations", ["mutation_id"], pl.get("mutation_ids") or []),
+                "fish_treatments": _link_rows("fish_treatments", ["treatment_id"], pl.get("treatment_ids") or []),
+            }
+            if ASYNC_AVAILABLE:
+                # one bulk insert per link table, all three in flight at once
+                link_errs = run_async(sb, ainsert_many, batches)
+            else:
+                link_errs = {}
+                for link_table, rows in batches.items():
+                    try:
+                        if rows:
+                            sb.table(link_table).insert(rows).execute()
+                    except Exception as e:
+                        link_errs[link_table] = str(e)
+            errs = [f"{t}: {e}" for t, e in link_errs.items() if e]
+
+            for _name in ("fish", "fish_transgenes", "fish_mutations", "fish_treatments"):
+                invalidate_catalog(_name)
+            # searchable in "similar fish" right away, without waiting for an index rebuild
+            add_fish(int(new_fish_id), {
+                "transgenes": [] if link_errs.get("fish_transgenes") else pl.get("transgene_ids") or [],
+                "mutations": [] if link_errs.get("fish_mutations") else pl.get("mutation_ids") or [],
+                "treatments": [] if link_errs.get("fish_treatments") else pl.get("treatment_ids") or [],
+            })
+
+            if errs:
+                st.warning("Created fish, but linking issues: " + "; ".join(errs))
+            else:
+                st.success(f"✅ Fish created (id={new_fish_id}).")
+
+
+create_section(mom, dad)
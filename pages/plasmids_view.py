@@ -8,16 +8,20 @@
 #   (Have SUPABASE_URL and a key in env or .streamlit/secrets.toml)
 # ------------------------------------------------------------
 import os
-from typing import List
-
 import pandas as pd
 import streamlit as st
 from supabase import create_client
 
+from utils.catalog_snapshots import load_catalog, refresh_catalog, render_freshness
+from utils.query_log import query_panel
+from utils.profiling import profile_page
+
 # ------------------------------
 # Page config
 # ------------------------------
+profile_page(__file__)
 st.set_page_config(page_title="Plasmids — View", page_icon="🧬", layout="wide")
+query_panel("plasmids_view")
 st.title("🧬 Plasmids — View")
 
 # ------------------------------
@@ -44,23 +48,6 @@ sb = create_client(SUPABASE_URL, SUPABASE_KEY)
 # ------------------------------
 # Helpers
 # ------------------------------
-@st.cache_data(show_spinner=False)
-def fetch_all(table: str, chunk_size: int = 1000, max_rows: int = 50000) -> pd.DataFrame:
-    """Fetch all rows from a Supabase table with pagination."""
-    all_rows: List[dict] = []
-    start, end = 0, chunk_size - 1
-    while start < max_rows:
-        res = sb.table(table).select("*").range(start, end).execute()
-        rows = res.data or []
-        if not rows:
-            break
-        all_rows.extend(rows)
-        if len(rows) < chunk_size:
-            break
-        start += chunk_size
-        end += chunk_size
-    return pd.DataFrame(all_rows)
-
 def fuzzy_filter_df(df: pd.DataFrame, query: str) -> pd.DataFrame:
     """Case-insensitive contains across all string-like columns."""
     if not query or df.empty:
@@ -78,7 +65,8 @@ def fuzzy_filter_df(df: pd.DataFrame, query: str) -> pd.DataFrame:
 # ------------------------------
 with st.spinner("Loading plasmids…"):
     try:
-        df_raw = fetch_all("plasmids")
+        # shared snapshot: served immediately, refreshed in the background when stale
+        df_raw = load_catalog(sb, "plasmids")
     except Exception as e:
         st.error(f"Error loading plasmids: {e}")
         st.stop()
@@ -121,9 +109,12 @@ with st.sidebar:
         pass
 
 if do_refresh:
-    fetch_all.clear()  # clear cache
     with st.spinner("Refreshing…"):
-        df_raw = fetch_all("plasmids")
+        df_raw = refresh_catalog(sb, "plasmids", force=True)
+        if df_raw is None:
+            df_raw = load_catalog(sb, "plasmids")
+
+render_freshness(["plasmids"])
 
 # ------------------------------
 # Apply filters
@@ -9,17 +9,26 @@
 import os
 import pandas as pd
 import streamlit as st
-from typing import Optional
 from supabase import create_client
 from postgrest.exceptions import APIError
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 
+from utils.catalog_snapshots import load_catalog, invalidate as invalidate_catalog, render_freshness
+from utils.table_versions import table_version
+from utils.async_data import ASYNC_AVAILABLE, afetch_links, run_async
+from utils.query_log import query_panel
+from utils.profiling import profile_page
+from utils.cache_registry import tracked_cache_data
+from utils.frames import build_frame
+
 # ------------------------------
 # Page config
 # ------------------------------
+profile_page(__file__)
 st.set_page_config(page_title="Plasmids → Elements", page_icon="🧬", layout="wide")
+query_panel("plasmids_view_elements")
 st.title("🧬 Plasmids → Elements")
-st.caption("Use the toolbar to search. Select a plasmid to see its **linked plasmid_elements** below.")
+st.caption("Use the toolbar to search. Select one or more plasmids to see their **linked plasmid_elements** below.")
 
 # ------------------------------
 # Supabase client
@@ -42,13 +51,46 @@ sb = create_client(SUPABASE_URL, SERVICE_ROLE_KEY or ANON_KEY)
 # ------------------------------
 # Data access helpers
 # ------------------------------
-@st.cache_data(show_spinner=False, ttl=60)
+def _front_columns(df: pd.DataFrame) -> pd.DataFrame:
+    # Bring key columns to the front if they exist; keep all others
+    preferred = ["id", "name", "description", "resistance", "notes"]
+    front = [c for c in preferred if c in df.columns]
+    rest = [c for c in df.columns if c not in front]
+    return df[front + rest]
+
+
 def fetch_plasmids(name_q: str | None, notes_q: str | None, id_q: str | None) -> pd.DataFrame:
     """
     Return a DataFrame of plasmids with optional server-side filters.
-    Now selects *all* columns from `plasmids`.
+    Unfiltered reads come from the shared catalog snapshot, which is served
+    immediately and refreshed in the background when stale.
+    """
+    if name_q or notes_q or id_q:
+        df = _query_plasmids(name_q, notes_q, id_q, table_version(sb, "plasmids"))
+    else:
+        try:
+            df = load_catalog(sb, "plasmids")
+        except Exception as e:
+            st.error(f"Error fetching plasmids: {e}")
+            return pd.DataFrame()
+        if "name" in df.columns:
+            df = df.sort_values("name", kind="stable")
+    if df.empty:
+        return df
+    # the grid wants plain Python values; caches keep the compact typed frame
+    df = _front_columns(df).reset_index(drop=True).astype(object)
+    # Avoid NaN display noise
+    return df.where(pd.notnull(df), None)
+
+
+@tracked_cache_data(show_spinner=False, ttl=3600, max_entries=64)
+def _query_plasmids(name_q: str | None, notes_q: str | None, id_q: str | None, version: str | None = None) -> pd.DataFrame:
+    """
+    Filtered plasmids query. Selects *all* columns from `plasmids`.
     - name_q, notes_q: case-insensitive contains via .ilike('%...%')
     - id_q: if int-like, filter by id exact; else ignored
+    - version: table version token; part of the cache key, so the query is
+      only re-run when the table actually changed
     """
     try:
         q = sb.table("plasmids").select("*")
@@ -67,49 +109,22 @@ def fetch_plasmids(name_q: str | None, notes_q: str | None, id_q: str | None) ->
         st.error(f"Error fetching plasmids: {e}")
         return pd.DataFrame()
 
-    df = pd.DataFrame(res.data or [])
-    if df.empty:
-        return df
+    return build_frame(res.data, "plasmids")
 
-    # Bring key columns to the front if they exist; keep all others
-    preferred = ["id", "name", "description", "resistance", "notes"]
-    front = [c for c in preferred if c in df.columns]
-    rest = [c for c in df.columns if c not in front]
-    df = df[front + rest]
 
-    # Avoid NaN display noise
-    return df.where(pd.notnull(df), None)
+LINK_SELECT = """
+    plasmid_id,
+    element_id,
+    position,
+    notes,
+    created_at,
+    created_by,
+    element:plasmid_elements(*),
+    plasmid:plasmids(id,name)
+"""
 
 
-@st.cache_data(show_spinner=False, ttl=60)
-@st.cache_data(show_spinner=False, ttl=60)
-def fetch_plasmid_links(plasmid_id: int) -> pd.DataFrame:
-    """
-    Read from the JOIN table and embed both sides.
-    Uses element:plasmid_elements(*) so it won't break if columns differ.
-    """
-    try:
-        res = (
-            sb.table("plasmids_plasmid_elements")
-              .select("""
-                plasmid_id,
-                element_id,
-                position,
-                notes,
-                created_at,
-                created_by,
-                element:plasmid_elements(*),
-                plasmid:plasmids(id,name)
-              """)
-              .eq("plasmid_id", plasmid_id)
-              .order("position", desc=False)
-              .execute()
-        )
-    except APIError as e:
-        st.error(f"Error fetching links: {e}")
-        return pd.DataFrame()
-
-    rows = res.data or []
+def _flatten_links(rows: list[dict]) -> pd.DataFrame:
     if not rows:
         return pd.DataFrame()
 
@@ -152,9 +167,50 @@ def fetch_plasmid_links(plasmid_id: int) -> pd.DataFrame:
     return df.where(pd.notnull(df), None)
 
 
+@tracked_cache_data(show_spinner=False, ttl=3600, max_entries=256)
+def fetch_plasmid_links(plasmid_id: int, version: str | None = None) -> pd.DataFrame:
+    """
+    Read from the JOIN table and embed both sides.
+    Uses element:plasmid_elements(*) so it won't break if columns differ.
+    `version` (probe tokens of the join and element tables) keys the cache on data changes.
+    """
+    try:
+        res = (
+            sb.table("plasmids_plasmid_elements")
+              .select(LINK_SELECT)
+              .eq("plasmid_id", plasmid_id)
+              .order("position", desc=False)
+              .execute()
+        )
+    except APIError as e:
+        st.error(f"Error fetching links: {e}")
+        return pd.DataFrame()
+    return _flatten_links(res.data or [])
+
+
+@tracked_cache_data(show_spinner=False, ttl=3600, max_entries=64)
+def fetch_links_for_plasmids(plasmid_ids: tuple, version: str | None = None) -> pd.DataFrame:
+    """Links of several plasmids; the batched `in.(...)` reads run concurrently on the async client."""
+    if not ASYNC_AVAILABLE:
+        parts = [p for p in (fetch_plasmid_links(pid, version) for pid in plasmid_ids) if not p.empty]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    try:
+        raw = run_async(sb, afetch_links, "plasmids_plasmid_elements", "plasmid_id", list(plasmid_ids),
+                        select=LINK_SELECT, order="position")
+    except Exception as e:
+        st.error(f"Error fetching links: {e}")
+        return pd.DataFrame()
+    df = _flatten_links(raw.to_dict("records"))
+    if df.empty:
+        return df
+    return df.sort_values(["plasmid_id", "position"], kind="stable").reset_index(drop=True)
+
+
 def _clear_caches():
-    fetch_plasmids.clear()
+    _query_plasmids.clear()
     fetch_plasmid_links.clear()
+    fetch_links_for_plasmids.clear()
+    invalidate_catalog("plasmids")
 
 # ------------------------------
 # Toolbar (search & actions)
@@ -176,6 +232,7 @@ with st.container():
 # Plasmid selector (wide, ~20 visible rows, scroll)
 # ------------------------------
 st.subheader("Plasmids")
+render_freshness(["plasmids"])
 
 df_plasmids = fetch_plasmids(name_q.strip() or None, notes_q.strip() or None, id_q.strip() or None)
 
@@ -185,7 +242,7 @@ if df_plasmids.empty:
 
 # Build grid options from *all* columns
 gob = GridOptionsBuilder.from_dataframe(df_plasmids)
-gob.configure_selection(selection_mode="single", use_checkbox=True, rowMultiSelectWithClick=False)
+gob.configure_selection(selection_mode="multiple", use_checkbox=True, rowMultiSelectWithClick=False)
 
 # Helpful column sizing: tweak a few known fields; others use defaults
 if "id" in df_plasmids.columns:
@@ -217,25 +274,30 @@ grid = AgGrid(
 )
 
 selected_rows = grid.selected_rows
-selected_plasmid: Optional[dict] = dict(selected_rows[0]) if selected_rows else None
+selected_plasmids: list[dict] = [dict(r) for r in selected_rows] if selected_rows else []
 
 # ------------------------------
 # Linked elements (below selector)
 # ------------------------------
 st.subheader("Linked elements")
 
-if not selected_plasmid:
+if not selected_plasmids:
     st.caption("Select a plasmid above to see its linked elements.")
     st.stop()
 
-pid = selected_plasmid.get("id")
-pname = selected_plasmid.get("name")
-st.markdown(f"**Selected:** `{pname}` (id={pid})")
-
-df_links = fetch_plasmid_links(pid)
+# the links embed their elements: either table changing invalidates the cached links
+links_version = f'{table_version(sb, "plasmids_plasmid_elements")}/{table_version(sb, "plasmid_elements")}'
+if len(selected_plasmids) == 1:
+    pid = selected_plasmids[0].get("id")
+    pname = selected_plasmids[0].get("name")
+    st.markdown(f"**Selected:** `{pname}` (id={pid})")
+    df_links = fetch_plasmid_links(pid, links_version)
+else:
+    st.markdown("**Selected:** " + ", ".join(f"`{p.get('name')}` (id={p.get('id')})" for p in selected_plasmids))
+    df_links = fetch_links_for_plasmids(tuple(sorted(p.get("id") for p in selected_plasmids)), links_version)
 
 if df_links.empty:
-    st.info("No elements linked to this plasmid yet.")
+    st.info("No elements linked to the selected plasmids yet.")
     st.stop()
 
 st.dataframe(
@@ -1,9 +1,8 @@
-import os
 import streamlit as st
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from utils.sql_reader import get_engine
 
-db_url = os.environ.get("DATABASE_URL") or st.secrets["database"]["url"]
-engine = create_engine(db_url)
+engine = get_engine()
 
 schema = st.text_input("Schema", "public")
 
@@ -0,0 +1,106 @@
+-- Benchmark: fish_feature_summary, old 8-way join vs LATERAL view vs table.
+--
+--   psql "$DATABASE_URL" -v fish=20000 -v per=6 -f supabase/benchmarks/fish_feature_summary.sql
+--
+-- Builds a synthetic colony of :fish fish with :per links in each of the four
+-- categories, times the inserts (they fire the maintenance triggers of
+-- 20251019110000_fish_feature_summary_mat.sql), then runs the same list read
+-- three ways. Everything runs in one transaction and is rolled back.
+--
+-- What to expect: the old view reads fish x per^4 joined rows (1296 per fish
+-- at per=6), the LATERAL view reads fish x 4*per, and the table reads one row
+-- per fish whatever :per is.
+
+\set ON_ERROR_STOP on
+\if :{?fish}
+\else
+  \set fish 20000
+\endif
+\if :{?per}
+\else
+  \set per 6
+\endif
+\timing on
+
+BEGIN;
+
+-- -------- synthetic colony --------
+INSERT INTO transgenes (name) SELECT 'bench_tg_' || g FROM generate_series(1, 200) g;
+INSERT INTO mutations (name) SELECT 'bench_mu_' || g FROM generate_series(1, 200) g;
+INSERT INTO strains (name) SELECT 'bench_st_' || g FROM generate_series(1, 200) g;
+INSERT INTO treatments (treatment_type, treatment_name)
+SELECT 'drug', 'bench_tr_' || g FROM generate_series(1, 200) g;
+
+CREATE TEMP TABLE bench_fish ON COMMIT DROP AS
+WITH ins AS (
+  INSERT INTO fish (name) SELECT 'bench_fish_' || g FROM generate_series(1, :fish) g RETURNING id
+) SELECT id FROM ins;
+
+-- :per distinct catalog entries per fish and category (consecutive ids, offset by fish id)
+\echo 'link inserts (trigger maintenance included)'
+INSERT INTO fish_transgenes (fish_id, transgene_id)
+SELECT f.id, c.id FROM bench_fish f
+  JOIN LATERAL (SELECT id FROM transgenes WHERE name LIKE 'bench_tg_%' ORDER BY id OFFSET f.id % 150 LIMIT :per) c ON true;
+INSERT INTO fish_mutations (fish_id, mutation_id)
+SELECT f.id, c.id FROM bench_fish f
+  JOIN LATERAL (SELECT id FROM mutations WHERE name LIKE 'bench_mu_%' ORDER BY id OFFSET f.id % 150 LIMIT :per) c ON true;
+INSERT INTO fish_strains (fish_id, strain_id)
+SELECT f.id, c.id FROM bench_fish f
+  JOIN LATERAL (SELECT id FROM strains WHERE name LIKE 'bench_st_%' ORDER BY id OFFSET f.id % 150 LIMIT :per) c ON true;
+INSERT INTO fish_treatments (fish_id, treatment_id)
+SELECT f.id, c.id FROM bench_fish f
+  JOIN LATERAL (SELECT id FROM treatments WHERE treatment_name LIKE 'bench_tr_%' ORDER BY id OFFSET f.id % 150 LIMIT :per) c ON true;
+
+ANALYZE fish, fish_transgenes, fish_mutations, fish_strains, fish_treatments, fish_feature_summary_mat;
+
+-- -------- reads --------
+\echo 'old view: one 8-way LEFT JOIN + string_agg(DISTINCT ...)'
+CREATE TEMP VIEW old_fish_feature_summary AS
+SELECT f.id AS fish_id, f.name,
+       string_agg(DISTINCT tg.name, ', ' ORDER BY tg.name) AS transgenes,
+       string_agg(DISTINCT mu.name, ', ' ORDER BY mu.name) AS mutations,
+       string_agg(DISTINCT st.name, ', ' ORDER BY st.name) AS strains,
+       string_agg(DISTINCT (COALESCE(t.treatment_type::text, '') || ':' || COALESCE(t.treatment_name, '')), ', '
+                  ORDER BY (COALESCE(t.treatment_type::text, '') || ':' || COALESCE(t.treatment_name, ''))) AS treatments
+  FROM fish f
+  LEFT JOIN fish_transgenes ftg ON ftg.fish_id = f.id
+  LEFT JOIN transgenes tg ON tg.id = ftg.transgene_id
+  LEFT JOIN fish_mutations fmu ON fmu.fish_id = f.id
+  LEFT JOIN mutations mu ON mu.id = fmu.mutation_id
+  LEFT JOIN fish_strains fs ON fs.fish_id = f.id
+  LEFT JOIN strains st ON st.id = fs.strain_id
+  LEFT JOIN fish_treatments ftr ON ftr.fish_id = f.id
+  LEFT JOIN treatments t ON t.id = ftr.treatment_id
+ GROUP BY f.id, f.name;
+EXPLAIN (ANALYZE, BUFFERS, SUMMARY) SELECT * FROM old_fish_feature_summary;
+
+\echo 'new view: one LATERAL aggregate per category'
+EXPLAIN (ANALYZE, BUFFERS, SUMMARY) SELECT * FROM fish_feature_summary;
+
+\echo 'table: one row per fish'
+EXPLAIN (ANALYZE, BUFFERS, SUMMARY) SELECT * FROM fish_feature_summary_mat;
+
+\echo 'one page of 100, newest first (what the picker reads)'
+EXPLAIN (ANALYZE, BUFFERS, SUMMARY)
+SELECT m.* FROM fish_feature_summary_mat m JOIN fish f ON f.id = m.fish_id
+ ORDER BY f.created_at DESC, f.id DESC LIMIT 100;
+
+-- -------- maintenance --------
+\echo 'rename one transgene linked to ~:fish/150*:per fish'
+UPDATE transgenes SET name = name || '_renamed' WHERE name = 'bench_tg_100';
+
+\echo 'consistency check: rows where the old and the new view disagree (expect 0)'
+SELECT count(*) AS mismatched
+  FROM old_fish_feature_summary o
+  FULL JOIN fish_feature_summary v USING (fish_id)
+ WHERE (o.name, o.transgenes, o.mutations, o.strains, o.treatments)
+       IS DISTINCT FROM (v.name, v.transgenes, v.mutations, v.strains, v.treatments);
+
+\echo 'consistency check: rows where the table and the view disagree (expect 0)'
+SELECT count(*) AS mismatched
+  FROM fish_feature_summary v
+  JOIN fish_feature_summary_mat m USING (fish_id)
+ WHERE (v.name, v.transgenes, v.mutations, v.strains, v.treatments)
+       IS DISTINCT FROM (m.name, m.transgenes, m.mutations, m.strains, m.treatments);
+
+ROLLBACK;
@@ -0,0 +1,59 @@
+-- Per-table change counters for cheap "did anything change?" probes.
+--
+-- Every INSERT/UPDATE/DELETE/TRUNCATE statement on a catalog or link table
+-- bumps table_versions.version for that table. The app reads all counters in
+-- a single small request and only refetches a catalog when its counter moved.
+
+CREATE TABLE IF NOT EXISTS "public"."table_versions" (
+    "table_name" "text" NOT NULL,
+    "version" bigint DEFAULT 0 NOT NULL,
+    "changed_at" timestamp with time zone DEFAULT "now"() NOT NULL,
+    CONSTRAINT "table_versions_pkey" PRIMARY KEY ("table_name")
+);
+
+ALTER TABLE "public"."table_versions" OWNER TO "postgres";
+
+
+CREATE OR REPLACE FUNCTION "public"."bump_table_version"() RETURNS "trigger"
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+BEGIN
+  INSERT INTO table_versions AS v (table_name, version, changed_at)
+       VALUES (TG_TABLE_NAME, 1, now())
+  ON CONFLICT (table_name)
+    DO UPDATE SET version = v.version + 1, changed_at = now();
+  RETURN NULL;
+END;
+$$;
+
+ALTER FUNCTION "public"."bump_table_version"() OWNER TO "postgres";
+
+
+DO $$
+DECLARE
+  t text;
+BEGIN
+  FOREACH t IN ARRAY ARRAY[
+    'fish', 'fish_transgenes', 'fish_mutations', 'fish_strains', 'fish_treatments',
+    'transgenes', 'mutations', 'strains', 'treatments', 'plasmids', 'tanks',
+    'plasmids_plasmid_elements', 'plasmid_elements'
+  ] LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS "trg_bump_table_version" ON "public".%I', t);
+    EXECUTE format('DROP TRIGGER IF EXISTS "trg_bump_table_version_truncate" ON "public".%I', t);
+    EXECUTE format(
+      'CREATE TRIGGER "trg_bump_table_version" AFTER INSERT OR UPDATE OR DELETE ON "public".%I '
+      'FOR EACH STATEMENT EXECUTE FUNCTION "public"."bump_table_version"()', t);
+    EXECUTE format(
+      'CREATE TRIGGER "trg_bump_table_version_truncate" AFTER TRUNCATE ON "public".%I '
+      'FOR EACH STATEMENT EXECUTE FUNCTION "public"."bump_table_version"()', t);
+    INSERT INTO "public"."table_versions" ("table_name") VALUES (t) ON CONFLICT DO NOTHING;
+  END LOOP;
+END;
+$$;
+
+
+GRANT ALL ON TABLE "public"."table_versions" TO "service_role";
+GRANT SELECT ON TABLE "public"."table_versions" TO "authenticated";
+GRANT SELECT ON TABLE "public"."table_versions" TO "anon";
+GRANT ALL ON FUNCTION "public"."bump_table_version"() TO "service_role";
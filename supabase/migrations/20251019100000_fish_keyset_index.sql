@@ -0,0 +1,10 @@
+-- Keyset paging for the fish picker (utils/fish_picker.py).
+--
+-- Pages are read newest first with
+--   ORDER BY created_at DESC, id DESC
+--   WHERE created_at < :ts OR (created_at = :ts AND id < :id)
+-- so each page is one range scan of this index, independent of how deep the
+-- page is, instead of a sort of the whole fish table.
+
+CREATE INDEX IF NOT EXISTS "fish_created_at_id_idx"
+    ON "public"."fish" USING "btree" ("created_at" DESC, "id" DESC);
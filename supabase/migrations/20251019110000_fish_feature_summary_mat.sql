@@ -0,0 +1,258 @@
+-- One precomputed feature row per fish.
+--
+-- The old fish_feature_summary view LEFT JOINed all four link tables and
+-- their catalogs in one FROM clause, so each fish expanded to
+-- transgenes x mutations x strains x treatments rows before the
+-- string_agg(DISTINCT ...) calls collapsed them again. A fish with 6 of each
+-- costs 1296 joined rows, and every list view paid that for every fish.
+--
+-- This migration
+--   * rewrites the view with one LATERAL aggregate per category (the cost per
+--     fish is the sum of its links, not the product). The rows are the same
+--     as before: names stay DISTINCT, and treatments stays ':' for a fish
+--     without treatments (the old LEFT JOIN concatenated two NULLs),
+--   * adds fish_feature_summary_mat, the same rows stored as a table with a
+--     primary key on fish_id, so list views read one row per fish,
+--   * keeps the table current with triggers: a link change refreshes the fish
+--     it touches, a catalog rename refreshes the fish linked to that entry, a
+--     new fish gets its row, and a fish rename updates its name.
+--
+-- supabase/benchmarks/fish_feature_summary.sql compares the old view, the new
+-- view and the table on a synthetic colony.
+
+
+-- -------- view --------
+CREATE OR REPLACE VIEW "public"."fish_feature_summary" AS
+ SELECT "f"."id" AS "fish_id",
+    "f"."name",
+    "tg"."transgenes",
+    "mu"."mutations",
+    "st"."strains",
+    "tr"."treatments"
+   FROM "public"."fish" "f"
+     LEFT JOIN LATERAL (
+        SELECT "string_agg"(DISTINCT "c"."name", ', '::"text" ORDER BY "c"."name") AS "transgenes"
+          FROM "public"."fish_transgenes" "l"
+          JOIN "public"."transgenes" "c" ON ("c"."id" = "l"."transgene_id")
+         WHERE "l"."fish_id" = "f"."id") "tg" ON true
+     LEFT JOIN LATERAL (
+        SELECT "string_agg"(DISTINCT "c"."name", ', '::"text" ORDER BY "c"."name") AS "mutations"
+          FROM "public"."fish_mutations" "l"
+          JOIN "public"."mutations" "c" ON ("c"."id" = "l"."mutation_id")
+         WHERE "l"."fish_id" = "f"."id") "mu" ON true
+     LEFT JOIN LATERAL (
+        SELECT "string_agg"(DISTINCT "c"."name", ', '::"text" ORDER BY "c"."name") AS "strains"
+          FROM "public"."fish_strains" "l"
+          JOIN "public"."strains" "c" ON ("c"."id" = "l"."strain_id")
+         WHERE "l"."fish_id" = "f"."id") "st" ON true
+     LEFT JOIN LATERAL (
+        -- as in the old join: ':' for a fish without treatments, and for a link to a missing treatment
+        SELECT COALESCE("string_agg"(DISTINCT "x"."label", ', '::"text" ORDER BY "x"."label"), ':'::"text") AS "treatments"
+          FROM (SELECT (COALESCE(("c"."treatment_type")::"text", ''::"text") || ':'::"text") || COALESCE("c"."treatment_name", ''::"text") AS "label"
+                  FROM "public"."fish_treatments" "l"
+                  LEFT JOIN "public"."treatments" "c" ON ("c"."id" = "l"."treatment_id")
+                 WHERE "l"."fish_id" = "f"."id") "x") "tr" ON true;
+
+ALTER VIEW "public"."fish_feature_summary" OWNER TO "postgres";
+
+
+-- -------- table --------
+CREATE TABLE IF NOT EXISTS "public"."fish_feature_summary_mat" (
+    "fish_id" bigint NOT NULL,
+    "name" "text" NOT NULL,
+    "transgenes" "text",
+    "mutations" "text",
+    "strains" "text",
+    "treatments" "text",
+    "refreshed_at" timestamp with time zone DEFAULT "now"() NOT NULL,
+    CONSTRAINT "fish_feature_summary_mat_pkey" PRIMARY KEY ("fish_id"),
+    CONSTRAINT "fish_feature_summary_mat_fish_id_fkey" FOREIGN KEY ("fish_id") REFERENCES "public"."fish"("id") ON DELETE CASCADE
+);
+
+ALTER TABLE "public"."fish_feature_summary_mat" OWNER TO "postgres";
+
+
+-- -------- refresh --------
+CREATE OR REPLACE FUNCTION "public"."refresh_fish_feature_summary"("p_fish_ids" bigint[]) RETURNS void
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+BEGIN
+  IF p_fish_ids IS NULL OR cardinality(p_fish_ids) = 0 THEN
+    RETURN;
+  END IF;
+  -- Serialize refreshes of the same fish. A transaction that waits here reads
+  -- a fresh snapshot in the next statement, so it sees the link changes the
+  -- other transaction committed and does not overwrite them with stale text.
+  PERFORM 1 FROM fish WHERE id = ANY (p_fish_ids) ORDER BY id FOR NO KEY UPDATE;
+
+  INSERT INTO fish_feature_summary_mat AS m
+         (fish_id, name, transgenes, mutations, strains, treatments, refreshed_at)
+  SELECT s.fish_id, s.name, s.transgenes, s.mutations, s.strains, s.treatments, now()
+    FROM fish_feature_summary s
+   WHERE s.fish_id = ANY (p_fish_ids)
+  ON CONFLICT (fish_id) DO UPDATE
+     SET name = EXCLUDED.name,
+         transgenes = EXCLUDED.transgenes,
+         mutations = EXCLUDED.mutations,
+         strains = EXCLUDED.strains,
+         treatments = EXCLUDED.treatments,
+         refreshed_at = EXCLUDED.refreshed_at;
+END;
+$$;
+
+ALTER FUNCTION "public"."refresh_fish_feature_summary"(bigint[]) OWNER TO "postgres";
+
+
+-- link tables: statement-level, so a bulk insert refreshes each fish once
+CREATE OR REPLACE FUNCTION "public"."fish_feature_summary_links_changed"() RETURNS "trigger"
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+DECLARE
+  ids bigint[];
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    SELECT array_agg(DISTINCT fish_id) INTO ids FROM new_rows;
+  ELSIF TG_OP = 'DELETE' THEN
+    SELECT array_agg(DISTINCT fish_id) INTO ids FROM old_rows;
+  ELSIF TG_OP = 'UPDATE' THEN
+    SELECT array_agg(DISTINCT fish_id) INTO ids
+      FROM (SELECT fish_id FROM new_rows UNION SELECT fish_id FROM old_rows) u;
+  ELSE  -- TRUNCATE
+    SELECT array_agg(id) INTO ids FROM fish;
+  END IF;
+  PERFORM refresh_fish_feature_summary(ids);
+  RETURN NULL;
+END;
+$$;
+
+ALTER FUNCTION "public"."fish_feature_summary_links_changed"() OWNER TO "postgres";
+
+
+-- catalogs: only a rename changes the text; deletes cascade to the link tables
+CREATE OR REPLACE FUNCTION "public"."fish_feature_summary_catalog_changed"() RETURNS "trigger"
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+DECLARE
+  ids bigint[];
+BEGIN
+  IF TG_TABLE_NAME = 'transgenes' THEN
+    SELECT array_agg(DISTINCT l.fish_id) INTO ids
+      FROM fish_transgenes l JOIN new_rows n ON n.id = l.transgene_id JOIN old_rows o ON o.id = n.id
+     WHERE n.name IS DISTINCT FROM o.name;
+  ELSIF TG_TABLE_NAME = 'mutations' THEN
+    SELECT array_agg(DISTINCT l.fish_id) INTO ids
+      FROM fish_mutations l JOIN new_rows n ON n.id = l.mutation_id JOIN old_rows o ON o.id = n.id
+     WHERE n.name IS DISTINCT FROM o.name;
+  ELSIF TG_TABLE_NAME = 'strains' THEN
+    SELECT array_agg(DISTINCT l.fish_id) INTO ids
+      FROM fish_strains l JOIN new_rows n ON n.id = l.strain_id JOIN old_rows o ON o.id = n.id
+     WHERE n.name IS DISTINCT FROM o.name;
+  ELSIF TG_TABLE_NAME = 'treatments' THEN
+    SELECT array_agg(DISTINCT l.fish_id) INTO ids
+      FROM fish_treatments l JOIN new_rows n ON n.id = l.treatment_id JOIN old_rows o ON o.id = n.id
+     WHERE (n.treatment_type, n.treatment_name) IS DISTINCT FROM (o.treatment_type, o.treatment_name);
+  END IF;
+  PERFORM refresh_fish_feature_summary(ids);
+  RETURN NULL;
+END;
+$$;
+
+ALTER FUNCTION "public"."fish_feature_summary_catalog_changed"() OWNER TO "postgres";
+
+
+CREATE OR REPLACE FUNCTION "public"."fish_feature_summary_fish_inserted"() RETURNS "trigger"
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+BEGIN
+  INSERT INTO fish_feature_summary_mat (fish_id, name)
+  SELECT id, name FROM new_rows
+  ON CONFLICT (fish_id) DO NOTHING;
+  RETURN NULL;
+END;
+$$;
+
+ALTER FUNCTION "public"."fish_feature_summary_fish_inserted"() OWNER TO "postgres";
+
+
+CREATE OR REPLACE FUNCTION "public"."fish_feature_summary_fish_renamed"() RETURNS "trigger"
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+BEGIN
+  UPDATE fish_feature_summary_mat SET name = NEW.name, refreshed_at = now() WHERE fish_id = NEW.id;
+  RETURN NULL;
+END;
+$$;
+
+ALTER FUNCTION "public"."fish_feature_summary_fish_renamed"() OWNER TO "postgres";
+
+
+-- -------- triggers --------
+-- one trigger per event: transition tables are not allowed on multi-event
+-- triggers before PostgreSQL 11
+DO $$
+DECLARE
+  t text;
+BEGIN
+  FOREACH t IN ARRAY ARRAY['fish_transgenes', 'fish_mutations', 'fish_strains', 'fish_treatments'] LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS "trg_ffs_links_ins" ON "public".%I', t);
+    EXECUTE format('DROP TRIGGER IF EXISTS "trg_ffs_links_upd" ON "public".%I', t);
+    EXECUTE format('DROP TRIGGER IF EXISTS "trg_ffs_links_del" ON "public".%I', t);
+    EXECUTE format('DROP TRIGGER IF EXISTS "trg_ffs_links_truncate" ON "public".%I', t);
+    EXECUTE format(
+      'CREATE TRIGGER "trg_ffs_links_ins" AFTER INSERT ON "public".%I REFERENCING NEW TABLE AS new_rows '
+      'FOR EACH STATEMENT EXECUTE FUNCTION "public"."fish_feature_summary_links_changed"()', t);
+    EXECUTE format(
+      'CREATE TRIGGER "trg_ffs_links_upd" AFTER UPDATE ON "public".%I REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows '
+      'FOR EACH STATEMENT EXECUTE FUNCTION "public"."fish_feature_summary_links_changed"()', t);
+    EXECUTE format(
+      'CREATE TRIGGER "trg_ffs_links_del" AFTER DELETE ON "public".%I REFERENCING OLD TABLE AS old_rows '
+      'FOR EACH STATEMENT EXECUTE FUNCTION "public"."fish_feature_summary_links_changed"()', t);
+    EXECUTE format(
+      'CREATE TRIGGER "trg_ffs_links_truncate" AFTER TRUNCATE ON "public".%I '
+      'FOR EACH STATEMENT EXECUTE FUNCTION "public"."fish_feature_summary_links_changed"()', t);
+  END LOOP;
+
+  FOREACH t IN ARRAY ARRAY['transgenes', 'mutations', 'strains', 'treatments'] LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS "trg_ffs_catalog_upd" ON "public".%I', t);
+    EXECUTE format(
+      'CREATE TRIGGER "trg_ffs_catalog_upd" AFTER UPDATE ON "public".%I REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows '
+      'FOR EACH STATEMENT EXECUTE FUNCTION "public"."fish_feature_summary_catalog_changed"()', t);
+  END LOOP;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS "trg_ffs_fish_ins" ON "public"."fish";
+CREATE TRIGGER "trg_ffs_fish_ins" AFTER INSERT ON "public"."fish" REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION "public"."fish_feature_summary_fish_inserted"();
+
+DROP TRIGGER IF EXISTS "trg_ffs_fish_rename" ON "public"."fish";
+CREATE TRIGGER "trg_ffs_fish_rename" AFTER UPDATE OF "name" ON "public"."fish"
+    FOR EACH ROW WHEN (OLD."name" IS DISTINCT FROM NEW."name")
+    EXECUTE FUNCTION "public"."fish_feature_summary_fish_renamed"();
+
+
+-- -------- backfill --------
+INSERT INTO "public"."fish_feature_summary_mat" ("fish_id", "name", "transgenes", "mutations", "strains", "treatments")
+SELECT "fish_id", "name", "transgenes", "mutations", "strains", "treatments"
+  FROM "public"."fish_feature_summary"
+ON CONFLICT ("fish_id") DO NOTHING;
+
+
+-- the app probes table_versions before refetching (utils/table_versions.py)
+DROP TRIGGER IF EXISTS "trg_bump_table_version" ON "public"."fish_feature_summary_mat";
+CREATE TRIGGER "trg_bump_table_version" AFTER INSERT OR UPDATE OR DELETE ON "public"."fish_feature_summary_mat"
+    FOR EACH STATEMENT EXECUTE FUNCTION "public"."bump_table_version"();
+INSERT INTO "public"."table_versions" ("table_name") VALUES ('fish_feature_summary_mat') ON CONFLICT DO NOTHING;
+
+
+GRANT ALL ON TABLE "public"."fish_feature_summary_mat" TO "service_role";
+GRANT SELECT ON TABLE "public"."fish_feature_summary_mat" TO "authenticated";
+GRANT SELECT ON TABLE "public"."fish_feature_summary_mat" TO "anon";
+-- SECURITY DEFINER: only the triggers and the service role may refresh
+REVOKE ALL ON FUNCTION "public"."refresh_fish_feature_summary"(bigint[]) FROM PUBLIC, "anon", "authenticated";
+GRANT ALL ON FUNCTION "public"."refresh_fish_feature_summary"(bigint[]) TO "service_role";
@@ -0,0 +1,110 @@
+-- Genotype fingerprints: one hash per fish of its sorted transgene, mutation
+-- and strain ids.
+--
+--   genotype_fp = md5('t:' || transgene ids || '|m:' || mutation ids || '|s:' || strain ids)
+--
+-- The ids are ascending and comma-separated ('t:3,17|m:|s:2'). Two fish have
+-- the same fingerprint exactly when they carry the same three id sets.
+-- "Fish identical to this one" is then an index lookup, and "group the
+-- colony by genotype" is one GROUP BY genotype_fp. utils/fingerprints.py
+-- computes the same string client-side.
+--
+-- The fingerprint is a column of fish_feature_summary_mat (see
+-- *_fish_feature_summary_mat.sql), so the existing link-table triggers keep
+-- it current. Treatments are left out: they are applied to a fish, not
+-- inherited.
+
+
+-- -------- view --------
+CREATE OR REPLACE VIEW "public"."fish_feature_summary" AS
+ SELECT "f"."id" AS "fish_id",
+    "f"."name",
+    "tg"."transgenes",
+    "mu"."mutations",
+    "st"."strains",
+    "tr"."treatments",
+    "md5"(((((('t:'::"text" || COALESCE("tg"."ids", ''::"text")) || '|m:'::"text") || COALESCE("mu"."ids", ''::"text")) || '|s:'::"text") || COALESCE("st"."ids", ''::"text"))) AS "genotype_fp"
+   FROM "public"."fish" "f"
+     LEFT JOIN LATERAL (
+        SELECT "string_agg"(DISTINCT "c"."name", ', '::"text" ORDER BY "c"."name") AS "transgenes",
+               "string_agg"(("l"."transgene_id")::"text", ','::"text" ORDER BY "l"."transgene_id") AS "ids"
+          FROM "public"."fish_transgenes" "l"
+          JOIN "public"."transgenes" "c" ON ("c"."id" = "l"."transgene_id")
+         WHERE "l"."fish_id" = "f"."id") "tg" ON true
+     LEFT JOIN LATERAL (
+        SELECT "string_agg"(DISTINCT "c"."name", ', '::"text" ORDER BY "c"."name") AS "mutations",
+               "string_agg"(("l"."mutation_id")::"text", ','::"text" ORDER BY "l"."mutation_id") AS "ids"
+          FROM "public"."fish_mutations" "l"
+          JOIN "public"."mutations" "c" ON ("c"."id" = "l"."mutation_id")
+         WHERE "l"."fish_id" = "f"."id") "mu" ON true
+     LEFT JOIN LATERAL (
+        SELECT "string_agg"(DISTINCT "c"."name", ', '::"text" ORDER BY "c"."name") AS "strains",
+               "string_agg"(("l"."strain_id")::"text", ','::"text" ORDER BY "l"."strain_id") AS "ids"
+          FROM "public"."fish_strains" "l"
+          JOIN "public"."strains" "c" ON ("c"."id" = "l"."strain_id")
+         WHERE "l"."fish_id" = "f"."id") "st" ON true
+     LEFT JOIN LATERAL (
+        -- as in the old join: ':' for a fish without treatments, and for a link to a missing treatment
+        SELECT COALESCE("string_agg"(DISTINCT "x"."label", ', '::"text" ORDER BY "x"."label"), ':'::"text") AS "treatments"
+          FROM (SELECT (COALESCE(("c"."treatment_type")::"text", ''::"text") || ':'::"text") || COALESCE("c"."treatment_name", ''::"text") AS "label"
+                  FROM "public"."fish_treatments" "l"
+                  LEFT JOIN "public"."treatments" "c" ON ("c"."id" = "l"."treatment_id")
+                 WHERE "l"."fish_id" = "f"."id") "x") "tr" ON true;
+
+
+-- -------- table --------
+ALTER TABLE "public"."fish_feature_summary_mat" ADD COLUMN IF NOT EXISTS "genotype_fp" "text";
+
+CREATE INDEX IF NOT EXISTS "fish_feature_summary_mat_genotype_fp_idx"
+    ON "public"."fish_feature_summary_mat" USING "btree" ("genotype_fp");
+
+
+-- -------- refresh --------
+CREATE OR REPLACE FUNCTION "public"."refresh_fish_feature_summary"("p_fish_ids" bigint[]) RETURNS void
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+BEGIN
+  IF p_fish_ids IS NULL OR cardinality(p_fish_ids) = 0 THEN
+    RETURN;
+  END IF;
+  -- Serialize refreshes of the same fish. A transaction that waits here reads
+  -- a fresh snapshot in the next statement, so it sees the link changes the
+  -- other transaction committed and does not overwrite them with stale text.
+  PERFORM 1 FROM fish WHERE id = ANY (p_fish_ids) ORDER BY id FOR NO KEY UPDATE;
+
+  INSERT INTO fish_feature_summary_mat AS m
+         (fish_id, name, transgenes, mutations, strains, treatments, genotype_fp, refreshed_at)
+  SELECT s.fish_id, s.name, s.transgenes, s.mutations, s.strains, s.treatments, s.genotype_fp, now()
+    FROM fish_feature_summary s
+   WHERE s.fish_id = ANY (p_fish_ids)
+  ON CONFLICT (fish_id) DO UPDATE
+     SET name = EXCLUDED.name,
+         transgenes = EXCLUDED.transgenes,
+         mutations = EXCLUDED.mutations,
+         strains = EXCLUDED.strains,
+         treatments = EXCLUDED.treatments,
+         genotype_fp = EXCLUDED.genotype_fp,
+         refreshed_at = EXCLUDED.refreshed_at;
+END;
+$$;
+
+
+-- new fish get their full row (the fingerprint of an empty genotype), not just a name
+CREATE OR REPLACE FUNCTION "public"."fish_feature_summary_fish_inserted"() RETURNS "trigger"
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+BEGIN
+  PERFORM refresh_fish_feature_summary((SELECT array_agg(id) FROM new_rows));
+  RETURN NULL;
+END;
+$$;
+
+
+-- -------- backfill --------
+UPDATE "public"."fish_feature_summary_mat" "m"
+   SET "genotype_fp" = "s"."genotype_fp"
+  FROM "public"."fish_feature_summary" "s"
+ WHERE "s"."fish_id" = "m"."fish_id"
+   AND "m"."genotype_fp" IS DISTINCT FROM "s"."genotype_fp";
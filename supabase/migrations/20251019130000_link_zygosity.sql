@@ -0,0 +1,45 @@
+-- Zygosity per transgene and mutation link, for the offspring predictor
+-- (utils/mendel.py).
+--
+--   'hom'   homozygous: every offspring inherits a copy
+--   'het'   heterozygous: half the offspring do
+--   'hemi'  hemizygous (e.g. a single transgene insertion): half the offspring do
+--   NULL    not recorded; the predictor assumes 'het' and flags the row
+--
+-- Both columns are nullable. Existing rows and the create workflows keep
+-- working unchanged, and zygosity can be filled in gradually. The earlier
+-- schema had an unconstrained fish_mutations.zygosity text column. Its
+-- values are normalized the way mendel.transmission() reads them: trimmed,
+-- lower-cased, then hom/homo* -> 'hom', het/hete* -> 'het' and hemi* ->
+-- 'hemi'. Only values none of these match (blank, 'wt', typos, ...) become
+-- NULL, because the predictor cannot read them either.
+
+ALTER TABLE "public"."fish_mutations" ADD COLUMN IF NOT EXISTS "zygosity" "text";
+ALTER TABLE "public"."fish_transgenes" ADD COLUMN IF NOT EXISTS "zygosity" "text";
+
+UPDATE "public"."fish_mutations"
+   SET "zygosity" = CASE
+         WHEN "left"("lower"("btrim"("zygosity")), 4) IN ('hom', 'homo') THEN 'hom'
+         WHEN "left"("lower"("btrim"("zygosity")), 4) IN ('het', 'hete') THEN 'het'
+         WHEN "left"("lower"("btrim"("zygosity")), 4) = 'hemi' THEN 'hemi'
+       END
+ WHERE "zygosity" IS NOT NULL AND "zygosity" NOT IN ('hom', 'het', 'hemi');
+
+UPDATE "public"."fish_transgenes"
+   SET "zygosity" = CASE
+         WHEN "left"("lower"("btrim"("zygosity")), 4) IN ('hom', 'homo') THEN 'hom'
+         WHEN "left"("lower"("btrim"("zygosity")), 4) IN ('het', 'hete') THEN 'het'
+         WHEN "left"("lower"("btrim"("zygosity")), 4) = 'hemi' THEN 'hemi'
+       END
+ WHERE "zygosity" IS NOT NULL AND "zygosity" NOT IN ('hom', 'het', 'hemi');
+
+ALTER TABLE "public"."fish_mutations" DROP CONSTRAINT IF EXISTS "fish_mutations_zygosity_check";
+ALTER TABLE "public"."fish_mutations" ADD CONSTRAINT "fish_mutations_zygosity_check"
+    CHECK ("zygosity" IN ('hom', 'het', 'hemi'));
+
+ALTER TABLE "public"."fish_transgenes" DROP CONSTRAINT IF EXISTS "fish_transgenes_zygosity_check";
+ALTER TABLE "public"."fish_transgenes" ADD CONSTRAINT "fish_transgenes_zygosity_check"
+    CHECK ("zygosity" IN ('hom', 'het', 'hemi'));
+
+COMMENT ON COLUMN "public"."fish_mutations"."zygosity" IS 'hom | het | hemi; NULL = not recorded';
+COMMENT ON COLUMN "public"."fish_transgenes"."zygosity" IS 'hom | het | hemi; NULL = not recorded';
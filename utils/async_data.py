@@ -0,0 +1,246 @@
+# async_data.py
+"""
+Asyncio variant of the data-access helpers, on the async Supabase client.
+
+The app owns a single event loop that runs forever on a daemon thread and is
+shared by every session. Streamlit scripts stay synchronous and hand work to
+that loop with run_async(); inside a coroutine, independent queries run
+concurrently, bounded by a semaphore so one page cannot flood PostgREST.
+
+    frames = run_async(sb, afetch_many, [TableSpec("transgenes"), TableSpec("mutations")])
+    bundles = run_async(sb, afetch_fish_bundles, [mom_id, dad_id])
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+import pandas as pd
+import streamlit as st
+
+from utils_env import getenv
+from utils.catalog_snapshots import catalog_limit, read_snapshot, write_snapshot
+from utils.frames import build_frame
+from utils.loader import TableSpec, build_query
+from utils.table_versions import table_version
+
+# Optional: the async client ships with supabase>=2.4
+ASYNC_AVAILABLE = True
+try:
+    from supabase import acreate_client, AsyncClient  # type: ignore
+except Exception:
+    ASYNC_AVAILABLE = False
+    AsyncClient = Any  # type: ignore
+
+MAX_CONCURRENCY = int(getenv("ASYNC_MAX_CONCURRENCY", 8))
+IN_BATCH = 100  # ids per `in.(...)` filter; keeps request URLs short
+
+# every per-fish category the Mom/Dad pages summarize:
+# name -> (link table, link fk, target table, target columns); target None = rows live on the link table
+FISH_LINKS: dict[str, tuple[str, str, Optional[str], str]] = {
+    "transgenes": ("fish_transgenes", "transgene_id", "transgenes", "id,name,type,plasmid_id,description,created_at,created_by"),
+    "strains": ("fish_strains", "strain_id", "strains", "id,name,description"),
+    "mutations": ("fish_mutations", "mutation_id", "mutations", "id,name,gene,notes"),
+    "phenotypes": ("fish_selectedphenotypes", "selectedphenotype_id", "selectedphenotypes", "id,name,type,description"),
+    "treatments": ("fish_treatments", "treatment_id", "treatments", "id,name,type,description"),
+    "mounts": ("fish_mounts", "mount_id", "mounts", "id,name,type,description"),
+    "tanks": ("tanks", "fish_id", None, "id,name,location,description,created_at"),
+}
+
+
+# -------- app-owned event loop --------
+@st.cache_resource(show_spinner=False)
+def _app_loop() -> asyncio.AbstractEventLoop:
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="carp-async-loop", daemon=True).start()
+    return loop
+
+
+# loop-thread state: only touched from coroutines running on _app_loop()
+_clients: "OrderedDict[tuple, AsyncClient]" = OrderedDict()
+_sem: Optional[asyncio.Semaphore] = None
+
+
+def _semaphore() -> asyncio.Semaphore:
+    global _sem
+    if _sem is None:
+        _sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    return _sem
+
+
+def _client_params(sb) -> tuple[str, str, Optional[str]]:
+    """(url, key, user access token) of a sync client, read on the script thread."""
+    token = None
+    try:
+        s = sb.auth.get_session()
+        token = getattr(s, "access_token", None) if s else None
+    except Exception:
+        pass
+    return str(sb.supabase_url), sb.supabase_key, token
+
+
+async def _async_client(url: str, key: str, token: Optional[str]) -> AsyncClient:
+    # keyed by token so RLS sees the same user as the sync client
+    k = (url, key, token)
+    client = _clients.get(k)
+    if client is None:
+        client = await acreate_client(url, key)
+        if token:
+            client.postgrest.auth(token)
+        _clients[k] = client
+        while len(_clients) > 32:
+            _clients.popitem(last=False)
+    else:
+        _clients.move_to_end(k)
+    return client
+
+
+def run_async(sb, fn: Callable[..., Awaitable[Any]], *args, timeout: Optional[float] = 60, **kwargs) -> Any:
+    """
+    Run `await fn(client, *args, **kwargs)` on the app loop with an async
+    client for the same user as `sb`, and block the script until it is done.
+    """
+    if not ASYNC_AVAILABLE:
+        raise RuntimeError("The async Supabase client is not available; upgrade `supabase` to >= 2.4.")
+    params = _client_params(sb)
+    caller = contextvars.copy_context()
+
+    async def main():
+        # the task starts in the loop thread's context; carry over the caller's vars (query log run)
+        for var, value in caller.items():
+            var.set(value)
+        client = await _async_client(*params)
+        return await fn(client, *args, **kwargs)
+
+    return asyncio.run_coroutine_threadsafe(main(), _app_loop()).result(timeout)
+
+
+# -------- helpers (await these inside a coroutine) --------
+async def _execute(q):
+    async with _semaphore():
+        return await q.execute()
+
+
+async def afetch(client: AsyncClient, spec: TableSpec, chunk_size: int = 1000) -> pd.DataFrame:
+    """Async counterpart of loader.fetch_spec (always queries PostgREST)."""
+    limit = spec.limit or 10**9
+    rows: list[dict] = []
+    start = 0
+    while start < limit:
+        end = min(start + chunk_size, limit) - 1
+        batch = (await _execute(build_query(client, spec).range(start, end))).data or []
+        rows.extend(batch)
+        if len(batch) < end - start + 1:
+            break
+        start = end + 1
+    return build_frame(rows, spec.table)
+
+
+async def afetch_many(client: AsyncClient, specs: list[TableSpec]) -> dict[str, pd.DataFrame]:
+    frames = await asyncio.gather(*(afetch(client, s) for s in specs))
+    return {s.name: df for s, df in zip(specs, frames)}
+
+
+async def afetch_links(client: AsyncClient, table: str, fk: str, ids: list, select: str = "*",
+                       order: Optional[str] = None) -> pd.DataFrame:
+    """
+    Rows of `table` whose `fk` is in ids, one `in.(...)` request per IN_BATCH
+    ids, all batches in flight at once.
+    """
+    ids = sorted({i for i in ids if i is not None})
+    if not ids:
+        return pd.DataFrame()
+    batches = [ids[i:i + IN_BATCH] for i in range(0, len(ids), IN_BATCH)]
+
+    async def one(batch):
+        q = client.table(table).select(select).in_(fk, batch)
+        if order:
+            q = q.order(order)
+        return (await _execute(q)).data or []
+
+    parts = await asyncio.gather(*(one(b) for b in batches))
+    return build_frame([r for part in parts for r in part], table)
+
+
+async def ainsert(client: AsyncClient, table: str, rows: list[dict]) -> list[dict]:
+    """Bulk insert in one request; returns the inserted rows."""
+    if not rows:
+        return []
+    return (await _execute(client.table(table).insert(rows))).data or []
+
+
+async def ainsert_many(client: AsyncClient, batches: dict[str, list[dict]]) -> dict[str, Optional[str]]:
+    """Insert into several tables concurrently; returns {table: error message or None}."""
+    tables = [t for t, rows in batches.items() if rows]
+    results = await asyncio.gather(*(ainsert(client, t, batches[t]) for t in tables), return_exceptions=True)
+    return {t: (str(r) or type(r).__name__) if isinstance(r, Exception) else None for t, r in zip(tables, results)}
+
+
+async def _afetch_category(client: AsyncClient, category: str, fish_id: int) -> pd.DataFrame:
+    link_table, fk, target, cols = FISH_LINKS[category]
+    if target is None:
+        q = client.table(link_table).select(cols).eq("fish_id", fish_id).order("created_at", desc=True)
+        return build_frame((await _execute(q)).data, link_table)
+    link = (await _execute(client.table(link_table).select(fk).eq("fish_id", fish_id))).data or []
+    ids = sorted({r[fk] for r in link if r.get(fk) is not None})
+    if not ids:
+        return pd.DataFrame(columns=cols.split(","))
+    out = (await _execute(client.table(target).select(cols).in_("id", ids).order("name"))).data or []
+    return build_frame(out, target)
+
+
+async def afetch_fish_bundles(client: AsyncClient, fish_ids: list[int]) -> dict[int, dict[str, Any]]:
+    """
+    Every FISH_LINKS category for every fish, gathered concurrently:
+    {fish_id: {"transgenes": df, "strains": df, ..., "errors": {}}}. A
+    category that fails (e.g. a table missing in this schema) comes back
+    empty, with its error message in the bundle's "errors".
+    """
+    keys = [(fid, cat) for fid in fish_ids for cat in FISH_LINKS]
+    results = await asyncio.gather(*(_afetch_category(client, cat, fid) for fid, cat in keys), return_exceptions=True)
+    out: dict[int, dict[str, Any]] = {fid: {"errors": {}} for fid in fish_ids}
+    for (fid, cat), res in zip(keys, results):
+        if isinstance(res, pd.DataFrame):
+            out[fid][cat] = res
+        else:
+            out[fid][cat] = pd.DataFrame()
+            out[fid]["errors"][cat] = str(res) or type(res).__name__
+    return out
+
+
+def bundles_complete(bundles: dict[int, dict[str, Any]]) -> bool:
+    """keep= predicate for bounded_cache: cache fish bundles only when no category failed."""
+    return not any(b.get("errors") for b in bundles.values())
+
+
+# -------- sync entry points for pages --------
+def warm_catalogs(sb, names: list[str]) -> dict[str, str]:
+    """
+    Fetch every catalog that has no snapshot yet in one concurrent gather and
+    write the snapshots, so the following load_catalog() calls never block
+    one table at a time. Returns {table: error} for tables that failed.
+    """
+    missing = [n for n in names if read_snapshot(n) is None]
+    if not missing or not ASYNC_AVAILABLE:
+        return {}
+    versions = {n: table_version(sb, n) for n in missing}
+
+    async def fetch_all(client):
+        specs = [TableSpec(n, limit=catalog_limit(n)) for n in missing]
+        frames = await asyncio.gather(*(afetch(client, s) for s in specs), return_exceptions=True)
+        return dict(zip(missing, frames))
+
+    errors: dict[str, str] = {}
+    for name, df in run_async(sb, fetch_all).items():
+        if isinstance(df, Exception):
+            errors[name] = str(df) or type(df).__name__
+            continue
+        try:
+            write_snapshot(name, df, version=versions.get(name))
+        except Exception as e:
+            # load_catalog will fetch it the slow way
+            errors[name] = str(e)
+    return errors
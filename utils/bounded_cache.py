@@ -0,0 +1,223 @@
+# bounded_cache.py
+"""
+Bounded in-process caches for the per-fish fetchers.
+
+st.cache_data without max_entries/ttl keeps every fish anyone ever opened.
+bounded_cache(group) keeps live values in one LRU per helper group, evicting
+least-recently-used entries once the group exceeds its byte budget (sizes via
+cache_registry.deep_size) or entry cap; entries older than the group's TTL are
+recomputed. All helpers of a group share the budget, so a burst of one kind of
+lookup cannot push the process past it.
+
+    @bounded_cache("per_fish")
+    def fetch_strains_for_fish(fish_id: int): ...
+
+Budgets come from POLICIES and can be overridden per group with env vars,
+e.g. CACHE_PER_FISH_MB=128, CACHE_PER_FISH_TTL=900, CACHE_PER_FISH_ENTRIES=5000.
+Cached values are shared by all sessions; DataFrames are handed out as copies.
+"""
+from __future__ import annotations
+
+import functools
+import inspect
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import pandas as pd
+
+from utils_env import getenv
+from utils.cache_registry import call_key, deep_size, short_label
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    max_bytes: int
+    ttl: Optional[float] = None      # seconds; None = until evicted
+    max_entries: Optional[int] = None
+
+
+def _policy_from_env(group: str, default: CachePolicy) -> CachePolicy:
+    prefix = f"CACHE_{group.upper()}_"
+    mb, ttl, entries = getenv(prefix + "MB"), getenv(prefix + "TTL"), getenv(prefix + "ENTRIES")
+    return CachePolicy(
+        max_bytes=int(float(mb) * 2**20) if mb else default.max_bytes,
+        ttl=(float(ttl) or None) if ttl else default.ttl,
+        max_entries=int(entries) if entries else default.max_entries,
+    )
+
+
+POLICIES: dict[str, CachePolicy] = {
+    "per_fish": CachePolicy(max_bytes=64 * 2**20, ttl=600, max_entries=20000),
+    "parent_bundles": CachePolicy(max_bytes=32 * 2**20, ttl=600, max_entries=2000),
+    "fish_pages": CachePolicy(max_bytes=16 * 2**20, ttl=300, max_entries=500),
+    "feature_index": CachePolicy(max_bytes=64 * 2**20, ttl=3600, max_entries=8),
+    "pedigree": CachePolicy(max_bytes=16 * 2**20, ttl=3600, max_entries=4),
+}
+DEFAULT_POLICY = CachePolicy(max_bytes=32 * 2**20, ttl=600)
+
+
+class BoundedCache:
+    """LRU over (function, args) keys with a byte budget, TTL and counters."""
+
+    def __init__(self, group: str, policy: CachePolicy):
+        self.group = group
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[tuple, tuple[float, int, Any]]" = OrderedDict()  # key -> (stored_at, size, value)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def get(self, key: tuple) -> tuple[bool, Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                stored_at, size, value = item
+                if self.policy.ttl is None or time.time() - stored_at <= self.policy.ttl:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._items[key]
+                self.bytes -= size
+                self.expired += 1
+            self.misses += 1
+            return False, None
+
+    def put(self, key: tuple, value: Any) -> None:
+        size = deep_size(value)
+        if size > self.policy.max_bytes:
+            return  # never cache something that would evict the whole group
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._items[key] = (time.time(), size, value)
+            self.bytes += size
+            while self._items and (
+                self.bytes > self.policy.max_bytes
+                or (self.policy.max_entries and len(self._items) > self.policy.max_entries)
+            ):
+                _, (_, s, _) = self._items.popitem(last=False)
+                self.bytes -= s
+                self.evicted += 1
+
+    def discard(self, predicate: Callable[[tuple], bool]) -> int:
+        with self._lock:
+            keys = [k for k in self._items if predicate(k)]
+            for k in keys:
+                self.bytes -= self._items.pop(k)[1]
+        return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "group": self.group,
+                "entries": len(self._items),
+                "bytes": self.bytes,
+                "budget": self.policy.max_bytes,
+                "ttl_s": self.policy.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+    def entries(self) -> pd.DataFrame:
+        now = time.time()
+        with self._lock:
+            rows = [
+                {"group": self.group, "function": k[0], "args": short_label(k[1]), "age_s": round(now - t, 1), "size": s}
+                for k, (t, s, _) in self._items.items()
+            ]
+        return pd.DataFrame(rows, columns=["group", "function", "args", "age_s", "size"])
+
+
+_groups: dict[str, BoundedCache] = {}
+_groups_lock = threading.Lock()
+
+
+def get_group(group: str) -> BoundedCache:
+    with _groups_lock:
+        cache = _groups.get(group)
+        if cache is None:
+            cache = _groups[group] = BoundedCache(group, _policy_from_env(group, POLICIES.get(group, DEFAULT_POLICY)))
+        return cache
+
+
+def _copy(value: Any) -> Any:
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    return value
+
+
+def no_errors(value: Any) -> bool:
+    """keep= predicate: cache only results without load errors in .attrs["errors"]."""
+    return not getattr(value, "attrs", {}).get("errors")
+
+
+def bounded_cache(group: str, keep: Optional[Callable[[Any], bool]] = None) -> Callable:
+    """
+    Cache a function's results in the named group (see POLICIES). With
+    `keep`, results for which it returns False are handed out but not stored
+    (e.g. keep=no_errors for partial loads).
+    """
+
+    def decorate(fn: Callable) -> Callable:
+        name = f"{os.path.basename(fn.__code__.co_filename)}:{fn.__qualname__}"
+        sig = inspect.signature(fn)
+        cache = get_group(group)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (name, call_key(sig, args, kwargs))
+            hit, value = cache.get(key)
+            if not hit:
+                value = fn(*args, **kwargs)
+                if keep is None or keep(value):
+                    cache.put(key, value)
+            return _copy(value)
+
+        def clear(*args, **kwargs):
+            if args or kwargs:
+                key = (name, call_key(sig, args, kwargs))
+                cache.discard(lambda k: k == key)
+            else:
+                cache.discard(lambda k: k[0] == name)
+
+        wrapper.clear = clear
+        return wrapper
+
+    return decorate
+
+
+# -------- reporting --------
+def group_stats() -> pd.DataFrame:
+    with _groups_lock:
+        groups = list(_groups.values())
+    return pd.DataFrame([g.stats() for g in groups])
+
+
+def all_entries() -> pd.DataFrame:
+    with _groups_lock:
+        groups = list(_groups.values())
+    frames = [g.entries() for g in groups]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def evict(pattern: str) -> int:
+    """Drop entries whose "function(args)" matches the regex, in every group."""
+    rx = re.compile(pattern)
+    with _groups_lock:
+        groups = list(_groups.values())
+    return sum(g.discard(lambda k: bool(rx.search(f"{k[0]}({k[1]})"))) for g in groups)
@@ -0,0 +1,150 @@
+# bulk_read.py
+"""
+Bulk PostgREST reads without per-row dicts.
+
+Full-table loads (fetch_all, catalog snapshots, TableSpec loads) page through
+a table 1000 rows at a time. Reading the JSON pages builds a dict per row and
+a Python object per cell, and then build_frame walks them all again.
+
+read_frame() asks PostgREST for `text/csv` instead. pyarrow.csv parses each
+page straight into Arrow columns, using the types from utils.frames.arrow_type
+(ids as int64, created_at as timestamp, text kept as text even when it looks
+numeric). The pages are concatenated and typed with frame_from_arrow, so the
+result matches build_frame's output.
+
+    df = read_frame(lambda: sb.table("fish").select("*"), "fish", limit=50000)
+
+CSV is only used where it is lossless: tables described in frames.COLUMNS
+(scalar columns only) and selects without embedded resources. Everything
+else, and any page whose CSV does not parse, is read as JSON (decoded by
+postgrest's pydantic-core parser, not stdlib json). BULK_CSV=0 turns the CSV
+path off.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Callable, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from utils_env import getenv
+from utils.frames import COLUMNS, PRIMARY_KEYS, arrow_type, build_frame, frame_from_arrow
+
+BULK_CSV = str(getenv("BULK_CSV", "1")).lower() not in ("0", "false", "no", "off")
+CHUNK_SIZE = 1000  # PostgREST's default max-rows; larger pages come back truncated
+
+
+class _CsvUnavailable(Exception):
+    pass
+
+
+def csv_supported(table: str, select: str = "*") -> bool:
+    return BULK_CSV and table in COLUMNS and "(" not in select
+
+
+def _by_key(make_query: Callable[[], Any], table: str, select: str) -> Callable[[], Any]:
+    """
+    make_query() ordered by the table's primary key (after any order it already
+    has), so consecutive .range() pages are disjoint and cover every row. Left
+    as is when the key is unknown or not selected.
+    """
+    key = PRIMARY_KEYS.get(table)
+    cols = {c.strip() for c in re.sub(r"\([^()]*\)", "", select).split(",")}
+    if not key or not ("*" in cols or cols.issuperset(key)):
+        return make_query
+
+    def query():
+        q = make_query()
+        for c in key:
+            q = q.order(c)
+        return q
+    return query
+
+
+# -------- CSV pages --------
+def _parse_csv(text: str, table: str) -> pa.Table:
+    """
+    PostgREST's CSV rows are Postgres composite literals: NULL is an empty
+    field, an empty string is "", booleans are t/f, and quoted values escape
+    backslashes. Only the empty field is NULL: text such as NA, N/A or null
+    is data (pyarrow's default null list would drop it).
+    """
+    data = text.encode()
+    header = data.split(b"\n", 1)[0].decode().split(",")
+    types = {c: t for c in header if (t := arrow_type(table, c)) is not None}
+    return pacsv.read_csv(
+        pa.BufferReader(data),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True, escape_char="\\"),
+        convert_options=pacsv.ConvertOptions(
+            column_types=types,
+            null_values=[""], true_values=["t"], false_values=["f"],
+            strings_can_be_null=True, quoted_strings_can_be_null=False,
+        ),
+    )
+
+
+def _csv_page(query) -> Optional[str]:
+    text = query.csv().execute().data
+    if isinstance(text, list) and not text:
+        return None  # an empty body is parsed as [] by postgrest: no more rows
+    if not isinstance(text, str):
+        raise _CsvUnavailable(f"expected CSV, got {type(text).__name__}")
+    if not text.strip():
+        return None  # no rows: PostgREST sends an empty body
+    return text
+
+
+def _read_csv(make_query: Callable[[], Any], table: str, limit: int, chunk_size: int) -> pd.DataFrame:
+    pages: list[pa.Table] = []
+    start = 0
+    while start < limit:
+        end = min(start + chunk_size, limit) - 1
+        text = _csv_page(make_query().range(start, end))
+        if text is None:
+            break
+        try:
+            page = _parse_csv(text, table)
+        except pa.ArrowException as e:
+            raise _CsvUnavailable(str(e)) from e
+        pages.append(page)
+        if page.num_rows < end - start + 1:
+            break
+        start = end + 1
+    if not pages:
+        return pd.DataFrame()
+    # pages can differ in inferred types (e.g. a column that is all-null in one page)
+    return frame_from_arrow(pa.concat_tables(pages, promote_options="permissive"), table)
+
+
+# -------- JSON pages --------
+def _read_json(make_query: Callable[[], Any], table: str, limit: int, chunk_size: int) -> pd.DataFrame:
+    rows: list[dict] = []
+    start = 0
+    while start < limit:
+        end = min(start + chunk_size, limit) - 1
+        batch = make_query().range(start, end).execute().data or []
+        rows.extend(batch)
+        if len(batch) < end - start + 1:
+            break
+        start = end + 1
+    return build_frame(rows, table)
+
+
+def read_frame(make_query: Callable[[], Any], table: str, limit: Optional[int] = None,
+               chunk_size: int = CHUNK_SIZE, select: str = "*") -> pd.DataFrame:
+    """
+    Page through make_query() (a fresh, filtered builder per call; no range
+    applied) up to `limit` rows and return a typed frame. `select` is what the
+    builder selects, used to decide whether CSV is safe. Pages are ordered by
+    the primary key (frames.PRIMARY_KEYS) so they stay stable between requests.
+    """
+    limit = limit or 10**9
+    make_query = _by_key(make_query, table, select)
+    if csv_supported(table, select):
+        try:
+            return _read_csv(make_query, table, limit, chunk_size)
+        except _CsvUnavailable:
+            pass
+    return _read_json(make_query, table, limit, chunk_size)
@@ -0,0 +1,331 @@
+# cache_registry.py
+"""
+Memory accounting for cached data and session state.
+
+tracked_cache_data is a drop-in for st.cache_data that also records, per
+cached call, hits, misses, when the value was computed and its deep size:
+
+    @tracked_cache_data(show_spinner=False)
+    def fetch_transgenes_for_fish(fish_id: int): ...
+
+The registry is per process (like the caches themselves) and survives page
+reruns, which redefine the decorated functions. Streamlit's own byte counts
+(the pickled values st.cache_data actually holds) come from cache_stats().
+pages/admin_memory.py renders all of this.
+"""
+from __future__ import annotations
+
+import functools
+import inspect
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils_env import getenv
+
+MAX_TRACKED_ENTRIES = int(getenv("CACHE_REGISTRY_MAX_ENTRIES", 2000))  # labels kept per function
+TRACEMALLOC_FRAMES = int(getenv("TRACEMALLOC_FRAMES", 10))
+
+_lock = threading.Lock()
+_functions: dict[str, "TrackedFunction"] = {}
+
+
+# -------- sizes --------
+def deep_size(obj: Any, _seen: Optional[set] = None, _depth: int = 0) -> int:
+    """Approximate retained size in bytes; DataFrames/arrays report their buffers."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen or _depth > 20:
+        return 0
+    _seen.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        try:
+            mem = obj.memory_usage(deep=True)
+            return int(mem.sum() if hasattr(mem, "sum") else mem)
+        except Exception:
+            return sys.getsizeof(obj)
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if hasattr(obj, "nbytes") and type(obj).__module__.startswith("pyarrow"):
+        return int(obj.nbytes)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return sys.getsizeof(obj)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += deep_size(k, _seen, _depth + 1) + deep_size(v, _seen, _depth + 1)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for v in obj:
+            size += deep_size(v, _seen, _depth + 1)
+    elif hasattr(obj, "__dict__"):
+        size += deep_size(vars(obj), _seen, _depth + 1)
+    return size
+
+
+def fmt_bytes(n: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(n) < 1024 or unit == "GiB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+# -------- tracked st.cache_data --------
+def call_key(sig: Optional[inspect.Signature], args: tuple, kwargs: dict) -> str:
+    """The full bound arguments; like Streamlit's cache key, "_"-prefixed parameters are left out."""
+    try:
+        bound = sig.bind(*args, **kwargs).arguments.items()
+    except Exception:
+        bound = [(str(i), a) for i, a in enumerate(args)] + list(kwargs.items())
+    return ", ".join(f"{k}={v!r}" for k, v in bound if not k.startswith("_"))
+
+
+def short_label(key: str) -> str:
+    """A call key cut for display; never use it to tell calls apart."""
+    return key if len(key) <= 200 else key[:197] + "..."
+
+
+def call_label(sig: Optional[inspect.Signature], args: tuple, kwargs: dict) -> str:
+    return short_label(call_key(sig, args, kwargs))
+
+
+class TrackedFunction:
+    """Per-function counters; one instance per (file, qualname) for the process."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.entries: dict[str, dict] = {}  # label -> {args, kwargs, calls, misses, computed_at, size}
+        self.clear: Optional[Callable] = None
+
+    def touch(self, label: str, args: tuple, kwargs: dict) -> None:
+        with _lock:
+            self.calls += 1
+            e = self.entries.get(label)
+            if e is None:
+                if len(self.entries) >= MAX_TRACKED_ENTRIES:
+                    self.entries.pop(next(iter(self.entries)))
+                e = self.entries[label] = {
+                    "args": args, "kwargs": kwargs, "calls": 0, "misses": 0, "computed_at": None, "size": None,
+                }
+            e["calls"] += 1
+
+    def computed(self, label: str, value: Any) -> None:
+        size = deep_size(value)
+        with _lock:
+            e = self.entries.get(label)
+            if e is not None:
+                e["misses"] += 1
+                e["computed_at"] = time.time()
+                e["size"] = size
+
+    def evict(self, label: Optional[str] = None) -> int:
+        """Clear one entry (or all of them) from the underlying st.cache_data."""
+        if self.clear is None:
+            return 0
+        if label is None:
+            self.clear()
+            with _lock:
+                n = len(self.entries)
+                self.entries.clear()
+            return n
+        with _lock:
+            e = self.entries.pop(label, None)
+        if e is None:
+            return 0
+        try:
+            self.clear(*e["args"], **e["kwargs"])
+        except TypeError:
+            # older Streamlit: clear() takes no arguments
+            self.clear()
+        return 1
+
+
+def tracked_cache_data(func: Optional[Callable] = None, **cache_kwargs):
+    """st.cache_data plus hit/miss/size/age accounting in the registry."""
+
+    def decorate(fn: Callable) -> Callable:
+        name = f"{os.path.basename(fn.__code__.co_filename)}:{fn.__qualname__}"
+        with _lock:
+            tracked = _functions.setdefault(name, TrackedFunction(name))
+        try:
+            sig = inspect.signature(fn)
+        except (TypeError, ValueError):
+            sig = None
+
+        # wraps() keeps __module__/__qualname__/__wrapped__, so Streamlit keys the
+        # cache (and hashes/ignores "_" arguments) exactly as for fn itself
+        @functools.wraps(fn)
+        def compute(*args, **kwargs):
+            value = fn(*args, **kwargs)
+            tracked.computed(call_label(sig, args, kwargs), value)
+            return value
+
+        cached = st.cache_data(**cache_kwargs)(compute)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracked.touch(call_label(sig, args, kwargs), args, kwargs)
+            return cached(*args, **kwargs)
+
+        wrapper.clear = cached.clear
+        tracked.clear = cached.clear
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
+
+
+def tracked_entries() -> pd.DataFrame:
+    now = time.time()
+    rows = []
+    with _lock:
+        for f in _functions.values():
+            for label, e in f.entries.items():
+                rows.append({
+                    "function": f.name,
+                    "args": label,
+                    "hits": max(e["calls"] - e["misses"], 0),
+                    "misses": e["misses"],
+                    "age_s": round(now - e["computed_at"], 1) if e["computed_at"] else None,
+                    "size": e["size"],
+                })
+    return pd.DataFrame(rows, columns=["function", "args", "hits", "misses", "age_s", "size"])
+
+
+def evict(pattern: str) -> int:
+    """
+    Evict tracked entries whose "function(args)" matches the regex; a pattern
+    matching a bare function name clears that whole cache.
+    """
+    rx = re.compile(pattern)
+    n = 0
+    with _lock:
+        funcs = list(_functions.values())
+    for f in funcs:
+        if rx.fullmatch(f.name) or rx.fullmatch(f.name.split(":", 1)[-1]):
+            n += f.evict()
+            continue
+        for label in [l for l in list(f.entries) if rx.search(f"{f.name}({l})")]:
+            n += f.evict(label)
+    return n
+
+
+# -------- Streamlit's own cache stats --------
+def cache_stats() -> pd.DataFrame:
+    """Bytes held per cached function, as reported by Streamlit (all caches, tracked or not)."""
+    rows = []
+    providers = []
+    try:
+        from streamlit.runtime.caching.cache_data_api import get_data_cache_stats_provider
+        providers.append(get_data_cache_stats_provider())
+    except Exception:
+        pass
+    try:
+        from streamlit.runtime.caching.cache_resource_api import get_resource_cache_stats_provider
+        providers.append(get_resource_cache_stats_provider())
+    except Exception:
+        pass
+    for p in providers:
+        stats = p.get_stats()
+        if isinstance(stats, dict):
+            stats = [s for group in stats.values() for s in group]
+        rows += [{"category": s.category_name, "cache": s.cache_name, "bytes": s.byte_length} for s in stats]
+    df = pd.DataFrame(rows, columns=["category", "cache", "bytes"])
+    if df.empty:
+        return df.assign(entries=[])
+    return (
+        df.groupby(["category", "cache"])
+          .agg(entries=("bytes", "size"), bytes=("bytes", "sum"))
+          .reset_index()
+          .sort_values("bytes", ascending=False)
+          .reset_index(drop=True)
+    )
+
+
+# -------- session state --------
+def session_state_sizes(state=None) -> pd.DataFrame:
+    state = st.session_state if state is None else state
+    rows = []
+    for k in list(state.keys()):
+        try:
+            v = state[k]
+        except Exception:
+            continue
+        rows.append({"key": str(k), "type": type(v).__name__, "size": deep_size(v)})
+    return pd.DataFrame(rows, columns=["key", "type", "size"]).sort_values("size", ascending=False).reset_index(drop=True)
+
+
+def all_sessions_sizes() -> pd.DataFrame:
+    """Session-state size of every connected session (uses Streamlit runtime internals)."""
+    rows = []
+    try:
+        from streamlit.runtime import Runtime
+        mgr = Runtime.instance()._session_mgr
+        for info in mgr.list_active_sessions():
+            state = info.session.session_state
+            sizes = session_state_sizes(state)
+            rows.append({
+                "session": info.session.id,
+                "keys": len(sizes),
+                "size": int(sizes["size"].sum()) if not sizes.empty else 0,
+                "largest": sizes["key"].iloc[0] if not sizes.empty else "",
+            })
+    except Exception:
+        pass
+    return pd.DataFrame(rows, columns=["session", "keys", "size", "largest"])
+
+
+def evict_session_keys(pattern: str) -> list[str]:
+    rx = re.compile(pattern)
+    gone = [k for k in list(st.session_state.keys()) if rx.search(str(k))]
+    for k in gone:
+        del st.session_state[k]
+    return gone
+
+
+# -------- tracemalloc --------
+_tm_prev: Optional[tracemalloc.Snapshot] = None
+
+
+def tracemalloc_diff(limit: int = 25) -> Optional[pd.DataFrame]:
+    """
+    Allocation growth by source line since the previous call (any session).
+    The first call starts tracing and returns None.
+    """
+    global _tm_prev
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        _tm_prev = tracemalloc.take_snapshot()
+        return None
+    snap = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+    prev, _tm_prev = _tm_prev, snap
+    if prev is None:
+        return None
+    rows = [
+        {
+            "where": str(d.traceback[0]) if d.traceback else "?",
+            "size_diff": d.size_diff,
+            "size": d.size,
+            "count_diff": d.count_diff,
+        }
+        for d in snap.compare_to(prev, "lineno")[:limit]
+    ]
+    return pd.DataFrame(rows, columns=["where", "size_diff", "size", "count_diff"])
+
+
+def tracemalloc_stop() -> None:
+    global _tm_prev
+    _tm_prev = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
@@ -0,0 +1,324 @@
+# catalog_snapshots.py
+"""
+Catalog tables (transgenes, mutations, treatments, ...) as Arrow IPC snapshots.
+
+A snapshot is written once to CATALOG_SNAPSHOT_DIR/<table>.arrow and then
+memory-mapped read-only. The mapped table and its pandas view live in
+st.cache_resource, so every session in the process shares the same pages
+(and every process on the host shares the same page cache) instead of each
+session holding its own unpickled copy out of st.cache_data.
+
+Stale snapshots are served immediately and refreshed on a background worker
+(stale-while-revalidate); the new file is swapped in atomically, so a page
+only ever blocks on the very first load of a table. Before refetching, the
+worker asks utils.table_versions whether the table changed at all; if not,
+only its check time is recorded (a sidecar file; the snapshot itself is left
+alone so its mappings stay cached) and the refresh costs a 1-row request.
+A fetch that fills the catalog's row cap (catalog_limit) is logged and
+flagged in render_freshness rather than silently truncated.
+
+Frames returned here are shared: never mutate them in place, take a .copy().
+"""
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from utils_env import getenv
+from utils.bulk_read import read_frame
+from utils.sql_reader import read_sql, sql_available, table_sql
+from utils.table_versions import forget as forget_version, table_version
+
+SNAPSHOT_DIR = getenv("CATALOG_SNAPSHOT_DIR") or os.path.join(tempfile.gettempdir(), "carp_catalogs")
+# stale checks are cheap version probes, so snapshots can be re-validated often
+SNAPSHOT_TTL = int(getenv("CATALOG_SNAPSHOT_TTL", 60))
+# build snapshots over DATABASE_URL instead of PostgREST (bypasses RLS; opt-in)
+SNAPSHOT_FROM_SQL = str(getenv("CATALOG_SNAPSHOT_SQL", "0")).lower() in ("1", "true", "yes", "on")
+VERSION_KEY = b"carp.version"
+CAPPED_KEY = b"carp.capped"   # set to the row cap when the fetch hit it
+# row cap per catalog. Every page shares one snapshot per table, so the cap
+# belongs to the catalog, not to whichever caller happens to build it first.
+DEFAULT_LIMIT = 10000
+CATALOG_LIMITS = {"plasmids": 50000}
+
+_locks: dict[str, threading.RLock] = {}
+_locks_guard = threading.Lock()
+
+# background refreshes: one worker pool per process, at most one job per table
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="catalog-refresh")
+_refreshing: set[str] = set()
+_last_error: dict[str, str] = {}
+
+log = logging.getLogger(__name__)
+
+
+def _lock_for(name: str) -> threading.RLock:
+    with _locks_guard:
+        return _locks.setdefault(name, threading.RLock())
+
+
+# -------- files --------
+def snapshot_path(name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{name}.arrow")
+
+
+def checked_path(name: str) -> str:
+    # touched when an unchanged snapshot is re-validated; touching the snapshot
+    # itself would change its mtime_ns and re-map it in _mapped_table/_mapped_frame
+    return os.path.join(SNAPSHOT_DIR, f".{name}.checked")
+
+
+def mark_checked(name: str) -> None:
+    with open(checked_path(name), "a"):
+        pass
+    os.utime(checked_path(name))
+
+
+def snapshot_age(name: str) -> Optional[float]:
+    """Seconds since the snapshot was last written or found current, or None if there is none."""
+    try:
+        written = os.stat(snapshot_path(name)).st_mtime
+    except FileNotFoundError:
+        return None
+    try:
+        checked = os.stat(checked_path(name)).st_mtime
+    except FileNotFoundError:
+        checked = written
+    return time.time() - max(written, checked)
+
+
+def write_snapshot(name: str, df: pd.DataFrame, version: Optional[str] = None,
+                   capped: Optional[int] = None) -> str:
+    """
+    Write df as an Arrow IPC file. The file is built next to the target and
+    swapped in with os.replace, so readers never see a partial snapshot and
+    existing mappings of the old file stay valid. `version` is the table's
+    probe token at fetch time and `capped` the row cap a truncated fetch hit;
+    both are kept in the schema metadata.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if version is not None or capped is not None:
+        meta = dict(table.schema.metadata or {})
+        if version is not None:
+            meta[VERSION_KEY] = version.encode()
+        if capped is not None:
+            meta[CAPPED_KEY] = str(capped).encode()
+        table = table.replace_schema_metadata(meta)
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=SNAPSHOT_DIR, prefix=f".{name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, snapshot_path(name))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return snapshot_path(name)
+
+
+def invalidate(name: str) -> None:
+    """Drop a snapshot so the next read refetches it (e.g. after an insert)."""
+    forget_version(name)
+    try:
+        os.remove(snapshot_path(name))
+    except FileNotFoundError:
+        pass
+
+
+# -------- mapped reads (shared across sessions) --------
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _mapped_table(path: str, mtime_ns: int) -> pa.Table:
+    # mtime_ns is part of the cache key: a rewritten file gets a fresh mapping
+    source = pa.memory_map(path, "r")
+    return pa.ipc.open_file(source).read_all()
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _mapped_frame(path: str, mtime_ns: int) -> pd.DataFrame:
+    # ArrowDtype columns wrap the mapped buffers instead of copying them out
+    return _mapped_table(path, mtime_ns).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def read_snapshot(name: str) -> Optional[pd.DataFrame]:
+    path = snapshot_path(name)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _mapped_frame(path, mtime_ns)
+
+
+def read_snapshot_table(name: str) -> Optional[pa.Table]:
+    """Same snapshot as an Arrow table, for callers that work on Arrow directly."""
+    path = snapshot_path(name)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _mapped_table(path, mtime_ns)
+
+
+def snapshot_version(name: str) -> Optional[str]:
+    table = read_snapshot_table(name)
+    if table is None or not table.schema.metadata:
+        return None
+    v = table.schema.metadata.get(VERSION_KEY)
+    return v.decode() if v else None
+
+
+def snapshot_capped(name: str) -> Optional[int]:
+    """The row cap the snapshot was cut at, or None if it holds the whole table."""
+    table = read_snapshot_table(name)
+    if table is None or not table.schema.metadata:
+        return None
+    v = table.schema.metadata.get(CAPPED_KEY)
+    return int(v) if v else None
+
+
+# -------- catalog fetch --------
+def catalog_limit(name: str) -> int:
+    return CATALOG_LIMITS.get(name, DEFAULT_LIMIT)
+
+
+def _fetch_rows(sb, name: str, limit: int, chunk_size: int = 1000) -> pd.DataFrame:
+    if SNAPSHOT_FROM_SQL and sql_available():
+        sql, params = table_sql(name, limit=limit)
+        return read_sql(sql, params, table=name)
+    # paginate: PostgREST caps a single response at its max-rows setting
+    return read_frame(lambda: sb.table(name).select("*"), name, limit=limit, chunk_size=chunk_size)
+
+
+def refresh_catalog(sb, name: str, force: bool = False) -> Optional[pd.DataFrame]:
+    """
+    Fetch `name` (up to catalog_limit(name) rows) and swap in a new snapshot. Unless force, the table's version
+    is probed first and an unchanged snapshot is only re-stamped.
+    Returns the fetched frame when it could not be snapshotted (mixed-type
+    columns), else None.
+    """
+    with _lock_for(name):
+        # probe before fetching: a write racing the fetch bumps the version again
+        version = table_version(sb, name)
+        if not force and version is not None and version == snapshot_version(name):
+            mark_checked(name)
+            return None
+        limit = catalog_limit(name)
+        df = _fetch_rows(sb, name, limit)
+        capped = limit if len(df) >= limit else None
+        if capped:
+            log.warning("catalog %s hit its row cap (%d rows); raise CATALOG_LIMITS[%r] to load it all",
+                        name, limit, name)
+        try:
+            write_snapshot(name, df, version=version, capped=capped)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OSError):
+            return df
+    return None
+
+
+def _refresh_in_background(sb, name: str) -> None:
+    with _locks_guard:
+        if name in _refreshing:
+            return
+        _refreshing.add(name)
+
+    def job():
+        try:
+            refresh_catalog(sb, name)
+            _last_error.pop(name, None)
+        except Exception as e:
+            # keep serving the stale snapshot; surface the error in the indicator
+            _last_error[name] = str(e)
+        finally:
+            with _locks_guard:
+                _refreshing.discard(name)
+
+    _refresh_pool.submit(job)
+
+
+def load_catalog(sb, name: str, ttl: int = SNAPSHOT_TTL) -> pd.DataFrame:
+    """
+    Return the catalog `name` as a read-only, memory-mapped DataFrame.
+    Blocks only when no snapshot exists yet; a snapshot older than ttl is
+    returned as-is while a background worker refetches it.
+    """
+    df = read_snapshot(name)
+    if df is None:
+        with _lock_for(name):
+            # another session may have loaded it while we waited
+            df = read_snapshot(name)
+            if df is None:
+                uncached = refresh_catalog(sb, name)
+                if uncached is not None:
+                    return uncached
+                df = read_snapshot(name)
+    else:
+        age = snapshot_age(name)
+        if age is not None and age > ttl:
+            _refresh_in_background(sb, name)
+    return df if df is not None else pd.DataFrame()
+
+
+# -------- freshness indicator --------
+def catalog_status(name: str) -> dict:
+    return {
+        "table": name,
+        "age_s": snapshot_age(name),
+        "refreshing": name in _refreshing,
+        "error": _last_error.get(name),
+        "capped": snapshot_capped(name),
+    }
+
+
+def list_snapshots() -> pd.DataFrame:
+    """Snapshot files on disk. They are mapped, so they live in the page cache, not the heap."""
+    rows = []
+    if os.path.isdir(SNAPSHOT_DIR):
+        for fn in sorted(os.listdir(SNAPSHOT_DIR)):
+            if not fn.endswith(".arrow"):
+                continue
+            name = fn[:-len(".arrow")]
+            age = snapshot_age(name)
+            rows.append({
+                "table": name,
+                "file_bytes": os.stat(os.path.join(SNAPSHOT_DIR, fn)).st_size,
+                "age_s": round(age, 1) if age is not None else None,
+                "version": snapshot_version(name),
+                "capped": snapshot_capped(name),
+                "refreshing": name in _refreshing,
+            })
+    return pd.DataFrame(rows, columns=["table", "file_bytes", "age_s", "version", "capped", "refreshing"])
+
+
+def _fmt_age(age: Optional[float]) -> str:
+    if age is None:
+        return "not loaded"
+    if age < 60:
+        return f"{int(age)}s ago"
+    if age < 3600:
+        return f"{int(age // 60)} min ago"
+    return f"{age / 3600:.1f} h ago"
+
+
+def render_freshness(names: list[str], ttl: int = SNAPSHOT_TTL) -> None:
+    """One-line caption: how old each catalog is, whether it is refreshing and whether it was cut at its row cap."""
+    parts = []
+    for n in names:
+        s = catalog_status(n)
+        mark = "🟢" if s["age_s"] is not None and s["age_s"] <= ttl else "🟡"
+        if s["refreshing"]:
+            mark = "🔄"
+        if s["error"] or s["capped"]:
+            mark = "⚠️"
+        capped = f", first {s['capped']:,} rows only" if s["capped"] else ""
+        parts.append(f"{mark} {n} {_fmt_age(s['age_s'])}{capped}")
+    st.caption("Catalogs: " + " · ".join(parts))
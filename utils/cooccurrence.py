@@ -0,0 +1,179 @@
+# cooccurrence.py
+"""
+Which transgenes, mutations and treatments occur together, colony-wide.
+
+The fish x feature incidence matrix X (one column per catalog id) is sparse:
+a fish has a handful of features out of hundreds. The co-occurrence counts
+are C = X^T X. Off the diagonal, C[a, b] is the number of fish carrying both
+a and b. On the diagonal, C[a, a] is the number of fish carrying a. From those:
+
+    lift(a, b)        = C[a, b] * n_fish / (C[a, a] * C[b, b])   (> 1: combined more than chance)
+    confidence(a, b)  = C[a, b] / min(C[a, a], C[b, b])          (share of the rarer one's fish with both)
+
+The product is a self-join of the link rows on fish_id, counted with
+np.unique. Fish have few features, so the join stays small.
+
+    co = cooccurrence(sb)
+    co.pairs(min_count=3)                    # a, b, count, lift, confidence
+    co.matrix(features, "lift")              # square frame for a heatmap
+
+The result sits in the "feature_index" bounded cache, keyed by the table
+versions, like the other colony-wide indexes.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.bounded_cache import bounded_cache
+from utils.fish_features import CATEGORIES as _ALL_CATEGORIES, _labels
+from utils.loader import TableSpec, load_tables
+from utils.table_versions import table_version
+
+# strains describe the background, not a combination anyone chose
+CATEGORIES = tuple(c for c in _ALL_CATEGORIES if c.name in ("transgenes", "mutations", "treatments"))
+# matrix() labels; distinct per category (transgenes and treatments share an initial)
+PREFIX = {"transgenes": "Tg", "mutations": "Mut", "treatments": "Tx"}
+
+PAIR_COLUMNS = ["a_category", "a", "b_category", "b", "count", "lift", "confidence"]
+
+
+@dataclass
+class CoOccurrence:
+    n_fish: int
+    features: pd.DataFrame      # one row per matrix column: category, feature_id, feature, fish
+    i: np.ndarray               # int32 column of a (both orders, no diagonal)
+    j: np.ndarray               # int32 column of b
+    count: np.ndarray           # int64 fish with both
+
+    def _support(self) -> np.ndarray:
+        return self.features["fish"].to_numpy(dtype=np.int64)
+
+    def lift(self) -> np.ndarray:
+        s = self._support()
+        return self.count * self.n_fish / (s[self.i] * s[self.j])
+
+    def pairs(self, categories: Optional[Iterable[str]] = None, min_count: int = 1,
+              across_only: bool = False) -> pd.DataFrame:
+        """Each unordered pair once, most frequent first."""
+        cat = self.features["category"].to_numpy(dtype=object)
+        keep = (self.i < self.j) & (self.count >= min_count)
+        if categories is not None:
+            wanted = np.isin(cat, list(categories))
+            keep &= wanted[self.i] & wanted[self.j]
+        if across_only:
+            keep &= cat[self.i] != cat[self.j]
+        i, j, n = self.i[keep], self.j[keep], self.count[keep]
+        s = self._support()
+        label = self.features["feature"].to_numpy(dtype=object)
+        out = pd.DataFrame({
+            "a_category": cat[i], "a": label[i], "b_category": cat[j], "b": label[j],
+            "count": n, "lift": n * self.n_fish / (s[i] * s[j]),
+            "confidence": n / np.minimum(s[i], s[j]),
+        }, columns=PAIR_COLUMNS)
+        return out.sort_values(["count", "lift"], ascending=False, kind="stable").reset_index(drop=True)
+
+    def top_features(self, categories: Optional[Iterable[str]] = None, n: int = 30) -> list[int]:
+        """Matrix columns of the n most common features (among `categories`)."""
+        f = self.features
+        if categories is not None:
+            f = f[f["category"].isin(list(categories))]
+        return f.sort_values("fish", ascending=False, kind="stable").head(n).index.tolist()
+
+    def matrix(self, columns: list[int], metric: str = "count") -> pd.DataFrame:
+        """
+        Square frame over the given matrix columns; the diagonal holds each
+        feature's own count. Labels are unique: same-named features get their id.
+        """
+        pos = pd.Index(columns)
+        a, b = pos.get_indexer(self.i), pos.get_indexer(self.j)
+        ok = (a >= 0) & (b >= 0)
+        out = np.zeros((len(columns), len(columns)), dtype=float)
+        values = self.count if metric == "count" else self.lift()
+        out[a[ok], b[ok]] = values[ok]
+        if metric == "count":
+            np.fill_diagonal(out, self._support()[columns])
+        else:
+            np.fill_diagonal(out, np.nan)
+        f = self.features.loc[columns]
+        names = f["category"].map(PREFIX) + ": " + f["feature"].astype(str)
+        names = names.where(~names.duplicated(keep=False), names + " #" + f["feature_id"].astype(str))
+        return pd.DataFrame(out, index=names.tolist(), columns=names.tolist())
+
+
+# -------- build --------
+def _incidence(links: dict[str, pd.DataFrame], catalogs: dict[str, pd.DataFrame]):
+    """(fish, column) pairs without duplicates, plus the column table."""
+    feats, rows, cols = [], [], []
+    base = 0
+    for c in CATEGORIES:
+        link = links.get(c.link_table, pd.DataFrame())
+        if link.empty:
+            continue
+        pairs = link[["fish_id", c.id_column]].dropna().astype("int64").drop_duplicates()
+        ids, codes = np.unique(pairs[c.id_column].to_numpy(), return_inverse=True)
+        catalog = catalogs.get(c.catalog, pd.DataFrame())
+        names = pd.Series(dtype=object)
+        if not catalog.empty:
+            names = pd.Series(_labels(catalog, c.label_columns).to_numpy(dtype=object),
+                              index=catalog["id"].astype("int64").to_numpy())
+        label = pd.Series(ids).map(names)
+        feats.append(pd.DataFrame({
+            "category": c.name, "feature_id": ids,
+            "feature": label.where(label.notna(), "#" + pd.Series(ids).astype(str)).to_numpy(dtype=object),
+        }))
+        rows.append(pairs["fish_id"].to_numpy())
+        cols.append(base + codes)
+        base += len(ids)
+    if not feats:
+        empty = pd.DataFrame({"category": [], "feature_id": [], "feature": []})
+        return empty, np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    return pd.concat(feats, ignore_index=True), np.concatenate(rows), np.concatenate(cols)
+
+
+def _product(fish: np.ndarray, cols: np.ndarray, n_cols: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Nonzeros of X^T X as (i, j, count), both orders, diagonal included."""
+    _, rows = np.unique(fish, return_inverse=True)
+    # self-join on the fish row: every (a, b) pair of one fish's features
+    order = np.argsort(rows, kind="stable")
+    rows, cols = rows[order], cols[order]
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    sizes = np.diff(np.r_[starts, len(rows)])
+    group = np.repeat(np.arange(len(starts)), sizes)              # fish group of each link row
+    rep = sizes[group]
+    left = np.repeat(np.arange(len(rows)), rep)
+    within = np.arange(len(left)) - np.repeat(np.cumsum(rep) - rep, rep)
+    right = starts[group][left] + within
+    keys, counts = np.unique(cols[left].astype(np.int64) * n_cols + cols[right], return_counts=True)
+    return (keys // n_cols).astype(np.int32), (keys % n_cols).astype(np.int32), counts.astype(np.int64)
+
+
+def build(n_fish: int, links: dict[str, pd.DataFrame], catalogs: dict[str, pd.DataFrame]) -> CoOccurrence:
+    features, fish, cols = _incidence(links, catalogs)
+    i, j, count = _product(fish, cols, len(features))
+    diag = i == j
+    support = np.zeros(len(features), dtype=np.int64)
+    support[i[diag]] = count[diag]
+    features["fish"] = support
+    return CoOccurrence(n_fish, features, i[~diag], j[~diag], count[~diag])
+
+
+@bounded_cache("feature_index")
+def _cached(_sb, version: str) -> CoOccurrence:
+    specs = [TableSpec("fish", columns="id", limit=None)]
+    specs += [TableSpec(c.link_table, columns=f"fish_id,{c.id_column}", limit=None) for c in CATEGORIES]
+    specs += [TableSpec(c.catalog, snapshot=True) for c in CATEGORIES]
+    res = load_tables(_sb, specs)
+    if res.errors:
+        raise RuntimeError("; ".join(f"{t}: {e}" for t, e in res.errors.items()))
+    return build(len(res["fish"]), res.frames, res.frames)
+
+
+def cooccurrence(sb) -> CoOccurrence:
+    """The shared co-occurrence counts, recomputed when fish, a link table or a catalog changed."""
+    tables = ["fish", *(c.link_table for c in CATEGORIES), *(c.catalog for c in CATEGORIES)]
+    version = "/".join(str(table_version(sb, t)) for t in tables)
+    return _cached(sb, version)
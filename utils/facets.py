@@ -0,0 +1,180 @@
+# facets.py
+"""
+In-memory facet index over the whole fish table.
+
+The browse page filters fish by line_building_stage, birth year,
+transgene, mutation, strain, treatment and tank location, and shows a count
+next to every value. Re-querying a group-by per facet on every click would
+cost seven requests per interaction. FacetIndex instead loads the colony
+once (fish plus the link tables, concurrently, via the loader) and answers
+every count from integer arrays:
+
+    single-valued facets   one value code per fish (-1 = none)
+    multi-valued facets    (fish row, value code) pairs, one per link row
+
+Values of one facet are ORed and facets are ANDed. Each facet's counts are
+taken over the fish matching all the *other* facets, so picking a value does
+not hide its alternatives. A count is one np.bincount over the matching
+fish's codes, a few milliseconds for a 50k-fish colony.
+
+    idx = facet_index(sb)
+    sel = {"stage": ["F2"], "transgene": [12]}
+    ids = idx.match(sel)                 # newest first
+    counts = idx.counts(sel)             # {facet: Series(count, index=value)}
+
+The index sits in the "feature_index" bounded cache, keyed by table
+versions, like the bitset index in utils.feature_bitset.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.bounded_cache import bounded_cache
+from utils.fish_features import CATEGORIES
+from utils.loader import TableSpec, load_tables
+from utils.table_versions import table_version
+
+
+@dataclass
+class Facet:
+    name: str
+    label: str
+    values: np.ndarray                   # value of each code (object)
+    labels: list                         # display label of each code
+    codes: np.ndarray                    # int32: per fish (single) or per pair (multi)
+    rows: Optional[np.ndarray] = None    # int32 fish row per pair; None for single-valued facets
+
+    def member(self, n_fish: int, selected: list) -> np.ndarray:
+        """Fish rows having any of the selected values."""
+        wanted = np.isin(self.values, np.asarray(selected, dtype=object))
+        hit = np.zeros(len(self.values) + 1, dtype=bool)
+        hit[:-1] = wanted                 # code -1 (none) maps to the last slot: never selected
+        if self.rows is None:
+            return hit[self.codes]
+        out = np.zeros(n_fish, dtype=bool)
+        out[self.rows[hit[self.codes]]] = True
+        return out
+
+    def count(self, keep: np.ndarray) -> np.ndarray:
+        """Fish per code among the rows in `keep` (each fish once per value)."""
+        codes = self.codes[keep] if self.rows is None else self.codes[keep[self.rows]]
+        return np.bincount(codes[codes >= 0], minlength=len(self.values))
+
+
+@dataclass
+class FacetIndex:
+    fish_ids: np.ndarray                             # int64, newest first
+    facets: dict = field(default_factory=dict)       # name -> Facet
+
+    def _masks(self, selection: dict[str, list]) -> dict[str, np.ndarray]:
+        n = len(self.fish_ids)
+        return {f: self.facets[f].member(n, vals) for f, vals in selection.items() if vals and f in self.facets}
+
+    def select(self, selection: dict[str, list]) -> np.ndarray:
+        keep = np.ones(len(self.fish_ids), dtype=bool)
+        for m in self._masks(selection).values():
+            keep &= m
+        return keep
+
+    def match(self, selection: dict[str, list]) -> np.ndarray:
+        """Ids of the fish matching every facet selection, newest first."""
+        return self.fish_ids[self.select(selection)]
+
+    def counts(self, selection: dict[str, list]) -> dict[str, pd.Series]:
+        """Per facet: fish per value, under the selections of the other facets."""
+        masks = self._masks(selection)
+        n = len(self.fish_ids)
+        out = {}
+        for name, facet in self.facets.items():
+            keep = np.ones(n, dtype=bool)
+            for other, m in masks.items():
+                if other != name:
+                    keep &= m
+            out[name] = pd.Series(facet.count(keep), index=pd.Index(facet.values, dtype=object), name=facet.label)
+        return out
+
+    def label(self, facet: str, value: Any) -> str:
+        f = self.facets[facet]
+        pos = np.flatnonzero(f.values == value) if len(f.values) else []
+        return str(f.labels[pos[0]]) if len(pos) else str(value)
+
+
+# -------- build --------
+def _single(name: str, label: str, values: pd.Series) -> Facet:
+    codes, uniques = pd.factorize(values, sort=True)
+    uniques = np.asarray(uniques, dtype=object)
+    return Facet(name, label, uniques, [str(v) for v in uniques], codes.astype(np.int32))
+
+
+def _multi(name: str, label: str, fish_rows: np.ndarray, values: pd.Series,
+           names: Optional[pd.Series] = None) -> Facet:
+    ok = (fish_rows >= 0) & values.notna().to_numpy()
+    rows, vals = fish_rows[ok], values[ok]
+    codes, uniques = pd.factorize(vals.to_numpy(), sort=True)
+    # one pair per (fish, value): a fish in two tanks of one room counts once
+    width = max(len(uniques), 1)
+    pairs = np.unique(rows.astype(np.int64) * width + codes)
+    uniques = np.asarray(uniques, dtype=object)
+    labels = [str(names.get(v, v)) if names is not None else str(v) for v in uniques]
+    return Facet(name, label, uniques, labels, (pairs % width).astype(np.int32), (pairs // width).astype(np.int32))
+
+
+def _build(fish: pd.DataFrame, frames: dict[str, pd.DataFrame]) -> FacetIndex:
+    if fish.empty:
+        return FacetIndex(np.array([], dtype=np.int64))
+    fish = fish.sort_values(["created_at", "id"], ascending=False, kind="stable").reset_index(drop=True)
+    fish_ids = fish["id"].to_numpy(dtype=np.int64)
+    row_of = pd.Index(fish_ids)
+    born = pd.to_datetime(fish["date_birth"], errors="coerce")
+
+    facets = {
+        "stage": _single("stage", "Line-building stage", fish["line_building_stage"].astype(object)),
+        "birth_year": _single("birth_year", "Birth year", born.dt.year.astype("Int64").astype(object)),
+    }
+    for c in CATEGORIES:
+        link = frames.get(c.link_table, pd.DataFrame())
+        if c.catalog is None:
+            # tanks: facet on the room/rack, not the tank itself
+            if link.empty:
+                link = pd.DataFrame({"fish_id": pd.Series(dtype="int64"), "location": pd.Series(dtype=object)})
+            rows = row_of.get_indexer(link["fish_id"].to_numpy(dtype=np.int64))
+            facets["tank_location"] = _multi("tank_location", "Tank location", rows, link["location"].astype(object))
+            continue
+        if link.empty:
+            link = pd.DataFrame({"fish_id": pd.Series(dtype="int64"), c.id_column: pd.Series(dtype="int64")})
+        catalog = frames.get(c.catalog, pd.DataFrame())
+        names = None
+        if not catalog.empty:
+            text = catalog[c.label_columns[0]].astype("string").fillna("")
+            for extra in c.label_columns[1:]:
+                text = text + ":" + catalog[extra].astype("string").fillna("")
+            names = pd.Series(text.to_numpy(), index=catalog["id"].astype("int64").to_numpy())
+        rows = row_of.get_indexer(link["fish_id"].to_numpy(dtype=np.int64))
+        ids = link[c.id_column].astype("Int64").astype(object)
+        singular = c.name[:-1]  # transgenes -> transgene
+        facets[singular] = _multi(singular, singular.title(), rows, ids, names)
+    return FacetIndex(fish_ids, facets)
+
+
+@bounded_cache("feature_index")
+def _cached_index(_sb, version: str) -> FacetIndex:
+    specs = [TableSpec("fish", columns="id,line_building_stage,date_birth,created_at", limit=None)]
+    for c in CATEGORIES:
+        cols = "fish_id,location" if c.catalog is None else f"fish_id,{c.id_column}"
+        specs.append(TableSpec(c.link_table, columns=cols, limit=None))
+    specs += [TableSpec(c.catalog, snapshot=True) for c in CATEGORIES if c.catalog]
+    res = load_tables(_sb, specs)
+    if res.errors:
+        raise RuntimeError("; ".join(f"{t}: {e}" for t, e in res.errors.items()))
+    return _build(res["fish"], res.frames)
+
+
+def facet_index(sb) -> FacetIndex:
+    """The shared facet index, rebuilt when fish, a link table or a catalog changed."""
+    tables = ["fish", *(c.link_table for c in CATEGORIES), *(c.catalog for c in CATEGORIES if c.catalog)]
+    version = "/".join(str(table_version(sb, t)) for t in tables)
+    return _cached_index(sb, version)
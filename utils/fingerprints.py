@@ -0,0 +1,134 @@
+# fingerprints.py
+"""
+Genotype fingerprints: fish with identical transgene, mutation and strain
+sets share one hash.
+
+    canonical   't:3,17|m:|s:2'     (ascending ids per category)
+    fingerprint md5(canonical)      (hex, like the genotype_fp column)
+
+The same string is computed server-side into
+fish_feature_summary_mat.genotype_fp (see
+supabase/migrations/*_genotype_fingerprint.sql), which is indexed there for
+SQL users. In the app, GenotypeIndex builds all fingerprints from one bulk
+read of the three link tables and keeps them in memory:
+
+    gx = genotype_index(sb)
+    gx.identical_to(fish_id)       # ids with the same genotype, O(1)
+    gx.groups(ids)                 # one row per genotype among ids
+
+Treatments are left out: they are applied to a fish, not inherited.
+"""
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.bounded_cache import bounded_cache
+from utils.fish_features import CATEGORIES as _ALL_CATEGORIES
+from utils.loader import TableSpec, load_tables
+from utils.table_versions import table_version
+
+# (prefix, category) in fingerprint order
+PARTS = (("t", "transgenes"), ("m", "mutations"), ("s", "strains"))
+_CATEGORIES = {c.name: c for c in _ALL_CATEGORIES}
+
+
+def canonical(transgene_ids: Iterable[int] = (), mutation_ids: Iterable[int] = (),
+              strain_ids: Iterable[int] = ()) -> str:
+    sets = (transgene_ids, mutation_ids, strain_ids)
+    return "|".join(f"{p}:{','.join(str(i) for i in sorted({int(i) for i in ids}))}"
+                    for (p, _), ids in zip(PARTS, sets))
+
+
+def fingerprint(transgene_ids: Iterable[int] = (), mutation_ids: Iterable[int] = (),
+                strain_ids: Iterable[int] = ()) -> str:
+    return hashlib.md5(canonical(transgene_ids, mutation_ids, strain_ids).encode()).hexdigest()
+
+
+def _id_lists(fish_ids: pd.Index, link: pd.DataFrame, id_column: str) -> pd.Series:
+    """'3,17' per fish (ascending, distinct), '' for fish without links."""
+    if link.empty:
+        return pd.Series("", index=fish_ids, dtype=object)
+    pairs = link[["fish_id", id_column]].dropna().astype("int64").drop_duplicates()
+    pairs = pairs.sort_values(["fish_id", id_column])
+    fish = pairs["fish_id"].to_numpy()
+    if not len(fish):
+        return pd.Series("", index=fish_ids, dtype=object)
+    starts = np.flatnonzero(np.r_[True, fish[1:] != fish[:-1]])
+    # concatenate 'id,' runs per fish in one C loop (groupby.agg(",".join) is per-group Python)
+    parts = np.array([f"{i}," for i in pairs[id_column].tolist()], dtype=object)
+    joined = np.add.reduceat(parts, starts)
+    joined = pd.Series([j[:-1] for j in joined], index=fish[starts], dtype=object)
+    return joined.reindex(fish_ids, fill_value="")
+
+
+def canonical_frame(fish_ids: Iterable[int], links: dict[str, pd.DataFrame]) -> pd.Series:
+    """Canonical genotype string per fish id, from the link tables (bulk)."""
+    index = pd.Index([int(i) for i in fish_ids], name="fish_id")
+    out = pd.Series("", index=index, dtype=object)
+    for n, (prefix, cat) in enumerate(PARTS):
+        c = _CATEGORIES[cat]
+        ids = _id_lists(index, links.get(c.link_table, pd.DataFrame()), c.id_column)
+        out = out + ("|" if n else "") + f"{prefix}:" + ids
+    return out
+
+
+@dataclass
+class GenotypeIndex:
+    fp: pd.Series                                   # fish_id -> fingerprint
+    canonical: dict = field(default_factory=dict)   # fingerprint -> canonical string
+    members: dict = field(default_factory=dict)     # fingerprint -> int64 array of fish ids
+
+    def of(self, fish_id: int) -> Optional[str]:
+        return self.fp.get(int(fish_id))
+
+    def identical_to(self, fish_id: int, include_self: bool = False) -> np.ndarray:
+        """Ids of the fish with exactly this fish's genotype."""
+        ids = self.members.get(self.of(fish_id), np.array([], dtype=np.int64))
+        return ids if include_self else ids[ids != int(fish_id)]
+
+    def groups(self, fish_ids: Optional[Iterable[int]] = None) -> pd.DataFrame:
+        """One row per genotype among fish_ids (all fish if None), largest first."""
+        fp = self.fp if fish_ids is None else self.fp.reindex([int(i) for i in fish_ids]).dropna()
+        sizes = fp.value_counts()
+        out = pd.DataFrame({"genotype_fp": sizes.index.astype(str), "fish": sizes.to_numpy()})
+        out["canonical"] = out["genotype_fp"].map(self.canonical)
+        return out
+
+
+def build_index(fish_ids: Iterable[int], links: dict[str, pd.DataFrame]) -> GenotypeIndex:
+    canon = canonical_frame(fish_ids, links)
+    if canon.empty:
+        return GenotypeIndex(pd.Series(dtype=object))
+    # hash each distinct genotype once; colonies have far fewer genotypes than fish
+    codes, uniques = pd.factorize(canon)
+    hashes = np.array([hashlib.md5(u.encode()).hexdigest() for u in uniques], dtype=object)
+    fp = pd.Series(hashes[codes], index=canon.index, name="genotype_fp")
+    ids = canon.index.to_numpy(dtype=np.int64)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.flatnonzero(np.diff(codes[order])) + 1
+    members = {hashes[codes[g[0]]]: ids[g] for g in np.split(order, bounds) if len(g)}
+    return GenotypeIndex(fp, dict(zip(hashes, uniques)), members)
+
+
+@bounded_cache("feature_index")
+def _cached_index(_sb, version: str) -> GenotypeIndex:
+    specs = [TableSpec("fish", columns="id", limit=None)]
+    specs += [TableSpec(_CATEGORIES[c].link_table, columns=f"fish_id,{_CATEGORIES[c].id_column}", limit=None)
+              for _, c in PARTS]
+    res = load_tables(_sb, specs)
+    if res.errors:
+        raise RuntimeError("; ".join(f"{t}: {e}" for t, e in res.errors.items()))
+    fish = res["fish"]
+    return build_index(fish["id"].tolist() if not fish.empty else [], res.frames)
+
+
+def genotype_index(sb) -> GenotypeIndex:
+    """The shared fingerprint index, rebuilt when fish or a link table changed."""
+    tables = ["fish", *(_CATEGORIES[c].link_table for _, c in PARTS)]
+    version = "/".join(str(table_version(sb, t)) for t in tables)
+    return _cached_index(sb, version)
@@ -0,0 +1,131 @@
+# fish_features.py
+"""
+Features of many fish at once, for side-by-side comparison.
+
+The Mom/Dad pages fetch every link category once per fish. Comparing N fish
+that way costs N x categories requests. load_features() instead loads each
+category for all ids with one `fish_id=in.(...)` request, all categories
+concurrently on the loader pool, and joins the labels from the shared
+catalog snapshots:
+
+    links = load_features(sb, ids)        # fish_id, category, feature_id, feature
+    matrix = feature_matrix(links, ids)   # (category, feature) x fish_id, bool; one row per feature_id
+    status = feature_status(matrix)       # "shared" / "differs"
+
+Everything after the fetch is vectorized pandas.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.bounded_cache import bounded_cache, no_errors
+from utils.loader import TableSpec, load_tables
+from utils.table_versions import table_version
+
+
+@dataclass(frozen=True)
+class Category:
+    name: str
+    link_table: str
+    id_column: Optional[str]       # catalog id in the link table; None: the link row is the feature
+    catalog: Optional[str] = None
+    label_columns: tuple = ("name",)
+
+
+CATEGORIES = (
+    Category("transgenes", "fish_transgenes", "transgene_id", "transgenes"),
+    Category("mutations", "fish_mutations", "mutation_id", "mutations"),
+    Category("strains", "fish_strains", "strain_id", "strains"),
+    Category("treatments", "fish_treatments", "treatment_id", "treatments", ("treatment_type", "treatment_name")),
+    Category("tanks", "tanks", None, label_columns=("name",)),
+)
+
+LINK_COLUMNS = ["fish_id", "category", "feature_id", "feature"]
+
+
+def _labels(df: pd.DataFrame, columns: tuple) -> pd.Series:
+    out = df[columns[0]].astype("string").fillna("")
+    for c in columns[1:]:
+        out = out + ":" + df[c].astype("string").fillna("")
+    return out
+
+
+def _category_links(cat: Category, links: pd.DataFrame, catalog: Optional[pd.DataFrame]) -> pd.DataFrame:
+    if links.empty:
+        return pd.DataFrame(columns=LINK_COLUMNS)
+    if cat.id_column is None:
+        out = pd.DataFrame({"fish_id": links["fish_id"], "feature_id": links["id"],
+                            "feature": _labels(links, cat.label_columns)})
+    else:
+        out = links[["fish_id", cat.id_column]].rename(columns={cat.id_column: "feature_id"})
+        if catalog is not None and not catalog.empty:
+            names = pd.Series(_labels(catalog, cat.label_columns).to_numpy(), index=catalog["id"].to_numpy())
+            out["feature"] = out["feature_id"].map(names)
+        else:
+            out["feature"] = pd.NA
+        # an id the snapshot does not know yet still shows up
+        out["feature"] = out["feature"].fillna("#" + out["feature_id"].astype("string"))
+    out.insert(1, "category", cat.name)
+    return out[LINK_COLUMNS]
+
+
+def load_features(sb, fish_ids: Iterable[int], categories: tuple = tuple(c.name for c in CATEGORIES)) -> pd.DataFrame:
+    """
+    Long frame of (fish_id, category, feature_id, feature) for all fish_ids:
+    one request per link category, catalogs from the shared snapshots.
+    Failed tables are listed in .attrs["errors"] (and such results are not cached).
+    """
+    ids = tuple(sorted({int(i) for i in fish_ids}))
+    cats = tuple(c.name for c in CATEGORIES if c.name in categories)
+    version = "/".join(str(table_version(sb, c.link_table)) for c in CATEGORIES if c.name in cats)
+    return _load_features(sb, ids, cats, version)
+
+
+@bounded_cache("per_fish", keep=no_errors)
+def _load_features(_sb, ids: tuple, categories: tuple, version: str) -> pd.DataFrame:
+    cats = [c for c in CATEGORIES if c.name in categories]
+    if not ids or not cats:
+        return pd.DataFrame(columns=LINK_COLUMNS)
+    specs = []
+    for c in cats:
+        cols = "*" if c.id_column is None else f"fish_id,{c.id_column}"
+        specs.append(TableSpec(c.link_table, columns=cols, filters=(("fish_id", "in", list(ids)),), limit=None))
+    specs += [TableSpec(t, snapshot=True) for t in sorted({c.catalog for c in cats if c.catalog})]
+    res = load_tables(_sb, specs)
+    # like load_tables: a failed category is left out (and reported), not fatal
+    parts = [_category_links(c, res[c.link_table], res.frames.get(c.catalog))
+             for c in cats if c.link_table not in res.errors]
+    out = pd.concat(parts or [pd.DataFrame(columns=LINK_COLUMNS)], ignore_index=True)
+    out.attrs["errors"] = dict(res.errors)
+    return out
+
+
+def feature_matrix(links: pd.DataFrame, fish_ids: list) -> pd.DataFrame:
+    """
+    Boolean matrix indexed by (category, feature) with one column per fish,
+    in the order of fish_ids. Rows are one per (category, feature_id), so two
+    features that share a name stay apart; their labels get " #<id>" appended.
+    """
+    ids = [int(i) for i in fish_ids]
+    if links.empty:
+        index = pd.MultiIndex.from_arrays([[], []], names=["category", "feature"])
+        return pd.DataFrame(False, index=index, columns=ids)
+    m = pd.crosstab([links["category"], links["feature_id"]], links["fish_id"].astype("int64")).astype(bool)
+    m = m.reindex(columns=ids, fill_value=False)
+    names = links.drop_duplicates(["category", "feature_id"]).set_index(["category", "feature_id"])["feature"]
+    category = m.index.get_level_values("category")
+    feature_id = pd.Series(m.index.get_level_values("feature_id").astype(str))
+    label = pd.Series(names.reindex(m.index).astype(str).to_numpy())
+    label = label.where(~pd.DataFrame({"c": category, "l": label}).duplicated(keep=False), label + " #" + feature_id)
+    m.index = pd.MultiIndex.from_arrays([category, label], names=["category", "feature"])
+    order = {c.name: i for i, c in enumerate(CATEGORIES)}
+    return m.iloc[np.lexsort((label.to_numpy(), category.map(order).to_numpy()))]
+
+
+def feature_status(matrix: pd.DataFrame) -> pd.Series:
+    """Per feature: "shared" if every fish has it, else "differs"."""
+    return matrix.all(axis=1).map({True: "shared", False: "differs"}).rename("status")
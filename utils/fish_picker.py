@@ -0,0 +1,327 @@
+# fish_picker.py
+"""
+Paginated fish picker with selections kept by fish id.
+
+The pick pages used to load the newest 500 fish into one st.data_editor and
+remember checkboxes by row position (pick_state). Fish past the first 500
+could only be reached by searching, and a new search or a new fish shifted
+every remembered pick to a different row.
+
+fish_picker() shows one page of PAGE_SIZE fish at a time, newest first, and
+pages with a keyset on (created_at, id):
+
+    created_at < :ts OR (created_at = :ts AND id < :id)
+
+This is backed by fish_created_at_id_idx (see
+supabase/migrations/*_fish_keyset_index.sql). Every page costs one index range
+scan, however deep in the colony it is. Pages are kept in the "fish_pages"
+bounded cache, keyed by the fish table version, so a new fish invalidates
+them. The next page is prefetched on the loader pool while the current one
+is on screen.
+
+Picks are stored as fish ids, along with the picked rows, so they survive
+paging and searching:
+
+    picked = fish_picker(sb, term, FISH_SELECT, FISH_SEARCH)
+    a, b = picked.iloc[0], picked.iloc[1]    # in the order they were picked
+
+Pages that need exactly two fish use pick_pair(), and pages comparing a
+range of fish use pick_many(); both run the picker as a fragment (see
+utils.fragments).
+
+Each page row also carries the fish's transgenes, mutations, strains and
+treatments. They are embedded server-side from fish_feature_summary_mat
+(one row per fish, kept current by triggers; see
+supabase/migrations/*_fish_feature_summary_mat.sql) in the same request as
+the page, so scanning genotypes costs nothing per fish. Where that table
+has not been migrated yet, the columns stay empty.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+import pandas as pd
+import streamlit as st
+from postgrest.exceptions import APIError
+
+from utils_env import getenv
+from utils.bounded_cache import bounded_cache
+from utils.fragments import fragment, rerun_app_if_changed
+from utils.frames import build_frame, to_records
+from utils.loader import submit
+from utils.table_versions import table_version
+
+PAGE_SIZE = int(getenv("FISH_PAGE_SIZE", 100))
+ID_CHUNK = 500   # ids per in.(...) filter; keeps request URLs short
+FEATURES = ("transgenes", "mutations", "strains", "treatments")
+_SUMMARY = "fish_feature_summary_mat"
+
+_summary_embeddable: Optional[bool] = None  # None until the first page has tried
+
+_prefetching: set[tuple] = set()
+_prefetch_lock = threading.Lock()
+
+
+# -------- pages --------
+def _term_filter(search: tuple, term: str) -> str:
+    return ",".join(f"{c}.ilike.%{term}%" for c in search)
+
+
+def _page_query(sb, select: tuple, search: tuple, term: str, cursor: Optional[tuple], page_size: int,
+                features: bool = False, ids: Optional[tuple] = None):
+    cols = ",".join(select)
+    if features:
+        cols += f",{_SUMMARY}({','.join(FEATURES)})"
+    q = sb.table("fish").select(cols)
+    if term:
+        q = q.or_(_term_filter(search, term))
+    if ids is not None:
+        q = q.in_("id", list(ids))
+    if cursor:
+        ts, fid = cursor
+        # a second or= param; PostgREST ANDs all of them
+        q = q.or_(f'created_at.lt."{ts}",and(created_at.eq."{ts}",id.lt.{int(fid)})')
+    return q.order("created_at", desc=True).order("id", desc=True).limit(page_size)
+
+
+def _flatten(rows: list[dict]) -> list[dict]:
+    # one-to-one embed: an object (or None); older PostgREST returns a 1-item list
+    for r in rows:
+        summary = r.pop(_SUMMARY, None)
+        if isinstance(summary, list):
+            summary = summary[0] if summary else None
+        for f in FEATURES:
+            r[f] = (summary or {}).get(f)
+    return rows
+
+
+@bounded_cache("fish_pages")
+def fetch_fish_page(_sb, select: tuple, search: tuple, term: str, cursor: Optional[tuple],
+                    page_size: int, version: Optional[str], features: bool = True,
+                    ids: Optional[tuple] = None) -> pd.DataFrame:
+    """
+    One keyset page; `version` (fish and summary table versions) is part of
+    the cache key. With `features`, the FEATURES columns are added; with
+    `ids`, only those fish are read (a page of an only_ids list).
+    """
+    global _summary_embeddable
+    columns = list(select) + (list(FEATURES) if features else [])
+    if features and _summary_embeddable is not False:
+        try:
+            data = _page_query(_sb, select, search, term, cursor, page_size, True, ids).execute().data or []
+            _summary_embeddable = True
+            return build_frame(_flatten(data), "fish", columns=columns)
+        except APIError as e:
+            if e.code != "PGRST200":  # "could not find a relationship": not migrated
+                raise
+            _summary_embeddable = False  # stays off until restart
+    data = _page_query(_sb, select, search, term, cursor, page_size, False, ids).execute().data or []
+    return build_frame(data, "fish", columns=columns)
+
+
+@bounded_cache("fish_pages")
+def matching_ids(_sb, search: tuple, term: str, ids: tuple, version: Optional[str]) -> tuple:
+    """
+    The fish of `ids` whose search columns contain `term`, in the order of
+    `ids`: one request per ID_CHUNK ids, run concurrently on the loader pool.
+    """
+    def chunk(part: list) -> list:
+        q = _sb.table("fish").select("id").or_(_term_filter(search, term)).in_("id", part)
+        return q.execute().data or []
+
+    futures = [submit(chunk, list(ids[i:i + ID_CHUNK])) for i in range(0, len(ids), ID_CHUNK)]
+    hits = {int(r["id"]) for f in futures for r in f.result()}
+    return tuple(i for i in ids if int(i) in hits)
+
+
+def page_cursor(page: pd.DataFrame) -> Optional[tuple]:
+    """Keyset position after the last row of a page."""
+    if page.empty:
+        return None
+    last = page.iloc[-1]
+    return (pd.Timestamp(last["created_at"]).isoformat(), int(last["id"]))
+
+
+def prefetch_page(sb, *args) -> None:
+    """Warm the cache with a page on the loader pool (once at a time per page)."""
+    key = tuple(args)
+    with _prefetch_lock:
+        if key in _prefetching:
+            return
+        _prefetching.add(key)
+
+    def job():
+        try:
+            fetch_fish_page(sb, *args)
+        except Exception:
+            pass  # the page is fetched normally when it is opened
+        finally:
+            with _prefetch_lock:
+                _prefetching.discard(key)
+
+    submit(job)
+
+
+# -------- selection state --------
+def _state(key: str) -> dict:
+    if key not in st.session_state:
+        st.session_state[key] = {"term": "", "cursors": [None], "page": 0, "view": 0, "picked": [], "rows": {}}
+    return st.session_state[key]
+
+
+def _go(key: str, page: int, cursor=None) -> None:
+    state = _state(key)
+    if cursor is not None and page == len(state["cursors"]):
+        state["cursors"].append(cursor)
+    state["page"] = page
+    state["view"] += 1
+
+
+def _clear(key: str) -> None:
+    state = _state(key)
+    state["picked"], state["rows"] = [], {}
+    state["view"] += 1
+
+
+def picked_ids(key: str = "fish_picker") -> list[int]:
+    return list(_state(key)["picked"])
+
+
+# -------- widget --------
+def fish_picker(sb, term: str, select: list[str], search: list[str], key: str = "fish_picker",
+                page_size: int = PAGE_SIZE, height="auto", features: bool = True,
+                only_ids: Optional[tuple] = None) -> pd.DataFrame:
+    """
+    Render the picker; returns the picked fish (all pages) in pick order,
+    with the `select` columns (and FEATURES, if `features`), as an object
+    frame of plain Python values with None for missing ones.
+
+    With `only_ids` (newest first, e.g. from feature_bitset.genotype_filter),
+    the picker pages through those fish instead; the cursor is then an
+    offset into the list, narrowed to the fish matching `term` first so every
+    page is full. Picks made before are kept either way.
+    """
+    select = tuple(dict.fromkeys([*select, "id", "created_at"]))  # the keyset needs both
+    search = tuple(search)
+    term = (term or "").strip()
+    state = _state(key)
+    if term != state["term"] or only_ids != state.get("only_ids"):
+        state.update(term=term, only_ids=only_ids, cursors=[None], page=0, view=state["view"] + 1)
+
+    version = table_version(sb, "fish")
+    if features:
+        version = f"{version}/{table_version(sb, _SUMMARY)}"
+    page_no = state["page"]
+    if only_ids is None:
+        page = fetch_fish_page(sb, select, search, term, state["cursors"][page_no], page_size, version, features)
+        has_next = len(page) == page_size
+        next_cursor = page_cursor(page) if has_next else None
+        if has_next:
+            prefetch_page(sb, select, search, term, next_cursor, page_size, version, features)
+    else:
+        if term:
+            only_ids = matching_ids(sb, search, term, tuple(only_ids), version)
+        offset = state["cursors"][page_no] or 0
+        ids = tuple(only_ids[offset:offset + page_size])
+        page = (fetch_fish_page(sb, select, search, term, None, page_size, version, features, ids) if ids
+                else build_frame([], "fish", columns=list(select)))
+        has_next = offset + page_size < len(only_ids)
+        next_cursor = offset + page_size if has_next else None
+        if has_next:
+            next_ids = tuple(only_ids[next_cursor:next_cursor + page_size])
+            prefetch_page(sb, select, search, term, None, page_size, version, features, next_ids)
+
+    nav = st.columns([1, 1, 1, 5])
+    nav[0].button("⏮ First", key=f"{key}_first", disabled=page_no == 0, on_click=_go, args=(key, 0))
+    nav[1].button("◀ Prev", key=f"{key}_prev", disabled=page_no == 0, on_click=_go, args=(key, page_no - 1))
+    nav[2].button("Next ▶", key=f"{key}_next", disabled=not has_next,
+                  on_click=_go, args=(key, page_no + 1, next_cursor))
+    first = page_no * page_size + 1
+    nav[3].caption(f"Page {page_no + 1} · fish {first}–{first + len(page) - 1}" if len(page) else f"Page {page_no + 1}")
+
+    if page.empty:
+        st.info("No matches.")
+    else:
+        picked = state["picked"]
+        view = page.copy()
+        view.insert(0, "pick", view["id"].isin(picked).astype(bool))
+        ed = st.data_editor(
+            view,
+            hide_index=True,
+            use_container_width=True,
+            height=height,
+            disabled={c: True for c in view.columns if c != "pick"},
+            column_config={"pick": st.column_config.CheckboxColumn("Select"),
+                           **{f: st.column_config.TextColumn(f.title(), width="medium") for f in FEATURES}},
+            key=f"{key}_editor_{state['view']}",
+        )
+        records = {int(r["id"]): r for r in to_records(page)}
+        for fid, on in zip(ed["id"].tolist(), ed["pick"].tolist()):
+            fid = int(fid)
+            if on and fid not in picked:
+                picked.append(fid)
+                state["rows"][fid] = records[fid]
+            elif not on and fid in picked:
+                picked.remove(fid)
+                state["rows"].pop(fid, None)
+
+    if state["picked"]:
+        names = [f"{state['rows'][i].get('name') or ''} #{i}" for i in state["picked"]]
+        c1, c2 = st.columns([6, 1])
+        c1.caption("Selected: " + ", ".join(names))
+        c2.button("Clear selection", key=f"{key}_clear", on_click=_clear, args=(key,))
+    # plain values (None for missing), as to_records() gives: pages test picked fields with `or`
+    columns = list(select) + (list(FEATURES) if features else [])
+    rows = [{c: state["rows"][i].get(c) for c in columns} for i in state["picked"]]
+    return pd.DataFrame(rows, columns=columns, dtype=object)
+
+
+def pick_many(sb, term: str, select: list[str], search: list[str], prompt: str, max_picks: int,
+              min_picks: int = 2, key: str = "fish_picker", height="auto",
+              only_ids: Optional[tuple] = None) -> Optional[pd.DataFrame]:
+    """
+    fish_picker run as a fragment for min_picks..max_picks fish; the rest of
+    the page reruns once the picked set changes. Returns the picked rows in
+    pick order, or None while the count is out of range.
+    """
+
+    @fragment
+    def _picker_section():
+        picked = fish_picker(sb, term, select, search, key=key, height=height, only_ids=only_ids)
+        ok = min_picks <= len(picked) <= max_picks
+        if len(picked) < min_picks:
+            st.warning(prompt)
+        elif len(picked) > max_picks:
+            st.error(f"You selected {len(picked)}; uncheck until at most {max_picks} remain.")
+        st.session_state[f"{key}_many_rows"] = picked if ok else None
+        rerun_app_if_changed(f"{key}_many", tuple(picked["id"].tolist()) if ok else None)
+
+    _picker_section()
+    return st.session_state.get(f"{key}_many_rows")
+
+
+def pick_pair(sb, term: str, select: list[str], search: list[str], prompt: str,
+              key: str = "fish_picker", height="auto",
+              only_ids: Optional[tuple] = None) -> Optional[tuple[pd.Series, pd.Series]]:
+    """
+    fish_picker for exactly two fish, run as a fragment: paging and ticking
+    rerun only the picker, and the rest of the page reruns once the picked
+    pair changes. Returns (a, b) in pick order, or None until two are picked.
+    """
+
+    @fragment
+    def _picker_section():
+        picked = fish_picker(sb, term, select, search, key=key, height=height, only_ids=only_ids)
+        if len(picked) < 2:
+            st.warning(prompt)
+        elif len(picked) > 2:
+            st.error("You selected more than two. Uncheck until only two remain.")
+        st.session_state[f"{key}_pair_rows"] = picked if len(picked) == 2 else None
+        rerun_app_if_changed(f"{key}_pair", tuple(picked["id"].tolist()) if len(picked) == 2 else None)
+
+    _picker_section()
+    rows = st.session_state.get(f"{key}_pair_rows")
+    if rows is None:
+        return None
+    return rows.iloc[0], rows.iloc[1]
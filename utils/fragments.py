@@ -0,0 +1,60 @@
+# fragments.py
+"""
+Fragment-scoped reruns for page sections.
+
+A widget inside a fragment reruns only that fragment, not the whole page.
+The pick pages split into a picker fragment, a parent-summary fragment and,
+on fish_view_5_with_create, a create-workflow fragment. Paging or ticking a
+checkbox then costs one picker rerun, and editing the new-fish form never
+re-renders the picker or the summaries.
+
+A fragment that changes something other sections depend on (the picked
+Mom/Dad pair) publishes it with rerun_app_if_changed(). That triggers one
+full rerun when the value actually changed during a fragment-only rerun. In
+a full rerun the code below the fragment runs anyway and sees the new value.
+
+    @fragment
+    def picker():
+        ...
+        rerun_app_if_changed("parent_pair", pair)
+"""
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import streamlit as st
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # pragma: no cover
+    get_script_run_ctx = None
+
+# st.fragment (1.37+), st.experimental_fragment before that; plain sections otherwise
+_st_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
+
+def fragment(func: Callable = None, **kwargs):
+    """st.fragment where available; a no-op decorator on older Streamlit."""
+    if _st_fragment is None:
+        return func if func is not None else (lambda f: f)
+    return _st_fragment(func, **kwargs) if func is not None else _st_fragment(**kwargs)
+
+
+def is_fragment_rerun() -> bool:
+    """True while Streamlit is rerunning only fragment(s), not the whole script."""
+    try:
+        ctx = get_script_run_ctx() if get_script_run_ctx else None
+        return bool(ctx and getattr(ctx, "fragment_ids_this_run", None))
+    except Exception:
+        return False
+
+
+def rerun_app_if_changed(key: str, value: Any) -> None:
+    """
+    Store value in session_state[key]; if it changed during a fragment-only
+    rerun, rerun the whole app so the sections that read it catch up.
+    """
+    changed = key in st.session_state and st.session_state[key] != value
+    st.session_state[key] = value
+    if changed and is_fragment_rerun():
+        st.rerun()
@@ -0,0 +1,323 @@
+# frames.py
+"""
+Typed, memory-compact DataFrames from PostgREST JSON rows.
+
+pd.DataFrame(res.data) gives object columns: ids as Python ints, timestamps
+and dates as strings, and every repeated label stored once per row.
+build_frame(rows, table) builds each column with an explicit type instead:
+
+    ids / integers   Arrow int32 (int64 if the values need it), nullable
+    timestamps       Arrow timestamp[us, UTC]
+    dates            Arrow date32
+    low-cardinality  pandas category (one copy of each label)
+    other text       Arrow string
+    edited text      Arrow string, never a category (STRING)
+
+Column kinds come from COLUMNS (mirrors the schema dump); unknown columns are
+inferred from their name (id, *_id, *_at, date_*, is_*, created_by) and values. The Arrow
+types match what catalog snapshots hand out, so frames from both sources merge
+without casts. Missing values are pd.NA, which has no truth value: use
+as_text() or pd.isna() on cells, and to_records() for plain Python values
+(NA -> None, safe to send back in JSON payloads). A column that does not
+convert stays object.
+"""
+from __future__ import annotations
+
+from typing import Any, Iterable, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+ID, INT, FLOAT, BOOL, TIMESTAMP, DATE, CATEGORY, TEXT, STRING, OBJECT = (
+    "id", "int", "float", "bool", "timestamp", "date", "category", "text", "string", "object",
+)
+
+_LINK = {"fish_id": ID, "created_at": TIMESTAMP, "notes": TEXT}
+
+# kinds per table; only what the name rules below would get wrong or miss
+COLUMNS: dict[str, dict[str, str]] = {
+    "fish": {
+        "name": TEXT, "date_birth": DATE, "notes": TEXT, "fish_code": TEXT,
+        # edited in data_editor and fillna("")-ed by pages: never categories
+        "line_building_stage": STRING,
+        # embedded from fish_feature_summary_mat by the fish picker
+        "transgenes": TEXT, "mutations": TEXT, "strains": TEXT, "treatments": TEXT,
+    },
+    "fish_feature_summary_mat": {
+        "fish_id": ID, "name": TEXT, "transgenes": TEXT, "mutations": TEXT, "strains": TEXT,
+        "treatments": TEXT, "genotype_fp": TEXT, "refreshed_at": TIMESTAMP,
+    },
+    "fish_transgenes": {**_LINK, "is_integrated": BOOL, "zygosity": CATEGORY},
+    "fish_mutations": {**_LINK, "zygosity": CATEGORY},
+    "fish_strains": {**_LINK, "role": CATEGORY},
+    "fish_treatments": dict(_LINK),
+    "transgenes": {"name": TEXT, "notes": TEXT},
+    "mutations": {"name": TEXT, "gene": CATEGORY, "notes": TEXT},
+    "strains": {"name": TEXT, "notes": TEXT},
+    "treatments": {"treatment_type": CATEGORY, "treatment_name": TEXT, "notes": TEXT},
+    "plasmids": {"name": TEXT, "description": TEXT},
+    "tanks": {"name": TEXT, "location": CATEGORY, "notes": TEXT},
+}
+
+# primary keys (schema-*.sql); paged reads order by them so .range() windows neither overlap nor skip rows
+PRIMARY_KEYS: dict[str, tuple[str, ...]] = {
+    "fish": ("id",), "mutations": ("id",), "plasmids": ("id",), "strains": ("id",),
+    "tanks": ("id",), "transgenes": ("id",), "treatments": ("id",),
+    "fish_mutations": ("fish_id", "mutation_id"),
+    "fish_strains": ("fish_id", "strain_id"),
+    "fish_transgenes": ("fish_id", "transgene_id"),
+    "fish_treatments": ("fish_id", "treatment_id"),
+    "fish_feature_summary_mat": ("fish_id",),
+    "fish_year_counters": ("year",),
+}
+
+# text columns without metadata become categories when this repetitive
+CATEGORY_MIN_ROWS = 16
+CATEGORY_MAX_UNIQUE = 256
+CATEGORY_MAX_RATIO = 0.5
+
+_INT32 = (-(2**31), 2**31 - 1)
+TIMESTAMP_DTYPE = pd.ArrowDtype(pa.timestamp("us", tz="UTC"))
+DATE_DTYPE = pd.ArrowDtype(pa.date32())
+STRING_DTYPE = pd.ArrowDtype(pa.string())
+
+
+# -------- kinds --------
+def _kind_from_name(name: str) -> Optional[str]:
+    n = name.lower()
+    if n == "id" or n.endswith("_id"):
+        return ID
+    if n.endswith("_at"):
+        return TIMESTAMP
+    if n.startswith("date_") or n.endswith("_date"):
+        return DATE
+    if n.startswith(("is_", "has_")):
+        return BOOL
+    if n == "created_by":
+        return STRING
+    return None
+
+
+def _kind_from_values(values: list) -> str:
+    sample = next((v for v in values if v is not None), None)
+    if isinstance(sample, bool):
+        return BOOL
+    if isinstance(sample, int):
+        return INT
+    if isinstance(sample, float):
+        return FLOAT
+    if isinstance(sample, str):
+        return TEXT
+    return OBJECT
+
+
+def column_kind(table: Optional[str], name: str, values: list) -> str:
+    return (COLUMNS.get(table or "", {}).get(name)
+            or _kind_from_name(name)
+            or _kind_from_values(values))
+
+
+# -------- columns --------
+def _arrow(arr: pa.Array, index=None) -> pd.Series:
+    return pd.Series(pd.arrays.ArrowExtensionArray(arr), index=index, copy=False)
+
+
+def _int_column(values) -> pd.Series:
+    arr = values if isinstance(values, (pa.Array, pa.ChunkedArray)) else pa.array(values, from_pandas=True)
+    if pa.types.is_null(arr.type):
+        return _arrow(arr.cast(pa.int32()))
+    if pa.types.is_floating(arr.type) and pc.all(pc.equal(arr, pc.floor(arr))).as_py() is not False:
+        # ints that went through a float column (NaN for missing)
+        arr = arr.cast(pa.int64())
+    if not pa.types.is_integer(arr.type):
+        raise TypeError(f"not integers: {arr.type}")
+    lo, hi = pc.min_max(arr).values()
+    fits = lo.as_py() is None or (_INT32[0] <= lo.as_py() and hi.as_py() <= _INT32[1])
+    return _arrow(arr.cast(pa.int32() if fits else pa.int64()))
+
+
+def _timestamp_column(values: list) -> pd.Series:
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), utc=True, format="ISO8601", errors="coerce")
+    return parsed.astype(TIMESTAMP_DTYPE)
+
+
+def _date_column(values: list) -> pd.Series:
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), format="ISO8601", errors="coerce")
+    if getattr(parsed.dt, "tz", None) is not None:
+        parsed = parsed.dt.tz_localize(None)
+    return parsed.astype(DATE_DTYPE)
+
+
+def _repetitive(n_rows: int, n_unique: int) -> bool:
+    return (
+        n_rows >= CATEGORY_MIN_ROWS
+        and n_unique <= CATEGORY_MAX_UNIQUE
+        and n_unique <= CATEGORY_MAX_RATIO * n_rows
+    )
+
+
+def _text_column(values: list, categorical: Optional[bool]) -> pd.Series:
+    if any(v is not None and not isinstance(v, str) for v in values):
+        raise TypeError("mixed text column")
+    present = [v for v in values if v is not None]
+    if not present:
+        categorical = False
+    elif categorical is None:
+        categorical = _repetitive(len(values), len(set(present)))
+    if categorical:
+        return pd.Series(pd.Categorical(values))
+    return _arrow(pa.array(values, type=pa.string()))
+
+
+def _column(values: list, kind: str) -> pd.Series:
+    try:
+        if kind in (ID, INT):
+            return _int_column(values)
+        if kind == FLOAT:
+            return _arrow(pa.array(values, type=pa.float64(), from_pandas=True))
+        if kind == BOOL:
+            return _arrow(pa.array(values, type=pa.bool_()))
+        if kind == TIMESTAMP:
+            return _timestamp_column(values)
+        if kind == DATE:
+            return _date_column(values)
+        if kind == CATEGORY:
+            return _text_column(values, categorical=True)
+        if kind == TEXT:
+            return _text_column(values, categorical=None)
+        if kind == STRING:
+            return _text_column(values, categorical=False)
+    except (TypeError, ValueError, pa.ArrowException):
+        pass
+    return pd.Series(values, dtype=object)
+
+
+# -------- frames --------
+def build_frame(rows: Optional[Iterable[dict]], table: Optional[str] = None,
+                columns: Optional[list[str]] = None) -> pd.DataFrame:
+    """
+    Typed DataFrame from PostgREST rows (list of dicts). `table` selects the
+    column metadata; `columns` fixes the column order/set (missing ones are
+    all-null) and is also used for the empty frame.
+    """
+    rows = list(rows or [])
+    if not rows:
+        return pd.DataFrame(columns=columns or [])
+    if columns is None:
+        columns = list(rows[0])
+        seen = set(columns)
+        for r in rows[1:]:
+            if len(r) != len(seen) or r.keys() - seen:
+                for k in r:
+                    if k not in seen:
+                        seen.add(k)
+                        columns.append(k)
+    data = {}
+    for name in columns:
+        values = [r.get(name) for r in rows]
+        data[name] = _column(values, column_kind(table, name, values))
+    return pd.DataFrame(data)
+
+
+def compact_frame(df: pd.DataFrame, table: Optional[str] = None) -> pd.DataFrame:
+    """Same conversion for a frame that was built as object columns."""
+    if df is None or df.empty:
+        return df
+    data = {}
+    for name in df.columns:
+        s = df[name]
+        if isinstance(s.dtype, (pd.ArrowDtype, pd.CategoricalDtype)):
+            data[name] = s.reset_index(drop=True)
+            continue
+        values = [None if v is None or (isinstance(v, float) and v != v) else v for v in s.tolist()]
+        data[name] = _column(values, column_kind(table, str(name), values))
+    out = pd.DataFrame(data)
+    out.index = df.index
+    return out
+
+
+# -------- Arrow input --------
+_ARROW_TYPES = {
+    ID: pa.int64(), INT: pa.int64(), FLOAT: pa.float64(), BOOL: pa.bool_(),
+    TIMESTAMP: pa.timestamp("us", tz="UTC"), DATE: pa.date32(),
+    CATEGORY: pa.string(), TEXT: pa.string(), STRING: pa.string(),
+}
+
+
+def arrow_type(table: Optional[str], name: str) -> Optional[pa.DataType]:
+    """Type to parse a column as (e.g. from CSV); None = let the reader infer it."""
+    kind = COLUMNS.get(table or "", {}).get(name) or _kind_from_name(name)
+    return _ARROW_TYPES.get(kind)
+
+
+def _kind_from_arrow(t: pa.DataType) -> str:
+    if pa.types.is_boolean(t):
+        return BOOL
+    if pa.types.is_integer(t):
+        return INT
+    if pa.types.is_floating(t):
+        return FLOAT
+    if pa.types.is_timestamp(t):
+        return TIMESTAMP
+    if pa.types.is_date(t):
+        return DATE
+    if pa.types.is_string(t) or pa.types.is_large_string(t) or pa.types.is_null(t):
+        return TEXT
+    return OBJECT
+
+
+def _arrow_text_column(col: pa.ChunkedArray, categorical: Optional[bool]) -> pd.Series:
+    col = col.cast(pa.string())
+    if len(col) == col.null_count:
+        categorical = False
+    elif categorical is None:
+        categorical = _repetitive(len(col), pc.count_distinct(col).as_py())
+    if categorical:
+        # to_pandas() of a dictionary array is a Categorical; sort the labels like pd.Categorical
+        s = col.combine_chunks().dictionary_encode().to_pandas()
+        return s.cat.reorder_categories(sorted(s.cat.categories))
+    return _arrow(col)
+
+
+def _arrow_column(col: pa.ChunkedArray, kind: str) -> pd.Series:
+    try:
+        if kind in (ID, INT):
+            return _int_column(col)
+        if kind in (CATEGORY, TEXT, STRING):
+            return _arrow_text_column(col, categorical={CATEGORY: True, TEXT: None, STRING: False}[kind])
+        if kind in _ARROW_TYPES:
+            return _arrow(col.cast(_ARROW_TYPES[kind]))
+    except (TypeError, ValueError, pa.ArrowException):
+        pass
+    return pd.Series(col.to_pylist(), dtype=object)
+
+
+def frame_from_arrow(tbl: pa.Table, table: Optional[str] = None) -> pd.DataFrame:
+    """Typed DataFrame from an Arrow table, column rules as in build_frame."""
+    data = {}
+    for name, col in zip(tbl.column_names, tbl.columns):
+        kind = COLUMNS.get(table or "", {}).get(name) or _kind_from_name(name) or _kind_from_arrow(col.type)
+        data[name] = _arrow_column(col, kind)
+    return pd.DataFrame(data)
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> str:
+    b = before.memory_usage(deep=True).sum()
+    a = after.memory_usage(deep=True).sum()
+    return f"{b / 1024:.0f} KiB → {a / 1024:.0f} KiB ({b / max(a, 1):.1f}×)"
+
+
+def as_text(value: Any) -> str:
+    """str(value), with "" for None / NA / NaN (a cell's `or ""` fails on pd.NA)."""
+    if value is None or value is pd.NA or value is pd.NaT or (isinstance(value, float) and value != value):
+        return ""
+    return str(value)
+
+
+def to_records(df: pd.DataFrame) -> list[dict[str, Any]]:
+    """Rows with plain Python values (NA → None), e.g. for insert payloads."""
+    return [
+        {k: (None if v is pd.NA or v is pd.NaT or (isinstance(v, float) and v != v) else v) for k, v in r.items()}
+        for r in df.astype(object).to_dict("records")
+    ]
@@ -0,0 +1,128 @@
+# loader.py
+"""
+Concurrent multi-table loader for page bootstrap.
+
+Pages describe what they need as a list of TableSpec and get every table
+back at once; the requests run in parallel on a shared thread pool, so the
+bootstrap costs the slowest table instead of the sum of all of them.
+
+    res = load_tables(sb, [TableSpec("transgenes", snapshot=True),
+                           TableSpec("fish_transgenes", filters=(("fish_id", "in", ids),))])
+    res["transgenes"], res.timings["fish_transgenes"]
+"""
+from __future__ import annotations
+
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+import pandas as pd
+
+from utils_env import getenv
+from utils.catalog_snapshots import load_catalog
+from utils.bulk_read import read_frame
+
+LOADER_WORKERS = int(getenv("LOADER_WORKERS", 8))
+
+# one pool per process; bounded so a busy server cannot open unlimited connections
+_pool = ThreadPoolExecutor(max_workers=LOADER_WORKERS, thread_name_prefix="table-loader")
+
+# postgrest filter methods that collide with Python keywords
+_OPS = {"in": "in_", "is": "is_", "not": "not_"}
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    table: str
+    columns: str = "*"
+    filters: tuple = ()          # ((column, op, value), ...), op is a postgrest method: eq, in, ilike, ...
+    limit: Optional[int] = 10000
+    order: Optional[str] = None
+    desc: bool = False
+    key: Optional[str] = None    # result key when one table is loaded twice
+    snapshot: bool = False       # read via the shared catalog snapshot (unfiltered "*" only; its row cap is catalog_limit)
+
+    @property
+    def name(self) -> str:
+        return self.key or self.table
+
+
+@dataclass
+class LoadResult:
+    frames: dict[str, pd.DataFrame] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)   # seconds per table
+    errors: dict[str, str] = field(default_factory=dict)
+    wall: float = 0.0
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        return self.frames[name]
+
+    def raise_for_errors(self) -> "LoadResult":
+        """Raise RuntimeError naming every failed table, like a single failed fetch would."""
+        if self.errors:
+            raise RuntimeError("; ".join(f"{t}: {e}" for t, e in self.errors.items()))
+        return self
+
+    def summary(self) -> str:
+        if not self.timings:
+            return "no tables loaded"
+        slowest = max(self.timings, key=self.timings.get)
+        total = sum(self.timings.values())
+        return (
+            f"{len(self.timings)} tables in {self.wall * 1000:.0f} ms "
+            f"(serial would be {total * 1000:.0f} ms; slowest: {slowest} {self.timings[slowest] * 1000:.0f} ms)"
+        )
+
+
+# -------- single spec --------
+def build_query(sb, spec: TableSpec):
+    q = sb.table(spec.table).select(spec.columns)
+    for col, op, value in spec.filters:
+        q = getattr(q, _OPS.get(op, op))(col, value)
+    if spec.order:
+        q = q.order(spec.order, desc=spec.desc)
+    return q
+
+
+def fetch_spec(sb, spec: TableSpec, chunk_size: int = 1000) -> pd.DataFrame:
+    """Fetch one spec, paging through PostgREST's max-rows cap up to spec.limit."""
+    if spec.snapshot and spec.columns == "*" and not spec.filters:
+        return load_catalog(sb, spec.table)
+    return read_frame(lambda: build_query(sb, spec), spec.table, limit=spec.limit,
+                      chunk_size=chunk_size, select=spec.columns)
+
+
+def _timed(sb, spec: TableSpec) -> tuple[pd.DataFrame, float]:
+    t0 = time.perf_counter()
+    df = fetch_spec(sb, spec)
+    return df, time.perf_counter() - t0
+
+
+# -------- many specs --------
+def submit(fn, *args, **kwargs):
+    """Run fn on the shared loader pool (for background prefetches)."""
+    return _pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def load_tables(sb, specs: list[TableSpec], timeout: Optional[float] = None) -> LoadResult:
+    """
+    Fetch all specs concurrently. Failed tables come back as empty frames
+    with the message in result.errors, so one bad table never blocks a page.
+    """
+    res = LoadResult()
+    t0 = time.perf_counter()
+    # each task runs in a copy of the caller's context so per-rerun state (query log) follows it
+    futures = {spec.name: _pool.submit(contextvars.copy_context().run, _timed, sb, spec) for spec in specs}
+    for name, fut in futures.items():
+        try:
+            df, secs = fut.result(timeout=timeout)
+            res.frames[name] = df
+            res.timings[name] = secs
+        except Exception as e:
+            res.frames[name] = pd.DataFrame()
+            res.errors[name] = str(e) or type(e).__name__
+    res.wall = time.perf_counter() - t0
+    return res
+
@@ -0,0 +1,185 @@
+# mendel.py
+"""
+Expected offspring genotypes for candidate crosses, many pairs at once.
+
+Each transgene or mutation is treated as an independent locus. A parent
+passes a copy to an offspring with probability
+
+    hom          1
+    het / hemi   1/2
+    not carried  0
+    unknown      1/2 (carried, zygosity not recorded: assumed het, flagged)
+
+For a cross with transmission probabilities p (mother) and q (father):
+
+    P(hom)   = p q
+    P(het)   = p (1 - q) + q (1 - p)
+    P(none)  = (1 - p) (1 - q)
+
+A cross is one row of a (pairs x features) array. One mother against 500
+candidate fathers is a single broadcast over a 500 x features matrix:
+
+    g = load_genotypes(sb, (mother, *fathers))
+    cx = crosses(g, mothers=[mother] * 500, fathers=fathers)
+    cx.table(0)                              # per-feature distribution of pair 0
+    cx.p_all([("transgenes", 12)])           # per pair: P(offspring carries every one)
+
+Zygosity comes from the nullable zygosity columns on fish_transgenes and
+fish_mutations (see supabase/migrations/*_link_zygosity.sql). Where they are
+not migrated yet, every carried feature counts as unknown. Strains
+(background) and treatments (applied, not inherited) are left out.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils.bounded_cache import bounded_cache, no_errors
+from utils.fish_features import CATEGORIES as _ALL_CATEGORIES, _labels
+from utils.loader import TableSpec, load_tables
+from utils.table_versions import table_version
+
+CATEGORIES = tuple(c for c in _ALL_CATEGORIES if c.name in ("transgenes", "mutations"))
+_INHERITED = {c.name for c in CATEGORIES}
+TRANSMISSION = {"hom": 1.0, "het": 0.5, "hemi": 0.5}
+UNKNOWN = 0.5
+
+GENOTYPE_COLUMNS = ["fish_id", "category", "feature_id", "feature", "zygosity"]
+TABLE_COLUMNS = ["category", "feature", "mother", "father", "p_hom", "p_het", "p_none", "assumed"]
+
+
+def load_genotypes(sb, fish_ids: Iterable[int]) -> pd.DataFrame:
+    """
+    Long frame of (fish_id, category, feature_id, feature, zygosity): one
+    request per link table for all fish_ids. Failed tables are listed in
+    .attrs["errors"] (and such results are not cached).
+    """
+    ids = tuple(sorted({int(i) for i in fish_ids}))
+    version = "/".join(str(table_version(sb, c.link_table)) for c in CATEGORIES)
+    return _load_genotypes(sb, ids, version)
+
+
+@bounded_cache("per_fish", keep=no_errors)
+def _load_genotypes(_sb, ids: tuple, version: str) -> pd.DataFrame:
+    if not ids:
+        return pd.DataFrame(columns=GENOTYPE_COLUMNS)
+    # "*": zygosity is read where it has been migrated, without failing where it has not
+    specs = [TableSpec(c.link_table, filters=(("fish_id", "in", list(ids)),), limit=None) for c in CATEGORIES]
+    specs += [TableSpec(c.catalog, snapshot=True) for c in CATEGORIES]
+    res = load_tables(_sb, specs)
+    parts = []
+    for c in CATEGORIES:
+        link = res.frames.get(c.link_table, pd.DataFrame())
+        if c.link_table in res.errors or link.empty:
+            continue
+        out = pd.DataFrame({
+            "fish_id": link["fish_id"].astype("int64").to_numpy(),
+            "category": c.name,
+            "feature_id": link[c.id_column].astype("int64").to_numpy(),
+            "zygosity": (link["zygosity"].astype(object) if "zygosity" in link.columns else pd.Series(None, index=link.index, dtype=object)).to_numpy(),
+        })
+        catalog = res.frames.get(c.catalog, pd.DataFrame())
+        names = (pd.Series(_labels(catalog, c.label_columns).to_numpy(dtype=object), index=catalog["id"].astype("int64").to_numpy())
+                 if not catalog.empty else pd.Series(dtype=object))
+        label = out["feature_id"].map(names)
+        out["feature"] = label.where(label.notna(), "#" + out["feature_id"].astype(str))
+        parts.append(out[GENOTYPE_COLUMNS])
+    out = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=GENOTYPE_COLUMNS)
+    out.attrs["errors"] = dict(res.errors)
+    return out
+
+
+def transmission(zygosity: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """(probability of passing a copy, zygosity unknown) per carried feature."""
+    z = zygosity.astype(object).where(zygosity.notna(), None).map(
+        lambda v: str(v).strip().lower()[:4] if v is not None else None)
+    z = z.replace({"homo": "hom", "hete": "het"})   # homozygous, heterozygous, hemizygous
+    p = z.map(TRANSMISSION)
+    return p.fillna(UNKNOWN).to_numpy(dtype=float), p.isna().to_numpy()
+
+
+@dataclass
+class Crosses:
+    mothers: np.ndarray        # int64 per pair
+    fathers: np.ndarray        # int64 per pair
+    features: pd.DataFrame     # one row per column: category, feature_id, feature
+    p: np.ndarray              # pairs x features: mother passes a copy
+    q: np.ndarray              # pairs x features: father passes a copy
+    assumed: np.ndarray        # pairs x features: a parent's zygosity was not recorded
+
+    @property
+    def p_hom(self) -> np.ndarray:
+        return self.p * self.q
+
+    @property
+    def p_het(self) -> np.ndarray:
+        return self.p + self.q - 2 * self.p * self.q
+
+    @property
+    def p_none(self) -> np.ndarray:
+        return (1 - self.p) * (1 - self.q)
+
+    def _columns(self, features: Iterable[tuple[str, int]]) -> np.ndarray:
+        """Column per feature, -1 where no parent carries it; features that are not inherited are dropped."""
+        keys = pd.MultiIndex.from_frame(self.features[["category", "feature_id"]])
+        wanted = [(c, int(i)) for c, i in features if c in _INHERITED]
+        return keys.get_indexer(pd.MultiIndex.from_tuples(wanted, names=["category", "feature_id"]))
+
+    def p_all(self, features: Iterable[tuple[str, int]]) -> np.ndarray:
+        """Per pair: P(an offspring carries every inherited one of `features`), loci independent."""
+        cols = self._columns(features)
+        if not len(cols):
+            return np.ones(len(self.mothers))
+        if (cols < 0).any():   # neither parent of any pair carries it
+            return np.zeros(len(self.mothers))
+        return (1 - self.p_none[:, cols]).prod(axis=1)
+
+    def expected(self, features: Iterable[tuple[str, int]]) -> np.ndarray:
+        """Per pair: expected number of `features` an offspring carries."""
+        cols = self._columns(features)
+        cols = cols[cols >= 0]
+        return (1 - self.p_none[:, cols]).sum(axis=1)
+
+    def table(self, pair: int) -> pd.DataFrame:
+        """Offspring genotype distribution of one pair, for the features either parent carries."""
+        carried = (self.p[pair] > 0) | (self.q[pair] > 0)
+        f = self.features[carried]
+        return pd.DataFrame({
+            "category": f["category"].to_numpy(), "feature": f["feature"].to_numpy(),
+            "mother": _describe(self.p[pair, carried]), "father": _describe(self.q[pair, carried]),
+            "p_hom": self.p_hom[pair, carried], "p_het": self.p_het[pair, carried],
+            "p_none": self.p_none[pair, carried], "assumed": self.assumed[pair, carried],
+        }, columns=TABLE_COLUMNS)
+
+
+def _describe(p: np.ndarray) -> np.ndarray:
+    return np.select([p >= 1, p > 0], ["hom", "het"], "—").astype(object)
+
+
+def crosses(genotypes: pd.DataFrame, mothers: Sequence[int], fathers: Sequence[int]) -> Crosses:
+    """Transmission arrays for the pairs (mothers[i], fathers[i])."""
+    mothers = np.asarray([int(i) for i in mothers], dtype=np.int64)
+    fathers = np.asarray([int(i) for i in fathers], dtype=np.int64)
+    g = genotypes.drop_duplicates(["fish_id", "category", "feature_id"])
+    features = g[["category", "feature_id", "feature"]].drop_duplicates(["category", "feature_id"])
+    order = {c.name: n for n, c in enumerate(CATEGORIES)}
+    features = features.assign(_o=features["category"].map(order)).sort_values(["_o", "feature"]).drop(columns="_o")
+    features = features.reset_index(drop=True)
+
+    # one row per involved fish, one column per feature
+    fish = pd.Index(np.unique(np.concatenate([mothers, fathers])))
+    col = pd.MultiIndex.from_frame(features[["category", "feature_id"]]).get_indexer(
+        pd.MultiIndex.from_frame(g[["category", "feature_id"]]))
+    row = fish.get_indexer(g["fish_id"].to_numpy(dtype=np.int64))
+    ok = row >= 0
+    prob, unknown = transmission(g["zygosity"])
+    T = np.zeros((len(fish), len(features)))
+    U = np.zeros((len(fish), len(features)), dtype=bool)
+    T[row[ok], col[ok]] = prob[ok]
+    U[row[ok], col[ok]] = unknown[ok]
+
+    m, f = fish.get_indexer(mothers), fish.get_indexer(fathers)
+    return Crosses(mothers, fathers, features, T[m], T[f], U[m] | U[f])
@@ -0,0 +1,244 @@
+# minhash.py
+"""
+"Fish most similar to this one": MinHash signatures + LSH banding over the
+fish's feature sets, with exact Jaccard re-ranking.
+
+A fish's feature set is its (category, catalog id) pairs over transgenes,
+mutations, strains and treatments. Comparing one fish with every other
+fish is an all-pairs scan. SimilarityIndex avoids that:
+
+  1. MinHash: NUM_PERM universal hashes h(x) = (a*x + b) mod p; a fish's
+     signature is the per-hash minimum over its features. Two signatures
+     agree in a position with probability Jaccard(A, B).
+  2. LSH: signatures are cut into BANDS bands of NUM_PERM/BANDS rows. For
+     each band the index keeps the band hashes sorted (np.searchsorted), so
+     the fish sharing a band with the query are found in O(log n). With
+     the defaults (128 = 32 x 4), pairs at Jaccard 0.5 collide with
+     probability ~0.87 and pairs at 0.2 with ~0.05.
+  3. The candidates are re-ranked by exact Jaccard on their feature sets.
+
+    sx = similarity_index(sb)
+    sx.similar(fish_id, k=10)    # fish_id, jaccard, shared, candidates
+
+The index is built from one bulk read of the four fish_* link tables. Fish
+created through the create workflows are added right away with add_fish()
+into a small delta that queries scan linearly. When the link tables change
+any other way, the next query starts a full rebuild on the loader pool and
+keeps serving the current index until the rebuild is done.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils_env import getenv
+from utils.fish_features import CATEGORIES as _ALL_CATEGORIES
+from utils.loader import TableSpec, load_tables, submit
+from utils.table_versions import table_version
+
+NUM_PERM = int(getenv("MINHASH_PERMUTATIONS", 128))
+BANDS = int(getenv("MINHASH_BANDS", 32))
+SEED = 20251019
+_PRIME = np.uint64(2**31 - 1)
+_EMPTY = np.iinfo(np.uint64).max
+_CHUNK = 1 << 16   # features hashed per block (NUM_PERM x _CHUNK uint64 = 64 MiB)
+
+CATEGORIES = tuple(c for c in _ALL_CATEGORIES if c.catalog)
+_CAT_CODE = {c.name: n for n, c in enumerate(CATEGORIES)}
+
+
+def tokens(features: dict[str, Iterable[int]]) -> np.ndarray:
+    """Sorted, distinct feature tokens: category code in the high bits, catalog id below."""
+    out = [(_CAT_CODE[cat] << 27) | int(i) for cat, ids in features.items() if cat in _CAT_CODE for i in ids]
+    return np.unique(np.asarray(out, dtype=np.uint64))
+
+
+class SimilarityIndex:
+    def __init__(self, fish_ids: np.ndarray, indptr: np.ndarray, toks: np.ndarray,
+                 num_perm: int = NUM_PERM, bands: int = BANDS, seed: int = SEED):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        rng = np.random.default_rng(seed)
+        self.num_perm, self.bands, self.rows = num_perm, bands, num_perm // bands
+        self.a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)
+        self.mult = rng.integers(1, 2**63, self.rows, dtype=np.uint64) | np.uint64(1)
+
+        self.fish_ids, self.indptr, self.toks = fish_ids, indptr, toks
+        self.row_of = pd.Index(fish_ids)
+        self.sig = self._signatures(indptr, toks)                   # [n_fish, num_perm]
+        keys = self._band_keys(self.sig)                             # [n_fish, bands]
+        nonempty = np.diff(indptr) > 0
+        self.order, self.sorted_keys = [], []
+        for band in range(bands):
+            rows = np.flatnonzero(nonempty)
+            o = rows[np.argsort(keys[rows, band], kind="stable")]
+            self.order.append(o)
+            self.sorted_keys.append(keys[o, band])
+        self.removed: set[int] = set()                               # base rows superseded by the delta
+        self.delta: dict[int, tuple[np.ndarray, np.ndarray]] = {}    # fish_id -> (tokens, band keys)
+        self.built_at = time.time()
+        self._lock = threading.Lock()
+
+    # -------- hashing --------
+    def _signatures(self, indptr: np.ndarray, toks: np.ndarray) -> np.ndarray:
+        n = len(indptr) - 1
+        sig = np.full((n, self.num_perm), _EMPTY, dtype=np.uint64)
+        starts = indptr[:-1]
+        # fish are hashed in blocks so the (num_perm x features) matrix stays bounded
+        first = 0
+        while first < n:
+            last = int(np.searchsorted(indptr, indptr[first] + _CHUNK, side="right")) - 1
+            last = min(max(last, first + 1), n)
+            lo, hi = int(indptr[first]), int(indptr[last])
+            rows = np.arange(first, last)
+            rows = rows[indptr[rows + 1] > indptr[rows]]
+            if hi > lo and len(rows):
+                h = (self.a[:, None] * toks[None, lo:hi] + self.b[:, None]) % _PRIME
+                sig[rows] = np.minimum.reduceat(h, (starts[rows] - lo).astype(np.int64), axis=1).T
+            first = last
+        return sig
+
+    def _band_keys(self, sig: np.ndarray) -> np.ndarray:
+        # uint64 arithmetic wraps: a cheap mixing hash of each band's rows
+        s = sig.reshape(len(sig), self.bands, self.rows)
+        return (s * self.mult).sum(axis=2, dtype=np.uint64)
+
+    # -------- updates --------
+    def add(self, fish_id: int, features: dict[str, Iterable[int]]) -> None:
+        """Add or replace one fish (e.g. right after the create workflow inserted it)."""
+        t = tokens(features)
+        sig = self._signatures(np.array([0, len(t)], dtype=np.int64), t)
+        with self._lock:
+            pos = self.row_of.get_indexer([int(fish_id)])[0]
+            if pos >= 0:
+                self.removed.add(int(pos))
+            self.delta[int(fish_id)] = (t, self._band_keys(sig)[0])
+
+    # -------- queries --------
+    def features_of(self, fish_id: int) -> Optional[np.ndarray]:
+        hit = self.delta.get(int(fish_id))
+        if hit is not None:
+            return hit[0]
+        pos = self.row_of.get_indexer([int(fish_id)])[0]
+        if pos < 0 or pos in self.removed:
+            return None
+        return self.toks[self.indptr[pos]:self.indptr[pos + 1]]
+
+    def candidates(self, toks: np.ndarray) -> np.ndarray:
+        """Fish ids sharing at least one LSH band with a feature set."""
+        if not len(toks):
+            return np.array([], dtype=np.int64)
+        keys = self._band_keys(self._signatures(np.array([0, len(toks)], dtype=np.int64), toks))[0]
+        rows = []
+        for band in range(self.bands):
+            sk = self.sorted_keys[band]
+            lo, hi = np.searchsorted(sk, keys[band], "left"), np.searchsorted(sk, keys[band], "right")
+            if hi > lo:
+                rows.append(self.order[band][lo:hi])
+        found = np.unique(np.concatenate(rows)) if rows else np.array([], dtype=np.int64)
+        if self.removed:
+            found = found[~np.isin(found, list(self.removed))]
+        ids = self.fish_ids[found]
+        with self._lock:
+            extra = [fid for fid, (_, dk) in self.delta.items() if (dk == keys).any()]
+        return np.union1d(ids, np.asarray(extra, dtype=np.int64))
+
+    def similar(self, fish_id: int, k: int = 10, min_jaccard: float = 0.0) -> pd.DataFrame:
+        """Top-k fish by exact Jaccard among the LSH candidates (the fish itself excluded)."""
+        cols = ["fish_id", "jaccard", "shared"]
+        q = self.features_of(fish_id)
+        if q is None or not len(q):
+            return pd.DataFrame(columns=cols)
+        cand = self.candidates(q)
+        cand = cand[cand != int(fish_id)]
+        scored = []
+        for fid in cand.tolist():
+            t = self.features_of(fid)
+            if t is None or not len(t):
+                continue
+            shared = len(np.intersect1d(q, t, assume_unique=True))
+            scored.append((fid, shared / (len(q) + len(t) - shared), shared))
+        out = pd.DataFrame(scored, columns=cols)
+        out = out[out["jaccard"] >= min_jaccard].sort_values(["jaccard", "fish_id"], ascending=[False, False])
+        out = out.head(k).reset_index(drop=True)
+        out.attrs["candidates"] = len(cand)
+        return out
+
+
+# -------- build --------
+def build_index(links: dict[str, pd.DataFrame], **kwargs) -> SimilarityIndex:
+    parts = []
+    for c in CATEGORIES:
+        link = links.get(c.link_table, pd.DataFrame())
+        if link.empty:
+            continue
+        pairs = link[["fish_id", c.id_column]].dropna().astype("int64")
+        parts.append(pd.DataFrame({
+            "fish_id": pairs["fish_id"].to_numpy(),
+            "token": (np.uint64(_CAT_CODE[c.name]) << np.uint64(27)) | pairs[c.id_column].to_numpy().astype(np.uint64),
+        }))
+    if not parts:
+        return SimilarityIndex(np.array([], dtype=np.int64), np.zeros(1, dtype=np.int64),
+                               np.array([], dtype=np.uint64), **kwargs)
+    df = pd.concat(parts, ignore_index=True).drop_duplicates().sort_values(["fish_id", "token"])
+    fish = df["fish_id"].to_numpy(dtype=np.int64)
+    fish_ids, counts = np.unique(fish, return_counts=True)
+    indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    return SimilarityIndex(fish_ids, indptr, df["token"].to_numpy(dtype=np.uint64), **kwargs)
+
+
+def _load(sb) -> SimilarityIndex:
+    specs = [TableSpec(c.link_table, columns=f"fish_id,{c.id_column}", limit=None) for c in CATEGORIES]
+    res = load_tables(sb, specs)
+    if res.errors:
+        raise RuntimeError("; ".join(f"{t}: {e}" for t, e in res.errors.items()))
+    return build_index(res.frames)
+
+
+# -------- shared instance --------
+# one index per process, refreshed in place rather than cached per version:
+# add_fish() must reach the instance every session is querying
+_lock = threading.Lock()
+_state = {"index": None, "version": None, "rebuilding": False}
+
+
+def _version(sb) -> str:
+    return "/".join(str(table_version(sb, c.link_table)) for c in CATEGORIES)
+
+
+def _rebuild(sb, version: str) -> None:
+    try:
+        index = _load(sb)
+        with _lock:
+            _state.update(index=index, version=version)
+    finally:
+        with _lock:
+            _state["rebuilding"] = False
+
+
+def similarity_index(sb) -> SimilarityIndex:
+    """The shared index: built on first use, rebuilt in the background after outside changes."""
+    version = _version(sb)
+    with _lock:
+        index, built, busy = _state["index"], _state["version"], _state["rebuilding"]
+        if index is not None and built != version and not busy:
+            _state["rebuilding"] = True
+            submit(_rebuild, sb, version)
+    if index is None:
+        index = _load(sb)
+        with _lock:
+            _state.update(index=index, version=version)
+    return index
+
+
+def add_fish(fish_id: int, features: dict[str, Iterable[int]]) -> None:
+    """Make a just-created fish searchable without waiting for a rebuild."""
+    with _lock:
+        index = _state["index"]
+    if index is not None:
+        index.add(fish_id, features)
@@ -0,0 +1,243 @@
+# pedigree.py
+"""
+Kinship and inbreeding from mother_fish_id / father_fish_id, plus partner
+ranking for the Mom/Dad page.
+
+The additive relationship matrix factors as A = L D L^T, where L = (I - P)^-1
+and P holds 1/2 at (fish, mother) and (fish, father). D is diagonal with each
+fish's Mendelian sampling variance:
+
+    both parents known   d = 1/2 - (F_mother + F_father) / 4
+    one parent known     d = 3/4 - F_parent / 4
+    founder              d = 1
+
+Neither L nor A is ever formed. Fish are grouped into generations (a fish
+is one generation below its younger parent), and the two triangular solves
+become one vectorized step per generation:
+
+    down   x = (I - P)^-T b    children pass half their value to each parent
+    up     y = (I - P)^-1 b    each fish adds half of each parent's value
+
+So any set of columns A[:, cols] = up(D * down(E_cols)) costs
+O(generations x fish x columns). The kinship coefficient is A / 2, and the
+inbreeding of a fish is the kinship of its parents:
+
+    ped = pedigree(sb)
+    ped.inbreeding                     # Series: fish_id -> F
+    ped.kinship(fish_id)               # Series: fish_id -> kinship with that fish
+    ped.kinship_between(a, b)          # = F of an a x b offspring
+
+Inbreeding for the whole colony is computed one generation at a time, with
+one batched column solve per generation over that generation's fathers.
+Parent links that point at unknown fish, or that form a loop, are ignored.
+The pedigree sits in the "pedigree" bounded cache, keyed by the fish table
+version.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.bounded_cache import bounded_cache
+from utils.loader import TableSpec, load_tables
+from utils.table_versions import table_version
+
+MAX_GENERATIONS = 1000   # deeper than any colony; beyond it parent links must loop
+SOLVE_COLUMNS = 64       # relationship columns per batched solve (memory: fish x 64 floats)
+
+
+@dataclass
+class Pedigree:
+    fish_ids: np.ndarray        # int64, by generation (parents before children)
+    names: np.ndarray           # object
+    date_birth: np.ndarray      # datetime64[D]
+    generation: np.ndarray      # int32, founders 0
+    F: np.ndarray               # float64 inbreeding coefficient
+    # solver arrays: row 0 stands for an unknown parent, fish_ids[i] is row i + 1
+    mother: np.ndarray          # int64 row of the mother, 0 when unknown
+    father: np.ndarray          # int64 row of the father, 0 when unknown
+    d: np.ndarray               # float64 Mendelian sampling variance (d[0] = 0)
+    layers: list                # (start, stop) rows of each generation, generation 1 up
+    scatter: list               # per layer: (child rows sorted by parent, segment starts, parents)
+
+    @property
+    def row_of(self) -> pd.Index:
+        return pd.Index(self.fish_ids)
+
+    @property
+    def inbreeding(self) -> pd.Series:
+        return pd.Series(self.F, index=self.fish_ids, name="inbreeding")
+
+    # -------- triangular solves --------
+    def _solve(self, rows: np.ndarray, n_layers: Optional[int] = None) -> np.ndarray:
+        """
+        A[:stop, rows] for solver rows, over the founders and the first n_layers
+        generations (all by default); stop is where the next generation starts.
+        Rows are contiguous per generation, so each step touches one slice and
+        its parents.
+        """
+        layers = self.layers if n_layers is None else self.layers[:n_layers]
+        stop = self.layers[n_layers][0] if n_layers is not None and n_layers < len(self.layers) else len(self.d)
+        x = np.zeros((stop, len(rows)))
+        x[rows, np.arange(len(rows))] = 1.0
+        # down: x = (I - P)^-T e, children pass half to each parent
+        for children, starts, parents in reversed(self.scatter[:len(layers)]):
+            # segment sums instead of np.add.at: many children share a parent
+            x[parents] += 0.5 * np.add.reduceat(x[children], starts, axis=0)
+        x[0] = 0.0
+        x *= self.d[:stop, None]
+        # up: y = (I - P)^-1 x, each fish adds half of each parent
+        for a, b in layers:
+            x[a:b] += 0.5 * (x[self.mother[a:b]] + x[self.father[a:b]])
+        return x
+
+    def relationship(self, fish_ids: Iterable[int]) -> np.ndarray:
+        """A[:, fish_ids]: len(self.fish_ids) x len(fish_ids), rows in self.fish_ids order."""
+        rows = np.array([self._row(i) for i in fish_ids], dtype=np.int64) + 1
+        out = np.zeros((len(self.fish_ids), len(rows)))
+        for c in range(0, len(rows), SOLVE_COLUMNS):
+            out[:, c:c + SOLVE_COLUMNS] = self._solve(rows[c:c + SOLVE_COLUMNS])[1:]
+        return out
+
+    # -------- queries --------
+    def _row(self, fish_id: int) -> int:
+        pos = self.row_of.get_indexer([int(fish_id)])[0]
+        if pos < 0:
+            raise KeyError(f"fish {fish_id} is not in the pedigree")
+        return int(pos)
+
+    def kinship(self, fish_id: int) -> pd.Series:
+        """Kinship coefficient of every fish with `fish_id` (its own entry is (1 + F) / 2)."""
+        return pd.Series(self.relationship([fish_id])[:, 0] / 2, index=self.fish_ids, name="kinship")
+
+    def kinship_between(self, a: int, b: int) -> float:
+        return float(self.relationship([b])[self._row(a), 0] / 2)
+
+
+# -------- build --------
+def _generations(mother: np.ndarray, father: np.ndarray) -> np.ndarray:
+    """Generation per row (row 0 = unknown parent); loops climb to MAX_GENERATIONS."""
+    gen = np.zeros(len(mother), dtype=np.int32)
+    has_parent = (mother > 0) | (father > 0)
+    for _ in range(MAX_GENERATIONS):
+        new = np.where(has_parent, np.maximum(gen[mother], gen[father]) + 1, 0).astype(np.int32)
+        if np.array_equal(new, gen):
+            break
+        gen = new
+    return gen
+
+
+def build(fish: pd.DataFrame) -> Pedigree:
+    if fish.empty:
+        fish = pd.DataFrame({"id": [], "name": [], "date_birth": [], "mother_fish_id": [], "father_fish_id": []})
+    ids = fish["id"].to_numpy(dtype=np.int64)
+    n = len(ids)
+    row_of = pd.Index(ids)
+
+    def parent_rows(col: str) -> np.ndarray:
+        parent = fish[col].astype("Int64").fillna(-1).to_numpy(dtype=np.int64)
+        rows = row_of.get_indexer(parent).astype(np.int64) + 1
+        rows[rows == np.arange(1, n + 1)] = 0   # a fish listed as its own parent
+        return np.append(0, rows)               # unknown ids map to 0 already
+
+    mother, father = parent_rows("mother_fish_id"), parent_rows("father_fish_id")
+    gen = _generations(mother, father)
+    # a loop never settles: its fish climb to MAX_GENERATIONS; treat them as founders
+    looped = gen >= MAX_GENERATIONS - 1
+    if looped.any():
+        mother[looped], father[looped] = 0, 0
+        gen = _generations(mother, father)
+
+    # renumber rows by generation: parents come before children, each generation is one slice
+    order = np.argsort(gen[1:], kind="stable")
+    new_row = np.zeros(n + 1, dtype=np.int64)
+    new_row[order + 1] = np.arange(1, n + 1)
+    mother = np.append(0, new_row[mother[1:][order]])
+    father = np.append(0, new_row[father[1:][order]])
+    gen = gen[1:][order]
+    starts = np.flatnonzero(np.r_[True, gen[1:] != gen[:-1]]) if n else np.array([], dtype=np.int64)
+    bounds = np.append(starts, n) + 1
+    layers = [(int(a), int(b)) for a, b, g in zip(bounds[:-1], bounds[1:], gen[starts]) if g > 0]
+
+    scatter = []
+    for a, b in layers:
+        children = np.tile(np.arange(a, b), 2)
+        parents = np.concatenate([mother[a:b], father[a:b]])
+        by_parent = np.argsort(parents, kind="stable")
+        children, parents = children[by_parent], parents[by_parent]
+        starts = np.flatnonzero(np.r_[True, parents[1:] != parents[:-1]])
+        scatter.append((children, starts, parents[starts]))
+
+    F = np.zeros(n + 1)
+    d = np.zeros(n + 1)
+    d[1:] = 1.0
+    ped = Pedigree(ids[order], fish["name"].to_numpy(dtype=object)[order],
+                   pd.to_datetime(fish["date_birth"], errors="coerce").to_numpy(dtype="datetime64[D]")[order],
+                   gen.astype(np.int32), F[1:], mother, father, d, layers, scatter)
+
+    for g, (a, b) in enumerate(layers):
+        m, f = mother[a:b], father[a:b]
+        both, one = (m > 0) & (f > 0), (m > 0) ^ (f > 0)
+        d[a:b][both] = 0.5 - 0.25 * (F[m[both]] + F[f[both]])
+        d[a:b][one] = 0.75 - 0.25 * F[np.maximum(m, f)[one]]
+        if not both.any():
+            continue
+        # F of this generation = kinship of the parents: batched solves over its fathers
+        kids = np.flatnonzero(both)
+        fathers, col = np.unique(f[kids], return_inverse=True)
+        for c in range(0, len(fathers), SOLVE_COLUMNS):
+            chunk = (col >= c) & (col < c + SOLVE_COLUMNS)
+            x = ped._solve(fathers[c:c + SOLVE_COLUMNS], g)
+            F[a + kids[chunk]] = 0.5 * x[m[kids[chunk]], col[chunk] - c]
+    return ped
+
+
+@bounded_cache("pedigree")
+def _cached(_sb, version: str) -> Pedigree:
+    res = load_tables(_sb, [TableSpec("fish", columns="id,name,date_birth,mother_fish_id,father_fish_id", limit=None)])
+    if res.errors:
+        raise RuntimeError("; ".join(f"{t}: {e}" for t, e in res.errors.items()))
+    return build(res["fish"])
+
+
+def pedigree(sb) -> Pedigree:
+    """The shared pedigree, rebuilt when the fish table changed."""
+    return _cached(sb, str(table_version(sb, "fish")))
+
+
+# -------- partners --------
+PARTNER_COLUMNS = ["fish_id", "name", "date_birth", "kinship", "covers", "adds"]
+
+
+def rank_partners(ped: Pedigree, fish_id: int, has: Optional[dict] = None,
+                  candidates: Optional[Iterable[int]] = None, max_kinship: float = 1.0,
+                  k: int = 50) -> pd.DataFrame:
+    """
+    Partners for `fish_id`, best first: most desired features covered by the
+    pair, then lowest kinship (= the offspring's inbreeding), then most
+    desired features the partner adds.
+
+    `has` maps each desired feature to a boolean array over ped.fish_ids
+    (which fish carry it). Without it, partners rank by kinship alone.
+    """
+    me = ped._row(fish_id)
+    kin = ped.relationship([fish_id])[:, 0] / 2
+    keep = np.ones(len(ped.fish_ids), dtype=bool)
+    keep[me] = False
+    if candidates is not None:
+        keep &= np.isin(ped.fish_ids, np.fromiter((int(i) for i in candidates), dtype=np.int64))
+    keep &= kin <= max_kinship
+    covers = np.zeros(len(ped.fish_ids), dtype=np.int32)
+    adds = np.zeros(len(ped.fish_ids), dtype=np.int32)
+    for carriers in (has or {}).values():
+        covers += carriers | carriers[me]
+        adds += carriers & ~carriers[me]
+    rows = np.flatnonzero(keep)
+    rows = rows[np.lexsort((-adds[rows], kin[rows], -covers[rows]))][:k]
+    return pd.DataFrame({
+        "fish_id": ped.fish_ids[rows], "name": ped.names[rows], "date_birth": ped.date_birth[rows],
+        "kinship": kin[rows], "covers": covers[rows], "adds": adds[rows],
+    }, columns=PARTNER_COLUMNS)
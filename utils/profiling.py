@@ -0,0 +1,200 @@
+# profiling.py
+"""
+Per-rerun CPU profiling, switched on with `?profile=1` in the page URL.
+
+Pages call profile_page(__file__) before st.set_page_config(). With the query
+parameter set, the hook re-runs the page script itself under cProfile and a
+stack sampler, then appends a report (top functions by cumulative time, wall
+vs CPU time, time spent in PostgREST calls) and stops the outer run. Without
+the parameter it returns immediately.
+
+    ?profile=1         cProfile + sampler
+    ?profile=cprofile  deterministic only (exact call counts)
+    ?profile=sample    sampler only (low overhead, realistic timings)
+
+The sampled stacks download as collapsed stacks ("a;b;c 12" per line), which
+flamegraph.pl, speedscope and inferno read directly.
+"""
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+import pandas as pd
+import streamlit as st
+
+from utils_env import getenv
+
+SAMPLE_INTERVAL = float(getenv("PROFILE_SAMPLE_INTERVAL", 0.005))  # seconds
+TOP_N = 40
+
+_state = threading.local()  # .active on the thread that is running a profiled page
+
+
+class _PageStopped(Exception):
+    """Raised in place of st.stop() inside a profiled run, so the report can still render."""
+
+
+# -------- st.stop inside a profiled run --------
+_real_stop = st.stop
+
+
+def _stop():
+    if getattr(_state, "active", False):
+        raise _PageStopped()
+    _real_stop()
+
+
+# -------- sampler --------
+class _Sampler(threading.Thread):
+    """Samples one thread's Python stack every SAMPLE_INTERVAL seconds."""
+
+    def __init__(self, thread_id: int, root_code):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.root_code = root_code  # frames at and above this code object are the profiler's own
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame.f_code is not self.root_code:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {n}" for stack, n in self.stacks.most_common())
+
+
+# -------- report --------
+def _top_functions(prof: cProfile.Profile, n: int = TOP_N) -> pd.DataFrame:
+    stats = pstats.Stats(prof)
+    rows = [
+        {
+            "function": f"{func} ({os.path.basename(file)}:{line})",
+            "calls": nc,
+            "tottime_ms": tt * 1000,
+            "cumtime_ms": ct * 1000,
+        }
+        for (file, line, func), (cc, nc, tt, ct, callers) in stats.stats.items()
+    ]
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    return df.sort_values("cumtime_ms", ascending=False).head(n).reset_index(drop=True)
+
+
+def _query_ms() -> Optional[float]:
+    # PostgREST time of this rerun, from the query log when the page has one
+    try:
+        from utils.query_log import _current_run, records
+        run = _current_run.get()
+        if run is None:
+            return None
+        df = records(run["id"])
+        return float(df["ms"].sum()) if not df.empty else 0.0
+    except Exception:
+        return None
+
+
+def _render_report(mode: str, wall: float, cpu: float, prof: Optional[cProfile.Profile],
+                   sampler: Optional[_Sampler]) -> None:
+    with st.expander("⏱️ Profile of this rerun", expanded=True):
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Wall", f"{wall * 1000:.0f} ms")
+        c2.metric("CPU (script thread)", f"{cpu * 1000:.0f} ms")
+        c3.metric("Waiting (wall − CPU)", f"{max(wall - cpu, 0) * 1000:.0f} ms")
+        q = _query_ms()
+        c4.metric("PostgREST calls", "–" if q is None else f"{q:.0f} ms")
+        st.caption(
+            "Mostly waiting → network/database bound; mostly CPU → local work (pandas, rendering). "
+            "PostgREST time includes parallel loader calls, so it can exceed the wait."
+        )
+        if prof is not None:
+            st.markdown("**Top functions by cumulative time** (cProfile)")
+            st.dataframe(_top_functions(prof), hide_index=True, use_container_width=True)
+            buf = io.StringIO()
+            pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(TOP_N)
+            st.download_button("Download pstats report (.txt)", buf.getvalue(), file_name="profile.txt")
+        if sampler is not None:
+            st.markdown(f"**Sampled stacks**: {sampler.samples} samples every {SAMPLE_INTERVAL * 1000:.0f} ms")
+            st.download_button(
+                "Download collapsed stacks (flamegraph / speedscope)", sampler.collapsed(),
+                file_name="profile.folded", mime="text/plain",
+            )
+        if mode != "sample":
+            st.caption("cProfile adds overhead to call-heavy code; use `?profile=sample` for realistic timings.")
+
+
+# -------- hook --------
+def _exec_page(code, path: str) -> None:
+    exec(code, {"__name__": "__main__", "__file__": path})
+
+
+def profile_page(path: str) -> None:
+    """
+    Call at the top of a page, before st.set_page_config(). With ?profile set,
+    runs the page profiled, shows the report and ends the rerun.
+    """
+    mode = st.query_params.get("profile")
+    if not mode or mode == "0" or getattr(_state, "active", False):
+        return
+    mode = mode if mode in ("cprofile", "sample") else "both"
+    from streamlit.runtime.scriptrunner import RerunException, StopException
+
+    with open(path, encoding="utf-8") as f:
+        code = compile(f.read(), path, "exec")
+
+    prof = cProfile.Profile() if mode in ("both", "cprofile") else None
+    sampler = _Sampler(threading.get_ident(), _exec_page.__code__) if mode in ("both", "sample") else None
+    error: Optional[BaseException] = None
+
+    _state.active = True
+    # st.stop() inside the page ends only the page, not the report; restored below.
+    # An overlapping session may restore early: the real st.stop raises
+    # StopException, which is caught the same way.
+    st.stop = _stop
+    t0, c0 = time.perf_counter(), time.thread_time()
+    if sampler:
+        sampler.start()
+    if prof:
+        prof.enable()
+    try:
+        _exec_page(code, path)
+    except (_PageStopped, StopException):
+        pass
+    except RerunException:
+        raise
+    except Exception as e:
+        error = e
+    finally:
+        if prof:
+            prof.disable()
+        if sampler:
+            sampler.stop()
+        wall, cpu = time.perf_counter() - t0, time.thread_time() - c0
+        _state.active = False
+        st.stop = _real_stop
+
+    _render_report(mode, wall, cpu, prof, sampler)
+    if error is not None:
+        st.exception(error)
+    _real_stop()
@@ -0,0 +1,93 @@
+# progressive.py
+"""
+Progressive rendering: draw the page skeleton first, fill sections as their
+data arrives.
+
+A page that runs its fetches one after another in the script shows nothing
+until the last one returns. fish_view_3, for example, fetches seven link
+tables for Mom and seven for Dad before it draws its first expander.
+render_progressively() instead:
+
+  1. puts a placeholder with a "loading" line in every section's container,
+  2. starts every section's fetch on the shared loader pool,
+  3. renders each section into its placeholder as soon as its fetch
+     completes, in completion order,
+  4. replaces sections still pending at their timeout with a warning, and
+     shows a failed fetch as an error in its own section only.
+
+    results = render_progressively([
+        Section("mom_tg", lambda: fetch_transgenes_for_fish(mom_id), show_table, container=c1, label="transgenes"),
+        ...
+    ])
+
+The first section appears after the fastest fetch, not after the slowest.
+Fetches run in a copy of the caller's context (query log attribution), must
+not call Streamlit themselves, and keep running after a timeout, so their
+caches are warm on the next rerun.
+"""
+from __future__ import annotations
+
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import streamlit as st
+
+from utils_env import getenv
+from utils.loader import submit
+
+SECTION_TIMEOUT = float(getenv("PROGRESSIVE_SECTION_TIMEOUT", 30))
+
+
+@dataclass
+class Section:
+    key: str
+    fetch: Callable[[], Any]               # runs on a worker thread
+    render: Callable[[Any], None]          # runs on the script thread, inside the placeholder
+    container: Any = None                  # where the placeholder goes (st, a column, an expander, ...)
+    label: str = ""
+    timeout: Optional[float] = None        # seconds; SECTION_TIMEOUT if None
+
+
+def _fill(placeholder, render: Callable[[Any], None], value: Any) -> None:
+    with placeholder.container():
+        render(value)
+
+
+def render_progressively(sections: list[Section]) -> dict[str, Any]:
+    """
+    Render every section as its fetch completes; returns {key: result} for
+    the sections that completed (failed and timed-out sections are left out).
+    """
+    start = time.monotonic()
+    placeholders, futures = {}, {}
+    for sec in sections:
+        ph = (sec.container or st).empty()
+        ph.caption(f"⏳ Loading {sec.label or sec.key}…")
+        placeholders[sec.key] = ph
+        futures[submit(sec.fetch)] = sec
+
+    results: dict[str, Any] = {}
+    pending = dict(futures)
+    while pending:
+        deadlines = {f: start + (s.timeout or SECTION_TIMEOUT) for f, s in pending.items()}
+        wait_for = max(0.0, min(deadlines.values()) - time.monotonic())
+        done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+        for fut in done:
+            sec = pending.pop(fut)
+            ph = placeholders[sec.key]
+            try:
+                value = fut.result()
+            except Exception as e:
+                ph.error(f"{sec.label or sec.key}: {e}")
+                continue
+            results[sec.key] = value
+            _fill(ph, sec.render, value)
+        now = time.monotonic()
+        for fut in [f for f in pending if deadlines[f] <= now]:
+            sec = pending.pop(fut)
+            placeholders[sec.key].warning(
+                f"{sec.label or sec.key} did not load within {sec.timeout or SECTION_TIMEOUT:g}s; rerun to retry."
+            )
+    return results
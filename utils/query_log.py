@@ -0,0 +1,265 @@
+# query_log.py
+"""
+Timing for every PostgREST call, grouped by Streamlit rerun.
+
+install() wraps `.execute()` of the postgrest request builders (sync and
+async), so every query made through any Supabase client is recorded: method,
+table, filters, row count, response body bytes and latency. Records are
+tagged with the rerun that issued them through a ContextVar; start_run()
+opens a new rerun and is called by query_panel() at the top of each page.
+
+Within one rerun, queries of the same shape (table + filter columns/ops)
+issued with different filter values are flagged as N+1 patterns, e.g. the
+per-fish `fish_*` link fetches of parent_summary.
+
+Queries on worker threads keep their rerun only if the worker runs in a copy
+of the caller's context (utils.loader and utils.async_data do this); the rest
+are logged under "background".
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Optional
+
+import pandas as pd
+import streamlit as st
+
+from utils_env import getenv
+
+QUERY_LOG_ENABLED = str(getenv("QUERY_LOG", "1")).lower() not in ("0", "false", "no", "off")
+QUERY_LOG_MAX = int(getenv("QUERY_LOG_MAX", 5000))        # records kept per process
+N1_THRESHOLD = int(getenv("QUERY_LOG_N1_THRESHOLD", 2))   # distinct filter values per shape
+
+# query params that are not row filters
+_NON_FILTERS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+
+_current_run: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("query_log_run", default=None)
+# body size of the response being parsed, set where postgrest turns the HTTP response into data
+_response_bytes: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("query_log_bytes", default=None)
+_records: deque = deque(maxlen=QUERY_LOG_MAX)
+_lock = threading.Lock()
+_installed = False
+
+
+# -------- recording --------
+def _describe(builder) -> dict:
+    # postgrest>=0.17 keeps the request on builder.request; older builders hold it directly
+    req = getattr(builder, "request", builder)
+    path = str(getattr(req, "path", "") or "")
+    table = path.split("/rest/v1/", 1)[-1].strip("/") if path else "?"
+    params = getattr(req, "params", None)
+    items = list(params.multi_items()) if hasattr(params, "multi_items") else list(dict(params or {}).items())
+    filters = [(k, str(v)) for k, v in items if k not in _NON_FILTERS]
+    select = next((str(v) for k, v in items if k == "select"), "")
+    return {
+        "method": str(getattr(req, "http_method", "GET")),
+        "table": table,
+        "select": " ".join(select.split()),
+        "filters": filters,
+    }
+
+
+def _shape(info: dict) -> str:
+    # filter columns and operators, not their values: "fish_id=eq" for fish_id=eq.42
+    ops = sorted(f"{k}={v.split('.', 1)[0]}" for k, v in info["filters"])
+    return f"{info['method']} {info['table']}?{'&'.join(ops)}|{info['select']}"
+
+
+def _body_size(response) -> Optional[int]:
+    # the body is already read when postgrest parses it; Content-Length may be the compressed size
+    content = getattr(response, "content", None)
+    if content is not None:
+        return len(content)
+    length = getattr(response, "headers", {}).get("content-length")
+    return int(length) if length else None
+
+
+def _record(info: dict, t0: float, result=None, error: Optional[BaseException] = None) -> None:
+    run = _current_run.get()
+    data = getattr(result, "data", None)
+    size = _response_bytes.get()
+    if isinstance(data, str):
+        # text/csv responses (utils.bulk_read): header line plus one line per row
+        rows = data.count("\n")
+    else:
+        rows = len(data) if isinstance(data, list) else (1 if data else 0)
+    rec = {
+        "ts": time.time(),
+        "run": run["id"] if run else "background",
+        "session": run["session"] if run else None,
+        "page": run["page"] if run else None,
+        "method": info["method"],
+        "table": info["table"],
+        "filters": "&".join(f"{k}={v}" for k, v in info["filters"]),
+        "shape": _shape(info),
+        "rows": rows,
+        "bytes": size,
+        "ms": round((time.perf_counter() - t0) * 1000, 1),
+        "error": (str(error) or type(error).__name__) if error else None,
+    }
+    with _lock:
+        _records.append(rec)
+
+
+def _wrap_sync(execute):
+    @functools.wraps(execute)
+    def wrapper(self, *args, **kwargs):
+        info = _describe(self)
+        _response_bytes.set(None)
+        t0 = time.perf_counter()
+        try:
+            res = execute(self, *args, **kwargs)
+        except BaseException as e:
+            _record(info, t0, error=e)
+            raise
+        _record(info, t0, res)
+        return res
+    wrapper._query_log = True
+    return wrapper
+
+
+def _wrap_async(execute):
+    @functools.wraps(execute)
+    async def wrapper(self, *args, **kwargs):
+        info = _describe(self)
+        _response_bytes.set(None)
+        t0 = time.perf_counter()
+        try:
+            res = await execute(self, *args, **kwargs)
+        except BaseException as e:
+            _record(info, t0, error=e)
+            raise
+        _record(info, t0, res)
+        return res
+    wrapper._query_log = True
+    return wrapper
+
+
+def _wrap_parse(parse):
+    @functools.wraps(parse)
+    def wrapper(request_response, *args, **kwargs):
+        _response_bytes.set(_body_size(request_response))
+        return parse(request_response, *args, **kwargs)
+    wrapper._query_log = True
+    return wrapper
+
+
+def install() -> None:
+    """Wrap execute() of every postgrest request builder once per process."""
+    global _installed
+    if _installed or not QUERY_LOG_ENABLED:
+        return
+    with _lock:
+        if _installed:
+            return
+        import postgrest
+
+        for name in dir(postgrest):
+            cls = getattr(postgrest, name)
+            if not isinstance(cls, type) or not name.endswith("RequestBuilder"):
+                continue
+            execute = cls.__dict__.get("execute")
+            if execute is None or getattr(execute, "_query_log", False):
+                continue
+            wrap = _wrap_async if name.startswith("Async") else _wrap_sync
+            setattr(cls, "execute", wrap(execute))
+        # response sizes: the raw body length, read where the response is parsed
+        from postgrest import base_request_builder
+
+        for cls in (getattr(base_request_builder, n, None) for n in ("APIResponse", "SingleAPIResponse")):
+            parse = cls and cls.__dict__.get("from_http_request_response")
+            if isinstance(parse, staticmethod) and not getattr(parse.__func__, "_query_log", False):
+                setattr(cls, "from_http_request_response", staticmethod(_wrap_parse(parse.__func__)))
+        _installed = True
+
+
+# -------- reruns --------
+def _session_id() -> Optional[str]:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else None
+    except Exception:
+        return None
+
+
+def start_run(page: str) -> str:
+    """Open a new rerun; queries on this thread (and copied contexts) are tagged with it."""
+    install()
+    run = {"id": uuid.uuid4().hex[:12], "session": _session_id(), "page": page, "started": time.time()}
+    _current_run.set(run)
+    runs = st.session_state.setdefault("_query_log_runs", [])
+    runs.append({k: run[k] for k in ("id", "page", "started")})
+    del runs[:-20]
+    return run["id"]
+
+
+def records(run_id: Optional[str] = None, session: Optional[str] = None) -> pd.DataFrame:
+    with _lock:
+        recs = list(_records)
+    df = pd.DataFrame(recs)
+    if df.empty:
+        return df
+    if run_id is not None:
+        df = df[df["run"] == run_id]
+    if session is not None:
+        df = df[df["session"] == session]
+    return df.reset_index(drop=True)
+
+
+def n_plus_one(df: pd.DataFrame, threshold: int = N1_THRESHOLD) -> pd.DataFrame:
+    """Shapes issued with >= threshold distinct filter values in one rerun (paging does not count)."""
+    if df.empty:
+        return pd.DataFrame(columns=["run", "shape", "queries", "distinct", "ms"])
+    g = df.groupby(["run", "shape"]).agg(
+        queries=("filters", "size"), distinct=("filters", "nunique"), ms=("ms", "sum")
+    ).reset_index()
+    return g[g["distinct"] >= threshold].sort_values("ms", ascending=False).reset_index(drop=True)
+
+
+def to_jsonl(df: pd.DataFrame) -> str:
+    return "\n".join(json.dumps(r, default=str) for r in df.to_dict("records"))
+
+
+# -------- sidebar panel --------
+def query_panel(page: str) -> None:
+    """
+    Start this rerun's log and show the previous reruns of this session in the
+    sidebar. A rerun's own queries are only complete once it has finished, so
+    the panel defaults to the last finished one.
+    """
+    if not QUERY_LOG_ENABLED:
+        return
+    start_run(page)
+    finished = st.session_state.get("_query_log_runs", [])[:-1]
+    with st.sidebar.expander("🔎 Queries", expanded=False):
+        if not finished:
+            st.caption("Queries of each rerun show up here after it finishes.")
+            return
+        labels = {
+            r["id"]: f"{time.strftime('%H:%M:%S', time.localtime(r['started']))} · {r['page']}"
+            for r in reversed(finished)
+        }
+        run_id = st.selectbox("Rerun", list(labels), format_func=labels.get, key="_query_log_pick")
+        df = records(run_id)
+        if df.empty:
+            st.caption("No queries in this rerun.")
+            return
+        st.caption(f"{len(df)} queries · {df['ms'].sum():.0f} ms · {df['rows'].sum()} rows · {df['bytes'].sum() / 1024:.0f} KiB")
+        for _, r in n_plus_one(df).iterrows():
+            st.warning(f"N+1: {r['queries']}× `{r['shape'].split('|', 1)[0]}` ({r['ms']:.0f} ms)")
+        st.dataframe(
+            df[["table", "method", "filters", "rows", "bytes", "ms", "error"]].sort_values("ms", ascending=False),
+            hide_index=True, use_container_width=True,
+        )
+        session_df = records(session=_session_id())
+        st.download_button(
+            "Export session (JSONL)", to_jsonl(session_df), file_name="queries.jsonl",
+            mime="application/x-ndjson", use_container_width=True,
+        )
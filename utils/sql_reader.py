@@ -0,0 +1,193 @@
+# sql_reader.py
+"""
+Direct-SQL reads into Arrow for admin and bulk analytics.
+
+Whole-table reads through PostgREST pay for HTTP paging (1000 rows a
+request) and a JSON/CSV round trip per page. With DATABASE_URL configured,
+this module reads Postgres directly:
+
+    for batch in iter_batches("select * from public.fish where created_at >= :since",
+                              {"since": since}):
+        ...                                  # pyarrow.RecordBatch, BATCH_ROWS rows each
+    df = read_sql("select ...", params, table="fish")   # typed like build_frame
+    df = read_table(sb, "fish", filters=(("line_building_stage", "eq", "F1"),))
+
+Queries run on one pooled SQLAlchemy engine per process, inside a read-only
+transaction with a statement timeout, through a server-side cursor
+(stream_results), so a large result is pulled BATCH_ROWS at a time and never
+held as one list of rows. Each chunk is transposed into Arrow columns right
+away.
+
+The database connection bypasses RLS: use it only for service-role/admin
+paths (sb_admin in app.py, the schema pages). read_table() falls back to
+PostgREST (utils.bulk_read, under the caller's client) when no database URL
+is configured.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from utils_env import getenv
+from utils.bulk_read import read_frame as read_frame_postgrest
+from utils.frames import arrow_type, frame_from_arrow
+
+try:
+    from sqlalchemy import create_engine, text
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:  # pragma: no cover
+    SQLALCHEMY_AVAILABLE = False
+
+BATCH_ROWS = int(getenv("SQL_BATCH_ROWS", 20000))
+POOL_SIZE = int(getenv("SQL_POOL_SIZE", 5))
+STATEMENT_TIMEOUT_MS = int(getenv("SQL_STATEMENT_TIMEOUT_MS", 120000))
+
+# TableSpec-style filter ops -> SQL; "in" binds a list as a Postgres array
+_SQL_OPS = {
+    "eq": "= {p}", "neq": "<> {p}", "gt": "> {p}", "gte": ">= {p}", "lt": "< {p}", "lte": "<= {p}",
+    "like": "LIKE {p}", "ilike": "ILIKE {p}", "in": "= ANY({p})",
+}
+_IDENT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_READ_ONLY = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+
+
+# -------- engine --------
+def database_url() -> Optional[str]:
+    url = getenv("DATABASE_URL")
+    if url:
+        return url
+    try:
+        return st.secrets["database"]["url"]
+    except Exception:
+        return None
+
+
+def sql_available() -> bool:
+    return SQLALCHEMY_AVAILABLE and bool(database_url())
+
+
+@st.cache_resource(show_spinner=False)
+def _engine(url: str):
+    return create_engine(url, pool_size=POOL_SIZE, max_overflow=POOL_SIZE, pool_pre_ping=True, pool_recycle=1800)
+
+
+def get_engine():
+    """The process-wide pooled engine for DATABASE_URL (raises if none is configured)."""
+    url = database_url()
+    if not SQLALCHEMY_AVAILABLE or not url:
+        raise RuntimeError("No DATABASE_URL configured (or SQLAlchemy is not installed).")
+    return _engine(url)
+
+
+# -------- reads --------
+def _batch(keys: list[str], rows: list, table: Optional[str]) -> pa.RecordBatch:
+    columns = list(zip(*rows)) if rows else [() for _ in keys]
+    arrays = []
+    for name, values in zip(keys, columns):
+        t = arrow_type(table, name) if table else None
+        try:
+            arrays.append(pa.array(values, type=t))
+        except (pa.ArrowException, TypeError, ValueError):
+            arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+    return pa.RecordBatch.from_arrays(arrays, names=keys)
+
+
+def iter_batches(sql: str, params: Optional[dict] = None, table: Optional[str] = None,
+                 batch_rows: int = BATCH_ROWS) -> Iterator[pa.RecordBatch]:
+    """
+    Run one parameterized SELECT (":name" binds) and yield Arrow record
+    batches as the server-side cursor delivers them. `table` picks column
+    types from utils.frames metadata.
+    """
+    if not _READ_ONLY.match(sql):
+        raise ValueError("Only SELECT / WITH queries are allowed.")
+    with get_engine().connect() as conn:
+        with conn.begin():
+            # first statement of the transaction, so the whole read is read-only
+            conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(STATEMENT_TIMEOUT_MS)}")
+            result = conn.execution_options(stream_results=True, yield_per=batch_rows).execute(text(sql), params or {})
+            keys = list(result.keys())
+            for rows in result.partitions(batch_rows):
+                yield _batch(keys, rows, table)
+
+
+def read_arrow(sql: str, params: Optional[dict] = None, table: Optional[str] = None) -> Optional[pa.Table]:
+    batches = list(iter_batches(sql, params, table))
+    if not batches:
+        return None
+    return pa.Table.from_batches(batches).combine_chunks()
+
+
+def read_sql(sql: str, params: Optional[dict] = None, table: Optional[str] = None) -> pd.DataFrame:
+    """Whole result as a typed DataFrame (see utils.frames)."""
+    tbl = read_arrow(sql, params, table)
+    return pd.DataFrame() if tbl is None else frame_from_arrow(tbl, table)
+
+
+def iter_frames(sql: str, params: Optional[dict] = None, table: Optional[str] = None,
+                batch_rows: int = BATCH_ROWS) -> Iterator[pd.DataFrame]:
+    """Typed DataFrames of up to batch_rows rows each, for exports that stream."""
+    for batch in iter_batches(sql, params, table, batch_rows):
+        yield frame_from_arrow(pa.Table.from_batches([batch]), table)
+
+
+# -------- whole tables --------
+def _ident(name: str) -> str:
+    if not _IDENT.match(name):
+        raise ValueError(f"Bad identifier: {name!r}")
+    return f'"{name}"'
+
+
+def table_sql(table: str, columns: str = "*", filters: tuple = (), order: Optional[str] = None,
+              desc: bool = False, limit: Optional[int] = None) -> tuple[str, dict]:
+    """SELECT for a TableSpec-like description; values are bound, never inlined."""
+    cols = "*" if columns.strip() == "*" else ", ".join(_ident(c.strip()) for c in columns.split(","))
+    sql = f"SELECT {cols} FROM public.{_ident(table)}"
+    params: dict[str, Any] = {}
+    where = []
+    for i, (col, op, value) in enumerate(filters):
+        if op == "is":
+            where.append(f"{_ident(col)} IS {'NULL' if value in (None, 'null') else 'NOT NULL'}")
+            continue
+        if op not in _SQL_OPS:
+            raise ValueError(f"Unsupported filter op: {op}")
+        params[f"p{i}"] = list(value) if op == "in" else value
+        where.append(f"{_ident(col)} {_SQL_OPS[op].format(p=f':p{i}')}")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if order:
+        sql += f" ORDER BY {_ident(order)}{' DESC' if desc else ''}"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return sql, params
+
+
+def read_table(sb, table: str, columns: str = "*", filters: tuple = (), order: Optional[str] = None,
+               desc: bool = False, limit: Optional[int] = None) -> pd.DataFrame:
+    """
+    Whole (filtered) table over DATABASE_URL, or through PostgREST with `sb`
+    when no database is configured.
+    """
+    if sql_available():
+        sql, params = table_sql(table, columns, filters, order, desc, limit)
+        return read_sql(sql, params, table)
+    from utils.loader import TableSpec, build_query  # loader imports catalog_snapshots, which imports us
+
+    spec = TableSpec(table, columns=columns, filters=filters, order=order, desc=desc, limit=limit)
+    return read_frame_postgrest(lambda: build_query(sb, spec), table, limit=limit, select=columns)
+
+
+def source_label() -> str:
+    if not sql_available():
+        return "PostgREST"
+    try:
+        from sqlalchemy.engine import make_url
+        u = make_url(database_url())
+        return f"Postgres {u.host}:{u.port or ''}/{u.database}"
+    except Exception:
+        return "Postgres"
@@ -0,0 +1,105 @@
+# table_versions.py
+"""
+Cheap "has this table changed?" probes.
+
+Preferred source is the trigger-maintained `table_versions` table (see
+supabase/migrations/*_table_versions.sql): one request returns the counters
+of every table we have asked about. Where that table is missing, each table
+is probed with a 1-row request for (count, max(created_at)).
+
+Probe results are shared by all sessions and reused for PROBE_TTL seconds,
+so a burst of reruns costs at most one probe request.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Iterable, Optional
+
+from utils_env import getenv
+
+PROBE_TTL = float(getenv("TABLE_VERSION_PROBE_TTL", 15))
+
+_lock = threading.Lock()
+_versions: dict[str, tuple[float, Optional[str]]] = {}  # name -> (probed_at, version)
+_known: set[str] = set()
+_has_versions_table: Optional[bool] = None
+
+
+# -------- probes --------
+def _probe_versions_table(sb, names: list[str]) -> dict[str, Optional[str]]:
+    rows = (
+        sb.table("table_versions")
+          .select("table_name,version")
+          .in_("table_name", names)
+          .execute()
+          .data
+        or []
+    )
+    out: dict[str, Optional[str]] = {n: None for n in names}
+    for r in rows:
+        out[r["table_name"]] = f"v{r['version']}"
+    return out
+
+
+def _probe_count_max(sb, name: str) -> Optional[str]:
+    """Fallback: exact count plus newest created_at in a single 1-row request."""
+    try:
+        res = (
+            sb.table(name)
+              .select("created_at", count="exact")
+              .order("created_at", desc=True)
+              .limit(1)
+              .execute()
+        )
+    except Exception:
+        return None
+    newest = res.data[0].get("created_at") if res.data else None
+    return f"n{res.count}:{newest}"
+
+
+def probe_versions(sb, names: Iterable[str]) -> dict[str, Optional[str]]:
+    """
+    Return {table: version token} for names, bypassing the shared cache.
+    A None token means "unknown" and callers should refetch.
+    """
+    global _has_versions_table
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    if _has_versions_table is not False:
+        try:
+            out = _probe_versions_table(sb, names)
+            _has_versions_table = True
+            # tables without triggers have no counter; fall back for those only
+            for n in [n for n, v in out.items() if v is None]:
+                out[n] = _probe_count_max(sb, n)
+            return out
+        except Exception:
+            _has_versions_table = False
+    return {n: _probe_count_max(sb, n) for n in names}
+
+
+def table_version(sb, name: str, max_age: float = PROBE_TTL) -> Optional[str]:
+    """
+    Version token for one table, probed at most every max_age seconds.
+    When a probe is due, every table seen so far is probed in the same request.
+    """
+    now = time.time()
+    with _lock:
+        _known.add(name)
+        hit = _versions.get(name)
+        if hit and now - hit[0] <= max_age:
+            return hit[1]
+        due = sorted(n for n in _known if n not in _versions or now - _versions[n][0] > max_age)
+    probed = probe_versions(sb, due)
+    with _lock:
+        for n, v in probed.items():
+            _versions[n] = (now, v)
+    return probed.get(name)
+
+
+def forget(name: str) -> None:
+    """Drop a cached probe so the next table_version() call asks the server."""
+    with _lock:
+        _versions.pop(name, None)
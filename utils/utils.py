@@ -1,6 +1,8 @@
 # utils.py
 import pandas as pd
 from supabase_client import get_client
+from utils.bulk_read import read_frame
+from utils.loader import TableSpec, load_tables
 
 sb = get_client()
 
@@ -10,29 +12,24 @@ def fetch_all(table: str, chunk_size: int = 1000, max_rows: int = 50000) -> pd.D
     Fetch all rows from a Supabase table with pagination.
     Returns a pandas DataFrame.
     """
-    rows, start, end = [], 0, chunk_size - 1
-    while start < max_rows:
-        res = sb.table(table).select("*").range(start, end).execute()
-        batch = res.data
-        if not batch:
-            break
-        rows.extend(batch)
-        if len(batch) < chunk_size:
-            break
-        start, end = end + 1, end + chunk_size
-    return pd.DataFrame(rows)
+    return read_frame(lambda: sb.table(table).select("*"), table, limit=max_rows, chunk_size=chunk_size)
 
 # -------- fish with readable names --------
 def fetch_joined_fish(limit: int = 5000) -> pd.DataFrame:
     """
     Fetch fish with joined genotype_name and strain_name.
     """
-    df_fish = fetch_all("fish", max_rows=limit)
+    res = load_tables(sb, [
+        TableSpec("fish", limit=limit),
+        TableSpec("genotypes", limit=50000),
+        TableSpec("background_strains", limit=50000),
+    ]).raise_for_errors()
+    df_fish = res["fish"]
     if df_fish.empty:
         return df_fish
 
-    df_geno   = fetch_all("genotypes")
-    df_strain = fetch_all("background_strains")
+    df_geno   = res["genotypes"]
+    df_strain = res["background_strains"]
 
     if not df_geno.empty:
         df_fish = df_fish.merge(
@@ -57,13 +54,20 @@ def fetch_transgenes_with_names(limit: int = 50000) -> pd.DataFrame:
       - plasmid_name from plasmids
       - genotypes: comma-separated genotype_name(s) via genotype_transgenes link table
     """
-    df_tg   = fetch_all("transgenes", max_rows=limit)
+    # all four reads are independent: fetch them concurrently (any failure raises)
+    res = load_tables(sb, [
+        TableSpec("transgenes", limit=limit),
+        TableSpec("plasmids", limit=50000),
+        TableSpec("genotypes", limit=50000),
+        TableSpec("genotype_transgenes", limit=50000),
+    ]).raise_for_errors()
+    df_tg   = res["transgenes"]
     if df_tg.empty:
         return df_tg
 
-    df_pl   = fetch_all("plasmids")
-    df_gt   = fetch_all("genotypes")
-    df_link = fetch_all("genotype_transgenes")
+    df_pl   = res["plasmids"]
+    df_gt   = res["genotypes"]
+    df_link = res["genotype_transgenes"]
 
     # plasmid_name
     if not df_pl.empty and "id" in df_pl.columns: